@@ -0,0 +1,395 @@
+"""
+Adaptive hand tracking for the desktop loop
+
+detect_sign.py normally gives MediaPipe every full 640x480 frame at
+model_complexity=0. AdaptiveHands (detect_sign.py --adaptive) is a drop-in for
+hands.process() on BGR frames that:
+
+    - crops to a padded square around the previous frame's hands. The crop
+      stays put while the hands stay inside it, so MediaPipe's own tracking
+      sees a stable image. It is only re-fitted once a hand nears its edge
+      or the hands shrink to under half of it.
+    - falls back to the whole frame, downscaled by FALLBACK_SCALE, when the
+      crop loses the hands (on the same frame) or no hand was tracked.
+      With --max-hands 2 and one hand in the crop, every REDETECT_EVERY-th
+      frame is a whole-frame pass as well, so a second hand is noticed.
+    - moves along LEVELS (image scale, model_complexity) to hold a target
+      frame rate. It steps down after PATIENCE frames slower than the target
+      and up after PATIENCE frames where the landmark step used under
+      HEADROOM of the frame budget. An upgrade that has to be undone waits
+      twice as long before the next try.
+
+Landmarks are mapped back to full-frame coordinates, so the model gets the
+same features as in fixed mode.
+
+Replaying recordings (one folder per label, as for ingest_media.py; record
+clips with detect_sign.py --record) compares fixed and adaptive tracking:
+
+    python adaptive_roi.py recordings/ [--target-fps 30] [--max-hands 1]
+
+For each mode it prints hand detection rate, landmark time and fps, and
+label accuracy against the folder name. For adaptive mode it also prints
+label agreement and landmark deviation from fixed mode. Every run is
+appended to LOG_PATH as one JSON line.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+TARGET_FPS = 30.0
+# (image scale, model_complexity), best quality first; detect_sign.py's
+# fixed setting is START_LEVEL
+LEVELS = (
+    (1.0, 1),
+    (1.0, 0),
+    (0.75, 0),
+    (0.5, 0),
+)
+START_LEVEL = 1
+PATIENCE = 15            # frames a level must be too slow / fast before it changes
+HEADROOM = 0.5           # step up while landmarks take < this share of the frame budget
+FPS_TOLERANCE = 0.1      # frames up to 10% over budget still count as on target
+UPGRADE_HOLD = 5.0       # seconds after a step down before trying better quality
+MAX_UPGRADE_HOLD = 60.0
+
+ROI_PADDING = 0.35       # padding on each side, fraction of the hands' box
+ROI_MIN_SIDE = 224       # crops are never scaled below the landmark model's input
+ROI_RECENTER_MARGIN = 0.1  # re-centre when a hand is this close to the crop edge
+FALLBACK_SCALE = 0.5     # whole-frame passes run at this share of the level's scale
+REDETECT_EVERY = 15      # crop frames between whole-frame looks for a missing hand
+
+LOG_PATH = 'adaptive_roi_log.jsonl'
+
+
+def mediapipe_hands(complexity=0, max_hands=1):
+    """Tracking Hands object with detect_sign.py's settings"""
+    import mediapipe as mp
+    return mp.solutions.hands.Hands(
+        static_image_mode=False,
+        max_num_hands=max_hands,
+        model_complexity=complexity,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def hands_box(result, width, height):
+    """(x0, y0, x1, y1) pixel box around every hand of a full-frame result"""
+    points = np.array([(lm.x * width, lm.y * height)
+                       for hand in result.multi_hand_landmarks for lm in hand.landmark])
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    return x0, y0, x1, y1
+
+
+def roi_box(box, width, height, padding=ROI_PADDING, min_side=ROI_MIN_SIDE):
+    """Padded square crop (integer pixels, inside the frame) around a box"""
+    x0, y0, x1, y1 = box
+    side = max(x1 - x0, y1 - y0) * (1 + 2 * padding)
+    side = int(min(max(side, min_side), width, height))
+    # Centre on the box, then shift (not shrink) the square into the frame
+    left = int(round((x0 + x1 - side) / 2))
+    top = int(round((y0 + y1 - side) / 2))
+    left = min(max(left, 0), width - side)
+    top = min(max(top, 0), height - side)
+    return left, top, left + side, top + side
+
+
+def inside(box, crop, margin=ROI_RECENTER_MARGIN):
+    """Is box within crop, at least margin * crop side away from its edges"""
+    inset = margin * (crop[2] - crop[0])
+    return (box[0] >= crop[0] + inset and box[1] >= crop[1] + inset
+            and box[2] <= crop[2] - inset and box[3] <= crop[3] - inset)
+
+
+class QualityController:
+    """Picks a (scale, model_complexity) level to hold a target frame rate"""
+
+    def __init__(self, target_fps=TARGET_FPS, levels=LEVELS, start=START_LEVEL,
+                 patience=PATIENCE, upgrade_hold=UPGRADE_HOLD):
+        self.target_fps = target_fps
+        self.levels = levels
+        self.level = start
+        self.patience = patience
+        self.upgrade_hold = upgrade_hold
+        self.changes = 0
+        self._hold = upgrade_hold
+        self._hold_until = 0.0
+        self._slow = 0
+        self._fast = 0
+        self._last_change = None
+
+    @property
+    def setting(self):
+        return self.levels[self.level]
+
+    def observe(self, frame_seconds, landmark_seconds, now=None):
+        """Feed one frame's interval and landmark time; True when the level changed"""
+        now = time.monotonic() if now is None else now
+        budget = 1.0 / self.target_fps
+        self._slow = self._slow + 1 if frame_seconds > budget * (1 + FPS_TOLERANCE) else 0
+        self._fast = self._fast + 1 if landmark_seconds < budget * HEADROOM else 0
+
+        if self._slow >= self.patience and self.level < len(self.levels) - 1:
+            # Undoing an upgrade: wait longer before the next attempt
+            self._hold = (min(self._hold * 2, MAX_UPGRADE_HOLD) if self._last_change == 'up'
+                          else self.upgrade_hold)
+            self._hold_until = now + self._hold
+            return self._change(+1, 'down')
+        if self._fast >= self.patience and self.level > 0 and now >= self._hold_until:
+            return self._change(-1, 'up')
+        return False
+
+    def _change(self, step, direction):
+        self.level += step
+        self.changes += 1
+        self._last_change = direction
+        self._slow = self._fast = 0
+        return True
+
+
+class AdaptiveHands:
+    """hands.process() for BGR frames with crop-to-hand and quality control.
+
+    make_hands(model_complexity) returns a new MediaPipe Hands; one is kept
+    per (complexity, cropped or whole frame), so the tracking state of crop
+    frames and of whole-frame passes never mix.
+    """
+
+    def __init__(self, make_hands, max_hands=1, target_fps=TARGET_FPS, controller=None):
+        self.make_hands = make_hands
+        self.max_hands = max_hands
+        self.controller = controller or QualityController(target_fps)
+        self.crop = None
+        self._trackers = {}
+        self._missing = False
+        self._since_full = 0
+        self._last_call = None
+
+        self.frames = 0
+        self.crop_frames = 0
+        self.fallbacks = 0
+        self.landmark_seconds = 0.0
+        # The first frame is a whole-frame pass
+        self._tracker(self.controller.setting[1], False)
+
+    def _tracker(self, complexity, cropped):
+        key = (complexity, cropped)
+        if key not in self._trackers:
+            self._trackers[key] = self.make_hands(complexity)
+        return self._trackers[key]
+
+    def _track(self, frame, box, scale, complexity):
+        """MediaPipe result for frame[box], landmarks in full-frame coordinates"""
+        import cv2
+
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = box
+        image = frame[y0:y1, x0:x1]
+        cropped = (x1 - x0, y1 - y0) != (width, height)
+        if cropped:
+            scale = max(scale, min(ROI_MIN_SIDE / (x1 - x0), 1.0))
+        if scale < 1.0:
+            image = cv2.resize(image, (max(int((x1 - x0) * scale), 1), max(int((y1 - y0) * scale), 1)),
+                               interpolation=cv2.INTER_AREA)
+        result = self._tracker(complexity, cropped).process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        if cropped and result.multi_hand_landmarks:
+            for hand in result.multi_hand_landmarks:
+                for lm in hand.landmark:
+                    lm.x = (x0 + lm.x * (x1 - x0)) / width
+                    lm.y = (y0 + lm.y * (y1 - y0)) / height
+        return result
+
+    def process(self, frame):
+        """hands.process() result for one (mirrored) BGR frame"""
+        start = time.perf_counter()
+        height, width = frame.shape[:2]
+        scale, complexity = self.controller.setting
+        whole = (0, 0, width, height)
+
+        use_crop = self.crop is not None and not (self._missing and self._since_full >= REDETECT_EVERY)
+        result = None
+        if use_crop:
+            self.crop_frames += 1
+            self._since_full += 1
+            result = self._track(frame, self.crop, scale, complexity)
+            if not result.multi_hand_landmarks:
+                self.fallbacks += 1  # lost inside the crop: look at the whole frame
+        if result is None or not result.multi_hand_landmarks:
+            self._since_full = 0
+            result = self._track(frame, whole, scale * FALLBACK_SCALE, complexity)
+
+        if result.multi_hand_landmarks:
+            box = hands_box(result, width, height)
+            fitted = roi_box(box, width, height)
+            # Keep the crop unless a hand nears its edge or it is twice the size needed
+            if (self.crop is None or not inside(box, self.crop)
+                    or self.crop[2] - self.crop[0] > 2 * (fitted[2] - fitted[0])):
+                self.crop = fitted
+            self._missing = len(result.multi_hand_landmarks) < self.max_hands
+        else:
+            self.crop = None
+
+        now = time.perf_counter()
+        elapsed = now - start
+        self.frames += 1
+        self.landmark_seconds += elapsed
+        if self._last_call is not None:
+            self.controller.observe(now - self._last_call, elapsed)
+        self._last_call = now
+        return result
+
+    def stats(self):
+        scale, complexity = self.controller.setting
+        return {
+            'frames': self.frames,
+            'crop_ratio': self.crop_frames / self.frames if self.frames else 0.0,
+            'fallbacks': self.fallbacks,
+            'landmark_ms': self.landmark_seconds / self.frames * 1000.0 if self.frames else 0.0,
+            'scale': scale,
+            'model_complexity': complexity,
+            'level_changes': self.controller.changes
+        }
+
+    def describe(self):
+        stats = self.stats()
+        return (f"crop {stats['crop_ratio']:.0%}, scale {stats['scale']:.2f}, "
+                f"complexity {stats['model_complexity']}")
+
+
+# === Replays: fixed vs adaptive on recorded clips ===
+def replay_clip(path, model, unknown, process, flip=True, every=1):
+    """(first hand's row or None, its label, landmark seconds) per frame of a clip"""
+    import cv2
+    from multi_hand import classify_hands, detected_hands, landmark_row
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f'Could not open video {path}')
+    frames = []
+    index = 0
+    try:
+        while cap.grab():
+            index += 1
+            if (index - 1) % every:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            if flip:
+                # Mirrored, like the live webcam frames
+                frame = cv2.flip(frame, 1)
+            start = time.perf_counter()
+            result = process(frame)
+            elapsed = time.perf_counter() - start
+
+            rows = [landmark_row(hand) for _, hand in detected_hands(result)]
+            if rows:
+                # Every hand in one call, as detect_sign.py does; the first is scored
+                prediction = classify_hands(model, rows, 1, unknown)[0][0]
+                frames.append((rows[0], prediction, elapsed))
+            else:
+                frames.append((None, None, elapsed))
+    finally:
+        cap.release()
+    return frames
+
+
+def summarize(frames, labels, reference=None):
+    """Detection rate, speed and accuracy of replayed frames (one label per
+    frame); with the fixed-mode frames as reference also agreement with them
+    and the mean size-normalized landmark deviation (motion_gate.hand_motion)"""
+    from motion_gate import hand_motion
+
+    detected = [(frame, label) for frame, label in zip(frames, labels) if frame[0] is not None]
+    seconds = sum(frame[2] for frame in frames)
+    summary = {
+        'frames': len(frames),
+        'hand_rate': len(detected) / len(frames) if frames else 0.0,
+        'landmark_ms': seconds / len(frames) * 1000.0 if frames else 0.0,
+        'fps': len(frames) / seconds if seconds else 0.0,
+        'accuracy': (sum(frame[1] == label for frame, label in detected) / len(detected)
+                     if detected else 0.0)
+    }
+    if reference is not None:
+        both = [(a, b) for a, b in zip(reference, frames) if a[0] is not None and b[0] is not None]
+        summary['agreement'] = sum(a[1] == b[1] for a, b in both) / len(both) if both else 0.0
+        summary['landmark_error'] = (float(np.mean([hand_motion(a[0], b[0]) for a, b in both]))
+                                     if both else 0.0)
+    return summary
+
+
+def format_summary(mode, summary):
+    line = (f"   {mode:<9s} {summary['fps']:6.1f} fps  {summary['landmark_ms']:6.1f} ms  "
+            f"hands {summary['hand_rate']:6.1%}  accuracy {summary['accuracy']:6.1%}")
+    if 'agreement' in summary:
+        line += (f"  agreement {summary['agreement']:6.1%}  "
+                 f"landmark error {summary['landmark_error']:.3f}")
+    return line
+
+
+def replay(root, model_path='model.pkl', target_fps=TARGET_FPS, max_hands=1, flip=True,
+           every=1, log_path=LOG_PATH):
+    """Fixed vs adaptive tracking over every clip under root; returns the log entry"""
+    import cv2
+    from cascade import serving_model
+    from forest_file import load_serving_bundle
+    from ingest_media import VIDEO_EXTENSIONS, find_media
+
+    bundle = load_serving_bundle(model_path)
+    model = serving_model(bundle)
+    unknown = bundle.get('unknown')
+
+    fixed_frames, adaptive_frames, labels = [], [], []
+    for path, label in find_media(root):
+        if os.path.splitext(path)[1].lower() not in VIDEO_EXTENSIONS:
+            continue
+        # Fresh trackers per clip; fixed mode is detect_sign.py without --adaptive
+        fixed = mediapipe_hands(LEVELS[START_LEVEL][1], max_hands)
+        adaptive = AdaptiveHands(lambda complexity: mediapipe_hands(complexity, max_hands),
+                                 max_hands, target_fps)
+        reference = replay_clip(path, model, unknown,
+                                lambda frame: fixed.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)),
+                                flip, every)
+        frames = replay_clip(path, model, unknown, adaptive.process, flip, every)
+        fixed_frames.extend(reference)
+        adaptive_frames.extend(frames)
+        labels.extend([label] * len(frames))
+        print(f"🎞️ {os.path.relpath(path, root)} ({len(frames)} frames, {adaptive.describe()})")
+
+    entry = {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'root': root,
+        'model': model_path,
+        'target_fps': target_fps,
+        'max_hands': max_hands,
+        'every': every,
+        'fixed': summarize(fixed_frames, labels),
+        'adaptive': summarize(adaptive_frames, labels, fixed_frames)
+    }
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+    return entry
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Replay recorded clips with fixed and adaptive tracking')
+    parser.add_argument('root', help='folder with one sub-folder of clips per label')
+    parser.add_argument('--model', default='model.pkl')
+    parser.add_argument('--target-fps', type=float, default=TARGET_FPS)
+    parser.add_argument('--max-hands', type=int, default=1)
+    parser.add_argument('--every', type=int, default=1, help='replay every Nth frame')
+    parser.add_argument('--no-flip', action='store_true', help='clips are already mirrored')
+    parser.add_argument('--log', default=LOG_PATH)
+    args = parser.parse_args()
+
+    entry = replay(args.root, args.model, args.target_fps, args.max_hands,
+                   not args.no_flip, args.every, args.log)
+    print(f"📊 {entry['fixed']['frames']} frames, target {args.target_fps:.0f} fps")
+    print(format_summary('fixed', entry['fixed']))
+    print(format_summary('adaptive', entry['adaptive']))
+    print(f"📝 Logged to {args.log}")
@@ -1,45 +1,271 @@
+from startup_timing import StartupTimer
+
+# Created before anything heavy is imported, so the startup report (printed
+# once the model is loaded, and returned by /api/ready) covers the imports
+startup = StartupTimer()
+
 from flask import Flask, render_template, request, jsonify, Response
+startup.mark('import flask')
 import numpy as np
-import joblib
-import pandas as pd
+startup.mark('import numpy')
 import json
 import os
-import csv
+import queue
+import threading
 from datetime import datetime
 
+from batcher import MicroBatcher
+from cascade import CascadeModel, serving_model, serving_unknown
+from forest_engine import EarlyExitForest
+from gesture_store import open_store
+from gesture_writer import GestureWriter, WriteFailed
+from hand_pool import ExtractTimeout, HandPool, PoolBusy, frames_from_request
+from forest_file import load_serving_bundle
+from motion_gate import MotionGateRegistry
+from multi_hand import check_landmarks, hand_tag, left_first, parse_hands
+from prediction_cache import PredictionCache
+from rejection import TOP_K, rejected, response_fields, top_k
+from stream_session import StreamSession
+from temporal import MIN_FRAMES, TEMPORAL_MODEL_PATH, TemporalRegistry, load_temporal
+from wire_format import decode_frames, is_binary, labels_version, predictions_response, wants_binary
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+    print("⚠️ flask-sock is not installed: /ws/predict streaming is disabled "
+          "(pip install -r requirements.txt), clients will use /api/predict")
+startup.mark('import app modules')
+
 app = Flask(__name__)
 
-# Global variables
-model = None
-labels = []
+# Streaming predictions over a WebSocket (/ws/predict) when flask-sock is
+# installed; clients fall back to /api/predict otherwise
+sock = Sock(app) if Sock is not None else None
+stream_sessions = {}
+stream_sessions_lock = threading.Lock()
+
+# Global variables: the served (model, labels) pair. It is only ever
+# replaced as a whole by swap_model(), so a request that reads `served` once
+# can never see a new model with old labels or vice versa.
+MODEL_PATH = 'model.pkl'
+served = (None, [])
+served_lock = threading.Lock()
+
+# Set when the first model load has finished, model found or not. The server
+# accepts requests while the model loads in the background; until then
+# prediction endpoints answer 503 and /api/ready reports "loading".
+model_ready = threading.Event()
+
+# Upper bound on frames accepted by /api/predict_batch in one call
+MAX_BATCH_FRAMES = 256
+
+# Two-stage cascade: a small first-stage forest answers the frames it is
+# confident about (threshold calibrated at training time), the rest go to
+# the full forest. Off by default: predictions then match detect_sign.py
+# exactly, and most requests are a single frame, where a first-stage miss
+# runs both forests. It pays off on large /api/predict_batch calls (on the
+# gestures.csv model, 500-frame batches: ~18 vs ~54 us/frame) at the cost
+# of the first stage's ~1% disagreement with the full forest.
+CASCADE_ENABLED = False
+
+# Early-exit forest evaluation: trees are walked in chunks and a frame stops
+# once no remaining tree can change its label. With EARLY_EXIT_MARGIN = None
+# labels are identical to the full forest (confidences of frames that stop
+# early are averaged over the trees walked); a margin such as 0.3 stops as
+# soon as the leading class is that far ahead - far fewer trees, labels may
+# rarely differ.
+EARLY_EXIT_ENABLED = False
+EARLY_EXIT_MARGIN = None
+
+# Every prediction carries the rejection.TOP_K best labels with their
+# probabilities, all from one predict_proba call. With UNKNOWN_REJECTION a
+# frame whose best probability is below that class's threshold (calibrated
+# at training time on the served model, see rejection.py) is answered
+# "unknown" instead; bundles trained before the thresholds existed never
+# reject.
+UNKNOWN_REJECTION = True
+unknown_thresholds = None
+
+# Two hands per frame: /api/predict and /api/save_gesture take a "hands"
+# list of up to MAX_HANDS {"landmarks", "handedness"} entries. Each hand is
+# classified on its own, all of a request's hands in one model call.
+MAX_HANDS = 2
+
+# Micro-batching: concurrent /api/predict calls arriving within this window
+# (or until this many rows are queued) share one predict_proba call
+BATCH_WINDOW_MS = 2.0
+BATCH_MAX_ROWS = 64
+batcher = MicroBatcher(lambda: served[0], window_ms=BATCH_WINDOW_MS, max_rows=BATCH_MAX_ROWS)
+
+# Prediction cache for near-identical frames; CACHE_STEP is the landmark
+# quantization grid (normalized image units). Set CACHE_ENABLED = False to
+# always run the model.
+CACHE_ENABLED = True
+CACHE_STEP = 0.005
+CACHE_MAX_ENTRIES = 4096
+CACHE_MAX_BYTES = 4 * 1024 * 1024
+prediction_cache = PredictionCache(CACHE_STEP, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES) if CACHE_ENABLED else None
+
+# Motion gating for clients that send a session id (/api/predict "session",
+# /ws/predict ?session=): while the hand moves less than MOTION_THRESHOLD
+# (RMS landmark shift / hand size) the session's last prediction is reused,
+# but the model runs again after MOTION_REFRESH_EVERY gated frames.
+MOTION_GATE_ENABLED = True
+MOTION_THRESHOLD = 0.02
+MOTION_REFRESH_EVERY = 15
+motion_gates = MotionGateRegistry(MOTION_THRESHOLD, MOTION_REFRESH_EVERY) if MOTION_GATE_ENABLED else None
+
+# Gesture dataset: binary store, imported from gestures.csv on first use.
+# /api/save_gesture goes through one background writer that batches rows;
+# SAVE_DURABILITY is 'flush' (OS write per batch) or 'fsync' (disk sync
+# every SAVE_FSYNC_EVERY rows).
+SAVE_DURABILITY = 'flush'
+SAVE_FSYNC_EVERY = 1000
+SAVE_QUEUE_SIZE = 10000
+gesture_store = None
+gesture_writer = None
+gesture_store_lock = threading.Lock()
+
+# Server-side landmark extraction for /api/predict_frame. Each worker thread
+# owns its MediaPipe Hands objects; a full worker queue answers 503.
+HAND_POOL_WORKERS = 2
+HAND_POOL_QUEUE = 8          # requests waiting per worker
+HAND_POOL_SESSIONS = 4       # tracking sessions kept per worker
+MAX_UPLOAD_FRAMES = 16       # frames per /api/predict_frame request
+FRAME_TIMEOUT = 5.0          # seconds
+hand_pool = None
+
+# Sliding-window mode (/api/predict with "mode": "temporal"): one ring buffer
+# of recent frames per session, classified by temporal_model.pkl
+# (python temporal.py train). Loaded on the first temporal request.
+temporal_sessions = None
+
+def get_gesture_store():
+    """Open the gesture store once per process"""
+    global gesture_store
+    with gesture_store_lock:
+        if gesture_store is None:
+            gesture_store = open_store()
+        return gesture_store
+
+def get_gesture_writer():
+    """Start the background gesture writer once per process"""
+    global gesture_writer
+    store = get_gesture_store()
+    with gesture_store_lock:
+        if gesture_writer is None:
+            gesture_writer = GestureWriter(store, max_queue=SAVE_QUEUE_SIZE,
+                                           durability=SAVE_DURABILITY,
+                                           fsync_every=SAVE_FSYNC_EVERY)
+        return gesture_writer
+
+def get_hand_pool():
+    """Start the landmark worker pool once per process (imports MediaPipe)"""
+    global hand_pool
+    with gesture_store_lock:
+        if hand_pool is None:
+            hand_pool = HandPool(workers=HAND_POOL_WORKERS, queue_size=HAND_POOL_QUEUE,
+                                 max_sessions=HAND_POOL_SESSIONS)
+        return hand_pool
+
+def get_temporal_sessions():
+    """Load the sequence model and its per-session buffers once per process"""
+    global temporal_sessions
+    with gesture_store_lock:
+        if temporal_sessions is None:
+            model, window = load_temporal(TEMPORAL_MODEL_PATH)
+            temporal_sessions = TemporalRegistry(model, window)
+        return temporal_sessions
+
+def swap_model(new_model, new_labels, unknown=None):
+    """Publish a new model/labels pair in one assignment"""
+    global served, unknown_thresholds
+    with served_lock:
+        # Thresholds are keyed by label, so they can't mismatch the model
+        unknown_thresholds = unknown
+        served = (new_model, list(new_labels))
+        # Cached predictions belong to the old model
+        if prediction_cache is not None:
+            prediction_cache.clear()
+        if motion_gates is not None:
+            motion_gates.clear()
+
+def load_served_model():
+    """Load the model bundle and swap it in"""
+    bundle = load_serving_bundle(MODEL_PATH)
+    # Compiled forest (same predictions as the pickled sklearn model), read
+    # from the memory-mapped model.forest when it is current, behind the
+    # bundle's two-stage cascade when CASCADE_ENABLED
+    model = serving_model(bundle, cascade=CASCADE_ENABLED, early_exit=EARLY_EXIT_ENABLED,
+                          margin=EARLY_EXIT_MARGIN)
+    swap_model(model, bundle['classes'],
+               serving_unknown(bundle, model) if UNKNOWN_REJECTION else None)
+    return bundle
 
 def initialize_model():
     """Initialize the ML model - EXACTLY like detect_sign.py"""
-    global model, labels
-
     try:
-        # Load the trained model (same as detect_sign.py)
-        if os.path.exists('model.pkl'):
-            model = joblib.load('model.pkl')
+        # Load the trained model bundle (same as detect_sign.py); the class
+        # list comes from the bundle, so gestures.csv isn't read at startup
+        if os.path.exists(MODEL_PATH):
+            with startup.step('load model'):
+                load_served_model()
+            model, labels = served
             print("✅ Model loaded successfully")
             print(f"Model type: {type(model)}")
-        else:
-            print("❌ model.pkl not found!")
-            model = None
-
-        # Load labels from training data (same as detect_sign.py)
-        if os.path.exists('gestures.csv'):
-            data = pd.read_csv('gestures.csv', header=None)
-            labels = sorted(data.iloc[:, -1].unique())
             print(f"✅ Labels loaded ({len(labels)} total): {labels}")
         else:
-            print("❌ gestures.csv not found!")
-            labels = []
+            print("❌ model.pkl not found!")
+            swap_model(None, [])
 
     except Exception as e:
         print(f"❌ Error initializing: {e}")
-        model = None
-        labels = []
+        swap_model(None, [])
+    model_ready.set()
+    startup.ready()
+
+def initialize_model_in_background():
+    """Load the model in a thread so the server can start listening meanwhile"""
+    def load():
+        initialize_model()
+        print(startup.format())
+    threading.Thread(target=load, name='model-loader', daemon=True).start()
+
+def model_unavailable():
+    """Response for a prediction request while there is no model to serve"""
+    if not model_ready.is_set():
+        return jsonify({
+            'success': False,
+            'error': 'Model is still loading - retry shortly'
+        }), 503
+    return jsonify({
+        'success': False,
+        'error': 'Model not loaded - check model.pkl file'
+    })
+
+def on_retrain_complete(result):
+    """Called by the retrain job once the new bundle is on disk"""
+    load_served_model()
+    print(f"✅ Retrained model swapped in (accuracy {result['accuracy']:.3f})")
+
+# Retraining runs in a separate process; queued saves are flushed first so
+# the job sees them. Created on the first retrain request (the training
+# modules are only imported then).
+retrain_manager = None
+
+def get_retrain_manager():
+    """Create the retrain job manager once per process"""
+    global retrain_manager
+    with gesture_store_lock:
+        if retrain_manager is None:
+            from retrain_jobs import RetrainManager
+            retrain_manager = RetrainManager(
+                on_complete=on_retrain_complete,
+                model_path=MODEL_PATH,
+                before_start=lambda: get_gesture_writer().flush(timeout=10.0)
+            )
+        return retrain_manager
 
 @app.route('/')
 def index():
@@ -54,43 +280,100 @@ def collect_data():
 @app.route('/detect')
 def real_time_detection():
     """Real-time detection page"""
-    return render_template('detect.html', labels=labels)
+    return render_template('detect.html', labels=served[1])
+
+def predict_rows(rows):
+    """[(result, cached)] for 42-value landmark rows.
+
+    result is rejection.top_k()'s (label, confidence, top TOP_K labels); the
+    label is detect_sign.py's model.predict([landmarks])[0] unless the frame
+    is rejected as unknown. Cache first; all misses are scored in one
+    micro-batched call.
+    """
+    unknown = unknown_thresholds
+    results = [None] * len(rows)
+    misses = []
+    keys = [None] * len(rows)
+    if prediction_cache is not None:
+        generation = prediction_cache.generation
+    for i, row in enumerate(rows):
+        if prediction_cache is not None:
+            keys[i] = prediction_cache.key(row)
+            result = prediction_cache.get(keys[i])
+            if result is not None:
+                results[i] = (result, True)
+                continue
+        misses.append(i)
+
+    if misses:
+        proba, classes = batcher.predict_proba([rows[i] for i in misses])
+        for j, i in enumerate(misses):
+            result = top_k(proba[j], classes, TOP_K, unknown)
+            if prediction_cache is not None:
+                prediction_cache.put(keys[i], result, generation)
+            results[i] = (result, False)
+    return results
 
 @app.route('/api/predict', methods=['POST'])
 def predict_gesture():
-    """API endpoint for gesture prediction - EXACTLY like detect_sign.py"""
+    """API endpoint for gesture prediction - same labels as detect_sign.py:
+    the model's best class, or "unknown" when its probability is below that
+    class's threshold (UNKNOWN_REJECTION)"""
     try:
+        if is_binary(request):
+            return predict_packed_frame()
+
         data = request.get_json()
         landmarks = data.get('landmarks', [])
+        if data.get('mode') == 'temporal':
+            return predict_temporal(data)
+        if 'hands' in data:
+            return predict_hands(data)
 
         print(f"🔍 API Debug - Received {len(landmarks)} landmarks")
+        if len(landmarks) == 42:
+            try:
+                check_landmarks(landmarks)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                })
+        model, labels = served
 
         if len(landmarks) == 42:
             if model is not None:
-                # EXACT same process as detect_sign.py line 74:
-                # prediction = model.predict([landmarks])[0]
-                prediction_array = model.predict([landmarks])
-                prediction = prediction_array[0]
+                # Clients that send a session id skip the model while the
+                # hand holds still
+                session = data.get('session')
+                gate = motion_gates.get(session) if session and motion_gates is not None else None
+                result = gate.check(landmarks) if gate is not None else None
+                gated = cached = result is not None
 
-                print(f"🧠 Model prediction: '{prediction}' (type: {type(prediction)})")
+                if not gated:
+                    # model.predict([landmarks])[0], or "unknown" when rejected -
+                    # like detect_sign.py - with the top-k probabilities from the
+                    # same call, cached and scored together with other requests
+                    result, cached = predict_rows([landmarks])[0]
+                    if gate is not None:
+                        gate.update(landmarks, result)
+
+                print(f"🧠 Model prediction: '{result[0]}' (confidence {result[1]:.2f})")
                 print(f"📊 Available labels: {labels}")
 
                 return jsonify({
                     'success': True,
-                    'prediction': str(prediction),  # Ensure string
-                    'confidence': 'high',
+                    **response_fields(result),
                     'debug_info': {
                         'landmarks_count': len(landmarks),
                         'model_type': str(type(model)),
-                        'prediction_type': str(type(prediction))
+                        'cached': cached,
+                        'gated': gated
                     }
                 })
             else:
                 print("❌ Model is None - not loaded properly")
-                return jsonify({
-                    'success': False,
-                    'error': 'Model not loaded - check model.pkl file'
-                })
+                return model_unavailable()
         else:
             print(f"❌ Wrong landmark count: {len(landmarks)}, expected 42")
             return jsonify({
@@ -107,20 +390,427 @@ def predict_gesture():
             'error': str(e)
         })
 
+def predict_hands(data):
+    """/api/predict with a "hands" list: one result per hand.
+
+    With a session id every hand has its own motion gate; the hands the
+    gates can't skip are scored together in one predict_rows() call.
+    """
+    try:
+        hands = parse_hands(data, MAX_HANDS)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+    if served[0] is None:
+        return model_unavailable()
+
+    session = data.get('session')
+    gates = [None] * len(hands)
+    results = [None] * len(hands)
+    for i, (handedness, landmarks) in enumerate(hands):
+        if session and motion_gates is not None:
+            gates[i] = motion_gates.get(f'{session}:{handedness or i}')
+            result = gates[i].check(landmarks)
+            if result is not None:
+                results[i] = (result, True, True)
+
+    misses = [i for i, result in enumerate(results) if result is None]
+    for i, (result, cached) in zip(misses, predict_rows([hands[i][1] for i in misses])):
+        if gates[i] is not None:
+            gates[i].update(hands[i][1], result)
+        results[i] = (result, cached, False)
+
+    print(f"🧠 Model prediction for {len(hands)} hands: {[result[0] for result, _, _ in results]}")
+    return jsonify({
+        'success': True,
+        'count': len(hands),
+        'hands': [{
+            'handedness': handedness,
+            **response_fields(result),
+            'cached': cached,
+            'gated': gated
+        } for (handedness, _), (result, cached, gated) in zip(hands, results)]
+    })
+
+@app.route('/api/stream')
+def stream_info():
+    """Whether streaming is available, where to connect, and live sessions"""
+    with stream_sessions_lock:
+        sessions = [session.stats() for session in stream_sessions.values()]
+    return jsonify({
+        'success': True,
+        'websocket': sock is not None,
+        'url': '/ws/predict' if sock is not None else None,
+        'fallback': '/api/predict',
+        'sessions': sessions
+    })
+
+if sock is not None:
+    @sock.route('/ws/predict')
+    def predict_stream(ws):
+        """One connection per client: frames in, predictions out"""
+        session_id = request.args.get('session')
+        gate = motion_gates.get(f'stream:{session_id or id(ws)}') if motion_gates is not None else None
+        session = StreamSession(predict_rows, ws.send, session_id, gate)
+        with stream_sessions_lock:
+            stream_sessions[id(session)] = session
+        try:
+            ws.send(json.dumps({'type': 'ready', 'session': session.session_id,
+                                'labels': served[1]}))
+            session.serve(ws.receive)
+        finally:
+            with stream_sessions_lock:
+                stream_sessions.pop(id(session), None)
+
+@app.route('/api/predict_frame', methods=['POST'])
+def predict_frame():
+    """API endpoint for gesture prediction from JPEG/PNG camera frames.
+
+    For clients that can't run MediaPipe: landmarks are extracted on the
+    server, then go through the same path as /api/predict. Pass a session id
+    to keep hand tracking across a client's consecutive frames.
+    """
+    try:
+        frames, session = frames_from_request(request)
+        if not frames:
+            return jsonify({
+                'success': False,
+                'error': 'No frames: upload "frame" files, an image body or base64 "frames"'
+            })
+        if len(frames) > MAX_UPLOAD_FRAMES:
+            return jsonify({
+                'success': False,
+                'error': f'Too many frames: {len(frames)}, maximum is {MAX_UPLOAD_FRAMES}'
+            })
+        if served[0] is None:
+            return model_unavailable()
+
+        mirror = request.args.get('mirror', '1') not in ('0', 'false')
+        try:
+            rows = get_hand_pool().extract(frames, session, mirror, timeout=FRAME_TIMEOUT)
+        except PoolBusy:
+            return jsonify({
+                'success': False,
+                'error': 'Frame workers are busy, try again shortly'
+            }), 503
+        except ExtractTimeout as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 504
+
+        hands = [i for i, row in enumerate(rows) if row is not None]
+        predictions = dict(zip(hands, predict_rows([rows[i] for i in hands])))
+
+        results = []
+        for i, row in enumerate(rows):
+            if row is None:
+                results.append({'hand_detected': False, 'prediction': None})
+            else:
+                result, cached = predictions[i]
+                results.append({
+                    'hand_detected': True,
+                    **response_fields(result),
+                    'landmarks': row,
+                    'cached': cached
+                })
+
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'session': session,
+            'results': results
+        })
+
+    except Exception as e:
+        print(f"❌ Frame prediction error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/hand_pool/stats')
+def hand_pool_stats():
+    """Queue depth, frame counts and tracking sessions per landmark worker"""
+    return jsonify({
+        'success': True,
+        'stats': hand_pool.stats() if hand_pool is not None else {}
+    })
+
+def predict_temporal(data):
+    """/api/predict in sliding-window mode: classify the session's recent frames"""
+    session = data.get('session')
+    landmarks = data.get('landmarks', [])
+    if not session:
+        return jsonify({
+            'success': False,
+            'error': 'Temporal mode needs a "session" id'
+        })
+    if not os.path.exists(TEMPORAL_MODEL_PATH) and temporal_sessions is None:
+        return jsonify({
+            'success': False,
+            'error': f'{TEMPORAL_MODEL_PATH} not found - run python temporal.py train'
+        })
+
+    state = get_temporal_sessions().get(session)
+    # Send "reset": true (or no landmarks) when the hand leaves the frame
+    if data.get('reset') or not landmarks:
+        state.reset()
+        return jsonify({
+            'success': True,
+            'prediction': None,
+            'frames': 0
+        })
+    try:
+        check_landmarks(landmarks)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+    result = state.push(landmarks)
+    if result is None:
+        return jsonify({
+            'success': True,
+            'prediction': None,
+            'warming_up': True,
+            'frames': len(state.ring),
+            'frames_needed': MIN_FRAMES
+        })
+    prediction, confidence = result
+    return jsonify({
+        'success': True,
+        'prediction': str(prediction),
+        'confidence': confidence,
+        'frames': len(state.ring)
+    })
+
+def predict_packed_frame():
+    """/api/predict for one packed float32 frame (wire_format.LANDMARKS_MIME)"""
+    X, error = parse_frames(1)
+    if error is not None:
+        return error
+    if served[0] is None:
+        return model_unavailable()
+
+    # Straight to the micro-batcher: a binary reply needs the probabilities
+    unknown = unknown_thresholds
+    proba, classes = batcher.predict_proba(X)
+    if wants_binary(request):
+        return predictions_response(proba, classes, rejected(proba, classes, unknown))
+    return jsonify({
+        'success': True,
+        **response_fields(top_k(proba[0], classes, TOP_K, unknown))
+    })
+
+@app.route('/api/ready')
+def readiness():
+    """Readiness probe: 200 once the model is loaded, 503 until then.
+
+    Includes the startup report (import and initialization steps, ms).
+    """
+    if served[0] is not None:
+        return jsonify({
+            'success': True,
+            'ready': True,
+            'labels': len(served[1]),
+            'startup': startup.report()
+        })
+    return jsonify({
+        'success': False,
+        'ready': False,
+        'error': ('Model not loaded - check model.pkl file' if model_ready.is_set()
+                  else 'Model is still loading'),
+        'startup': startup.report()
+    }), 503
+
+@app.route('/api/labels')
+def get_labels():
+    """Label list that packed prediction indices refer to"""
+    labels = served[1]
+    return jsonify({
+        'success': True,
+        'labels': labels,
+        'labels_version': labels_version(labels)
+    })
+
+@app.route('/api/motion_gate/stats')
+def motion_gate_stats():
+    """Frames scored vs. answered from the motion gate, over all sessions"""
+    return jsonify({
+        'success': True,
+        'enabled': motion_gates is not None,
+        'stats': motion_gates.stats() if motion_gates is not None else {}
+    })
+
+@app.route('/api/cascade/stats')
+def cascade_stats():
+    """Share of frames answered by the cascade's first stage"""
+    model = served[0]
+    enabled = isinstance(model, CascadeModel)
+    return jsonify({
+        'success': True,
+        'enabled': enabled,
+        'stats': model.stats() if enabled else {}
+    })
+
+@app.route('/api/early_exit/stats')
+def early_exit_stats():
+    """Average trees walked per prediction by the early-exit forest"""
+    model = served[0]
+    forest = model.full if isinstance(model, CascadeModel) else model
+    enabled = isinstance(forest, EarlyExitForest)
+    return jsonify({
+        'success': True,
+        'enabled': enabled,
+        'stats': forest.stats() if enabled else {}
+    })
+
+@app.route('/api/batcher/stats')
+def batcher_stats():
+    """Queue depth and batch size of the /api/predict micro-batcher"""
+    return jsonify({
+        'success': True,
+        'stats': batcher.stats()
+    })
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters of the /api/predict cache"""
+    return jsonify({
+        'success': True,
+        'enabled': prediction_cache is not None,
+        'stats': prediction_cache.stats() if prediction_cache is not None else {}
+    })
+
+@app.route('/api/save_gesture/stats')
+def save_gesture_stats():
+    """Queue depth and write counters of the background gesture writer"""
+    return jsonify({
+        'success': True,
+        'stats': get_gesture_writer().stats()
+    })
+
+def parse_frames(max_frames):
+    """(N x 42 float32 frames, None) or (None, error response) for a request.
+
+    Accepts {"frames": [[...], ...]} JSON or a packed float32 body
+    (wire_format.LANDMARKS_MIME), which is used in place without parsing.
+    """
+    if is_binary(request):
+        try:
+            return decode_frames(request.get_data(), max_frames), None
+        except ValueError as e:
+            return None, jsonify({
+                'success': False,
+                'error': str(e)
+            })
+
+    data = request.get_json()
+    frames = data.get('frames', [])
+
+    # Validate the whole N x 42 block in one vectorized pass
+    try:
+        X = np.asarray(frames, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None, jsonify({
+            'success': False,
+            'error': 'Frames must be a list of 42-value landmark lists'
+        })
+
+    if X.ndim != 2 or X.shape[1] != 42 or len(X) == 0:
+        return None, jsonify({
+            'success': False,
+            'error': f'Invalid frames shape: {list(X.shape)}, expected N x 42'
+        })
+    if len(X) > max_frames:
+        return None, jsonify({
+            'success': False,
+            'error': f'Too many frames: {len(X)}, maximum is {max_frames}'
+        })
+    if not np.isfinite(X).all():
+        return None, jsonify({
+            'success': False,
+            'error': 'Frames contain NaN or infinite values'
+        })
+    return X, None
+
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_gesture_batch():
+    """API endpoint for batched prediction - one model call for N frames"""
+    try:
+        X, error = parse_frames(MAX_BATCH_FRAMES)
+        if error is not None:
+            return error
+        model = served[0]
+        if model is None:
+            return model_unavailable()
+
+        # One predict_proba call for every row; argmax over it is exactly
+        # what model.predict() returns, so we don't evaluate the forest twice
+        unknown = unknown_thresholds
+        proba = model.predict_proba(X)
+        if wants_binary(request):
+            return predictions_response(proba, model.classes_,
+                                        rejected(proba, model.classes_, unknown))
+
+        return jsonify({
+            'success': True,
+            'count': len(X),
+            'predictions': [
+                response_fields(top_k(row, model.classes_, TOP_K, unknown)) for row in proba
+            ]
+        })
+
+    except Exception as e:
+        print(f"❌ Batch prediction error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/api/save_gesture', methods=['POST'])
 def save_gesture():
     """API endpoint to save gesture data"""
     try:
+        if is_binary(request):
+            return save_packed_gestures()
+
         data = request.get_json()
-        landmarks = data.get('landmarks', [])
         label = data.get('label', '')
+        try:
+            hands = left_first(parse_hands(data, MAX_HANDS))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid data: {e}'
+            }), 400
         
-        if len(landmarks) == 42 and label:
-            # Save to CSV
-            csv_file = 'gestures.csv'
-            with open(csv_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(landmarks + [label])
+        if hands and label:
+            # Queue for the background writer; the request doesn't touch disk.
+            # The two hands of one capture are stored as consecutive rows.
+            writer = get_gesture_writer()
+            paired = len(hands) > 1
+            try:
+                seq = writer.submit_group([landmarks for _, landmarks in hands], label,
+                                          [hand_tag(handedness, paired) for handedness, _ in hands])
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid data: {e}'
+                }), 400
+            except queue.Full:
+                return jsonify({
+                    'success': False,
+                    'error': 'Too many gestures queued, try again shortly'
+                }), 503
+
+            # Clients that need the row on disk before continuing can wait
+            if data.get('wait') and not writer.wait_for(seq, timeout=5.0):
+                return write_pending()
             
             return jsonify({
                 'success': True,
@@ -132,49 +822,102 @@ def save_gesture():
                 'error': 'Invalid data'
             })
     
+    except WriteFailed as e:
+        return jsonify({
+            'success': False,
+            'error': f'Gesture could not be saved: {e}'
+        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         })
 
+def write_pending():
+    """Response for a save with "wait" whose rows aren't on disk in time"""
+    return jsonify({
+        'success': False,
+        'error': 'Gesture queued but not written yet - the writer is behind'
+    }), 504
+
+def save_packed_gestures():
+    """/api/save_gesture for packed float32 rows; the label is ?label="""
+    label = request.args.get('label', '')
+    X, error = parse_frames(MAX_BATCH_FRAMES)
+    if error is not None:
+        return error
+    if not label:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid data: pass the label as ?label='
+        })
+
+    writer = get_gesture_writer()
+    first = seq = None
+    for saved, row in enumerate(X):
+        try:
+            seq = writer.submit(row, label)
+            first = first or seq
+        except queue.Full:
+            return jsonify({
+                'success': False,
+                'saved': saved,
+                'error': 'Too many gestures queued, try again shortly'
+            }), 503
+
+    if request.args.get('wait') not in (None, '0', 'false'):
+        try:
+            if not writer.wait_for(seq, timeout=5.0, first=first):
+                return write_pending()
+        except WriteFailed as e:
+            return jsonify({
+                'success': False,
+                'error': f'Gestures could not be saved: {e}'
+            }), 500
+
+    return jsonify({
+        'success': True,
+        'saved': len(X),
+        'message': f'{len(X)} "{label}" gestures saved successfully'
+    })
+
 @app.route('/api/retrain', methods=['POST'])
 def retrain_model():
-    """API endpoint to retrain the model"""
+    """API endpoint to start a background retrain job"""
     try:
-        # Import training logic
-        from sklearn.model_selection import train_test_split
-        from sklearn.ensemble import RandomForestClassifier
-        from sklearn.metrics import classification_report
-        
-        # Load data
-        data = pd.read_csv('gestures.csv', header=None)
-        X = data.iloc[:, :-1]
-        y = data.iloc[:, -1]
-        
-        # Split and train
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        clf = RandomForestClassifier()
-        clf.fit(X_train, y_train)
-        
-        # Evaluate
-        y_pred = clf.predict(X_test)
-        accuracy = (y_pred == y_test).mean()
-        
-        # Save model
-        joblib.dump(clf, 'model.pkl')
-        
-        # Reload the model globally
-        global model, labels
-        model = clf
-        labels = sorted(y.unique())
-        
+        data = request.get_json(silent=True) or {}
+
+        # Returns the running/queued job if one already covers this request
+        # mode: 'auto' (incremental when possible), 'incremental' or 'full'
+        job = get_retrain_manager().submit(data.get('mode', 'auto'))
+
+        if data.get('wait'):
+            # Old blocking behaviour for clients that want the result inline
+            job = get_retrain_manager().wait(job['id'], timeout=data.get('timeout', 600))
+            if job['status'] == 'done':
+                return jsonify({
+                    'success': True,
+                    'message': 'Model retrained successfully',
+                    'job_id': job['id'],
+                    'accuracy': job['result']['accuracy'],
+                    'total_samples': job['result']['total_samples'],
+                    'mode': job['result']['mode'],
+                    'reason': job['result']['reason']
+                })
+            return jsonify({
+                'success': False,
+                'job_id': job['id'],
+                'status': job['status'],
+                'error': job['error'] or 'Retrain still running'
+            })
+
         return jsonify({
             'success': True,
-            'message': 'Model retrained successfully',
-            'accuracy': float(accuracy),
-            'total_samples': len(data)
-        })
+            'message': 'Retrain started',
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': f"/api/retrain/{job['id']}"
+        }), 202
     
     except Exception as e:
         return jsonify({
@@ -182,11 +925,33 @@ def retrain_model():
             'error': str(e)
         })
 
+@app.route('/api/retrain/<job_id>')
+def retrain_status(job_id):
+    """Progress of a retrain job"""
+    job = get_retrain_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown retrain job: {job_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+startup.mark('app setup')
+
 if __name__ == '__main__':
-    # Initialize the model
+    from werkzeug.serving import is_running_from_reloader
+
     print("🚀 Starting SILEXA Web Application...")
-    initialize_model()
+    debug = True
+    # With debug=True this process only runs the reloader, which restarts a
+    # child that serves; only that child needs the model. It starts loading
+    # it while the server comes up (GET /api/ready tells when it's done).
+    if not debug or is_running_from_reloader():
+        initialize_model_in_background()
 
     # Run the Flask app
     print("🌐 Starting Flask server on http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=debug, host='0.0.0.0', port=5000)
@@ -0,0 +1,153 @@
+"""
+Micro-batching scheduler for /api/predict
+
+Request threads hand their rows to a single scheduler thread which waits a
+short window (or until enough rows arrive), runs ONE predict_proba call for
+everything collected, and hands each caller back its own rows.
+"""
+import threading
+import time
+
+import numpy as np
+
+
+class _PendingRequest:
+    """Rows submitted by one caller plus the slot its result goes into"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.done = threading.Event()
+        self.proba = None
+        self.classes = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects concurrent prediction requests into batched model calls"""
+
+    def __init__(self, get_model, window_ms=2.0, max_rows=64, timeout=5.0):
+        # get_model is called once per batch so a retrained model is
+        # picked up without restarting the scheduler
+        self.get_model = get_model
+        self.window = window_ms / 1000.0
+        self.max_rows = max_rows
+        self.timeout = timeout
+
+        self._pending = []
+        self._pending_rows = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        # Stats
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self.max_batch_rows = 0
+        self.last_batch_rows = 0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def predict_proba(self, rows):
+        """Queue rows (N x 42) and block until their batch has been scored.
+
+        Returns (proba, classes) taken from the same model so the caller
+        can map argmax indices back to labels consistently.
+        """
+        if not self._running:
+            self.start()
+
+        request = _PendingRequest(np.asarray(rows, dtype=np.float32).reshape(-1, 42))
+        with self._cond:
+            self._pending.append(request)
+            self._pending_rows += len(request.rows)
+            self._cond.notify_all()
+
+        if not request.done.wait(self.timeout):
+            raise TimeoutError('Prediction batch timed out')
+        if request.error is not None:
+            raise request.error
+        return request.proba, request.classes
+
+    def _take_batch(self):
+        """Wait for the first request, then hold the window open"""
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._running:
+                return []
+
+            deadline = time.perf_counter() + self.window
+            while self._pending_rows < self.max_rows:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._running:
+                    break
+                self._cond.wait(remaining)
+
+            batch, self._pending = self._pending, []
+            self._pending_rows = 0
+            return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+
+            try:
+                model = self.get_model()
+                if model is None:
+                    raise RuntimeError('Model not loaded - check model.pkl file')
+                X = np.concatenate([r.rows for r in batch]) if len(batch) > 1 else batch[0].rows
+                proba = model.predict_proba(X)
+                classes = model.classes_
+            except Exception as e:
+                for r in batch:
+                    r.error = e
+                    r.done.set()
+                continue
+
+            start = 0
+            for r in batch:
+                end = start + len(r.rows)
+                r.proba = proba[start:end]
+                r.classes = classes
+                r.done.set()
+                start = end
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.rows += len(X)
+            self.last_batch_rows = len(X)
+            self.max_batch_rows = max(self.max_batch_rows, len(X))
+
+    def stats(self):
+        with self._cond:
+            queue_requests = len(self._pending)
+            queue_rows = self._pending_rows
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_rows': self.max_rows,
+            'queue_depth': queue_requests,
+            'queue_rows': queue_rows,
+            'batches': self.batches,
+            'requests': self.requests,
+            'rows': self.rows,
+            'avg_batch_rows': self.rows / self.batches if self.batches else 0.0,
+            'last_batch_rows': self.last_batch_rows,
+            'max_batch_rows': self.max_batch_rows
+        }
@@ -0,0 +1,184 @@
+"""
+Two-stage prediction cascade
+
+Most frames are clear, well separated poses that a much smaller model gets
+right. Training builds a first stage - a tiny random forest (FIRST_STAGE_TREES
+trees, at most FIRST_STAGE_DEPTH deep) - and calibrates a confidence
+threshold on held-out rows: the lowest threshold at which the first stage
+still agrees with the full forest on TARGET_AGREEMENT of the frames it
+answers. At prediction time frames at or above the threshold are answered by
+the first stage, the rest go to the full forest.
+
+The first stage, threshold and the held-out report (hit rate, accuracy delta
+vs. the full model) are stored in the model bundle under 'cascade', together
+with unknown-rejection thresholds calibrated on the cascade itself (its
+first-stage confidences are not the full forest's).
+
+(A nearest-centroid or single shallow tree first stage was tried: on
+gestures.csv neither reaches 99% agreement with the forest at any threshold,
+so nothing would ever be answered early.)
+"""
+import threading
+
+import numpy as np
+
+from rejection import calibrate_unknown
+
+FIRST_STAGE_TREES = 10
+FIRST_STAGE_DEPTH = 10
+TARGET_AGREEMENT = 0.99
+
+
+def calibrate_threshold(confidence, agrees, target=TARGET_AGREEMENT):
+    """Lowest confidence threshold whose accepted frames agree >= target.
+
+    Returns inf (first stage never answers) when no threshold qualifies.
+    """
+    for threshold in np.unique(confidence):
+        if agrees[confidence >= threshold].mean() >= target:
+            return float(threshold)
+    return float('inf')
+
+
+def build_cascade(model, X_train, y_train, X_holdout, y_holdout,
+                  target=TARGET_AGREEMENT, random_state=42):
+    """Fit the first stage and calibrate it against `model`.
+
+    The held-out rows are split in half: one half sets the threshold, the
+    other measures hit rate and accuracy. Returns the bundle entry, or None
+    if the first stage can't stand in for `model`.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    first = RandomForestClassifier(n_estimators=FIRST_STAGE_TREES, max_depth=FIRST_STAGE_DEPTH,
+                                   random_state=random_state)
+    first.fit(X_train, y_train)
+    # The first stage may have seen fewer labels (e.g. refit on recent rows);
+    # it can stand in as long as it never knows a label the model doesn't
+    if not set(first.classes_) <= set(model.classes_) or len(X_holdout) < 10:
+        return None
+
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(len(X_holdout))
+    calibration, evaluation = order[:len(order) // 2], order[len(order) // 2:]
+
+    full_pred = model.predict(X_holdout)
+    proba = first.predict_proba(X_holdout)
+    confidence = proba.max(axis=1)
+    first_pred = first.classes_[proba.argmax(axis=1)]
+
+    threshold = calibrate_threshold(confidence[calibration],
+                                    first_pred[calibration] == full_pred[calibration], target)
+
+    answered = confidence[evaluation] >= threshold
+    cascade_pred = np.where(answered, first_pred[evaluation], full_pred[evaluation])
+    truth = np.asarray(y_holdout)[evaluation]
+    full_accuracy = float((full_pred[evaluation] == truth).mean())
+    cascade_accuracy = float((cascade_pred == truth).mean())
+
+    return {
+        'model': first,
+        'threshold': threshold,
+        'target_agreement': target,
+        'report': {
+            'hit_rate': float(answered.mean()),
+            'full_accuracy': full_accuracy,
+            'cascade_accuracy': cascade_accuracy,
+            'accuracy_delta': cascade_accuracy - full_accuracy,
+            'evaluation_rows': int(len(evaluation))
+        }
+    }
+
+
+def format_report(cascade):
+    report = cascade['report']
+    return (f"first stage answers {report['hit_rate']:.0%} of held-out frames, "
+            f"accuracy {report['cascade_accuracy']:.3f} vs {report['full_accuracy']:.3f} "
+            f"full model ({report['accuracy_delta']:+.3f})")
+
+
+class CascadeModel:
+    """predict / predict_proba that only run the full model when needed"""
+
+    def __init__(self, full, first, threshold):
+        self.full = full
+        self.first = first
+        self.threshold = threshold
+        self.classes_ = full.classes_
+        self.n_features_in_ = full.n_features_in_
+        # first stage probability columns -> full model columns
+        self._columns = np.searchsorted(self.classes_, first.classes_)
+        self._same_classes = len(first.classes_) == len(self.classes_)
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.first_stage_hits = 0
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+        first = np.asarray(self.first.predict_proba(X), dtype=np.float64)
+        if self._same_classes:
+            proba = first
+        else:
+            proba = np.zeros((len(X), len(self.classes_)))
+            proba[:, self._columns] = first
+        escalate = proba.max(axis=1) < self.threshold
+        if escalate.any():
+            proba[escalate] = self.full.predict_proba(X[escalate])
+        with self._lock:
+            self.frames += len(X)
+            self.first_stage_hits += int(len(X) - escalate.sum())
+        return proba
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'first_stage_hits': self.first_stage_hits,
+                'hit_rate': self.first_stage_hits / self.frames if self.frames else 0.0,
+                'threshold': self.threshold
+            }
+
+
+def serving_model(bundle, cascade=False, early_exit=False, margin=None):
+    """The bundle's model, compiled, behind its cascade when asked and it has one.
+
+    The cascade is opt-in: its labels may differ from the full forest on up
+    to 1 - TARGET_AGREEMENT of the frames the first stage answers, and on a
+    single frame it runs two forests where the full model runs one.
+    early_exit wraps the full forest in an EarlyExitForest (see
+    forest_engine.py); margin=None keeps its labels exact.
+    """
+    from forest_engine import CompiledForest, EarlyExitForest, maybe_compile
+
+    model = maybe_compile(bundle['model'])
+    if early_exit and isinstance(model, CompiledForest):
+        model = EarlyExitForest(model, margin)
+    entry = bundle.get('cascade') if cascade else None
+    if entry is None or not np.isfinite(entry['threshold']):
+        return model
+    return CascadeModel(model, maybe_compile(entry['model']), entry['threshold'])
+
+
+def calibrate_serving_unknown(model, cascade, X_holdout, y_holdout):
+    """calibrate_unknown() on the models the apps serve, not the sklearn forest.
+
+    Returns the thresholds for the compiled full forest; with a cascade, the
+    cascade's own are stored in cascade['unknown'] (see serving_unknown).
+    """
+    bundle = {'model': model, 'cascade': cascade}
+    if cascade is not None:
+        cascade['unknown'] = None
+        served = serving_model(bundle, cascade=True)
+        if isinstance(served, CascadeModel):
+            cascade['unknown'] = calibrate_unknown(served, X_holdout, y_holdout)
+    return calibrate_unknown(serving_model(bundle), X_holdout, y_holdout)
+
+
+def serving_unknown(bundle, model):
+    """The bundle's unknown-rejection entry for `model`, a serving_model() result"""
+    if isinstance(model, CascadeModel):
+        return bundle['cascade'].get('unknown') or bundle.get('unknown')
+    return bundle.get('unknown')
@@ -1,26 +1,21 @@
 import cv2
 import mediapipe as mp
-import csv
-import os
+from gesture_store import open_store
+from multi_hand import MAX_HANDS, detected_hands, hand_tag, landmark_row
 
 # Init MediaPipe
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=1)
+hands = mp_hands.Hands(static_image_mode=False, max_num_hands=MAX_HANDS)
 mp_draw = mp.solutions.drawing_utils
 
-# CSV Setup
-CSV_FILE = 'gestures.csv'
-if not os.path.exists(CSV_FILE):
-    with open(CSV_FILE, 'w', newline='') as f:
-        writer = csv.writer(f)
-        header = [f'{i}_{axis}' for i in range(21) for axis in ('x', 'y')] + ['label']
-        writer.writerow(header)
+# Gesture store setup (imports an existing gestures.csv the first time)
+store = open_store()
 
 # Start camera
 cap = cv2.VideoCapture(0)
 label = input("Enter gesture label (e.g., OK, Hello): ").strip()
 
-print("Press 'c' to capture. Press 'q' to quit.")
+print("Press 'c' to capture (every hand in view). Press 'q' to quit.")
 
 while True:
     success, frame = cap.read()
@@ -31,27 +26,26 @@ while True:
     rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     result = hands.process(rgb)
 
-    if result.multi_hand_landmarks:
-        for hand_landmarks in result.multi_hand_landmarks:
+    # Left hand first; with two hands both are stored, as a tagged pair
+    detected = detected_hands(result)
+    if detected:
+        for handedness, hand_landmarks in detected:
             mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
 
-            landmarks = []
-            for lm in hand_landmarks.landmark:
-                landmarks.append(lm.x)
-                landmarks.append(lm.y)
-
-            cv2.putText(frame, f'Gesture: {label}', (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('c'):
-                print(f"Captured: {label}")
-                with open(CSV_FILE, 'a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(landmarks + [label])
-            elif key == ord('q'):
-                cap.release()
-                cv2.destroyAllWindows()
-                exit()
+        sides = ' + '.join(handedness or '?' for handedness, _ in detected)
+        cv2.putText(frame, f'Gesture: {label} ({sides})', (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('c'):
+            paired = len(detected) > 1
+            total = store.append_many([landmark_row(hand_landmarks) for _, hand_landmarks in detected],
+                                      [label] * len(detected),
+                                      hands=[hand_tag(handedness, paired) for handedness, _ in detected])
+            print(f"Captured: {label} ({sides}, {total} rows in store)")
+        elif key == ord('q'):
+            cap.release()
+            cv2.destroyAllWindows()
+            exit()
 
     cv2.imshow("Collect Gesture Data", frame)
@@ -1,21 +1,22 @@
 """
 Debug script to compare desktop vs web processing
 """
-import joblib
 import pandas as pd
 import numpy as np
 
 def test_model_loading():
     """Test if model loads correctly"""
     try:
-        model = joblib.load('model.pkl')
+        from model_bundle import load_bundle
+        bundle = load_bundle('model.pkl')
+        model = bundle['model']
         print("✅ Model loaded successfully")
         print(f"Model type: {type(model)}")
         
-        # Load labels
-        data = pd.read_csv('gestures.csv', header=None)
-        labels = sorted(data.iloc[:, -1].unique())
+        # Labels come from the bundle; only the sample row is read from the CSV
+        labels = bundle['classes']
         print(f"✅ Labels: {labels}")
+        data = pd.read_csv('gestures.csv', header=None, nrows=1)
         
         # Test with sample data
         sample_landmarks = data.iloc[0, :-1].values  # First row, all columns except last
@@ -1,97 +1,358 @@
+from startup_timing import StartupTimer
+
+startup = StartupTimer()
+
+import argparse
 import cv2
+startup.mark('import cv2')
 import numpy as np
-import time
-from gtts import gTTS
 import os
-import joblib
-import pandas as pd
-import mediapipe as mp
-
-try:
-    from playsound import playsound
-except ImportError:
-    playsound = None
-
-# === Load Model & Labels ===
-model = joblib.load("model.pkl")
-data = pd.read_csv('gestures.csv', header=None)
-labels = sorted(data.iloc[:, -1].unique())
-
-# === Mediapipe Optimized ===
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    static_image_mode=False,
-    max_num_hands=1,
-    model_complexity=0,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
-mp_draw = mp.solutions.drawing_utils
-
-# === TTS ===
-prev_prediction = None
-last_spoken = 0
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from detection_pipeline import (DropOldestQueue, PipelineStage, StopPipeline,
+                                format_report)
+from adaptive_roi import TARGET_FPS, AdaptiveHands
+from cascade import serving_model, serving_unknown
+from forest_file import load_serving_bundle
+from motion_gate import MOTION_THRESHOLD, REFRESH_EVERY, MotionGateRegistry
+from multi_hand import MAX_HANDS, classify_hands, detected_hands, landmark_row
+from rejection import UNKNOWN_LABEL
+from temporal import TEMPORAL_MODEL_PATH, TemporalSession, load_temporal
+from tts_worker import BACKENDS, SpeechWorker
+startup.mark('import modules')
+
+# === Model & Labels, Mediapipe: set up by load_models() ===
+bundle = model = labels = unknown = None
+mp_hands = hands = mp_draw = None
+adaptive = None  # AdaptiveHands with --adaptive, used instead of hands
+
+def load_models(args):
+    """Load the model and start MediaPipe (runs while the webcam opens)"""
+    global bundle, model, labels, unknown, mp_hands, hands, mp_draw, adaptive
+    with startup.step('load model'):
+        bundle = load_serving_bundle("model.pkl")
+        model = serving_model(bundle, cascade=args.cascade, early_exit=args.early_exit,
+                              margin=args.early_exit_margin)
+        labels = bundle['classes']
+        unknown = serving_unknown(bundle, model)
+
+    # === Mediapipe Optimized ===
+    with startup.step('import mediapipe'):
+        import mediapipe as mp
+    with startup.step('create hand tracker'):
+        mp_hands = mp.solutions.hands
+
+        def make_hands(complexity=0):
+            return mp_hands.Hands(
+                static_image_mode=False,
+                max_num_hands=args.max_hands,
+                model_complexity=complexity,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+
+        if args.adaptive:
+            # Crops to the hands and picks resolution / model_complexity per frame
+            adaptive = AdaptiveHands(make_hands, args.max_hands, args.target_fps)
+        else:
+            hands = make_hands()
+        mp_draw = mp.solutions.drawing_utils
+
+def open_camera():
+    with startup.step('open webcam'):
+        cap = cv2.VideoCapture(0)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    return cap
+
+def find_hands(frame):
+    """MediaPipe result for a mirrored BGR frame, landmarks in frame coordinates"""
+    if adaptive is not None:
+        return adaptive.process(frame)
+    return hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+# === Recording for adaptive_roi.py replays (--record) ===
+recorder = None
+
+def start_recording(cap, path):
+    global recorder
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    recorder = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    print(f"⏺️ Recording camera frames to {path}")
+
+def record(frame):
+    # Raw camera frames: replays mirror them like the live loop does
+    if recorder is not None:
+        recorder.write(frame)
+
+# === TTS === (per hand: handedness -> last spoken label / time)
+prev_prediction = {}
+last_spoken = {}
 cooldown = 2  # seconds
+speech = None  # SpeechWorker, started in __main__
+
+# === Motion gate: reuse a hand's last label while it holds still ===
+# (one gate per handedness)
+gates = MotionGateRegistry(MOTION_THRESHOLD, REFRESH_EVERY)
+
+# === Temporal mode: classify a sliding window of frames (--temporal) ===
+temporal = None
+
+# === Pipeline ===
+REPORT_INTERVAL = 5.0  # seconds between per-stage throughput reports
 
 def speak_word(text):
-    try:
-        tts = gTTS(text=text, lang='en')
-        filename = "voice.mp3"
-        tts.save(filename)
-        if playsound:
-            playsound(filename, block=False)
-        os.remove(filename)
-    except Exception as e:
-        print(f"[TTS Error]: {e} - Would have said: {text}")
-
-# === Webcam ===
-cap = cv2.VideoCapture(0)
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-print("🎥 SILEXA - Real-Time Sign Detection Started")
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    frame = cv2.flip(frame, 1)
-    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = hands.process(rgb)
-
-    prediction_text = "No hand detected"
-
-    if result.multi_hand_landmarks:
-        hand_landmarks = result.multi_hand_landmarks[0]
-        mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-        landmarks = []
-        for lm in hand_landmarks.landmark:
-            landmarks.extend([lm.x, lm.y])
-
-        if len(landmarks) == 42:
-            prediction = model.predict([landmarks])[0]
-            prediction_text = prediction
-
-            current_time = time.time()
-            if prediction != prev_prediction and (current_time - last_spoken > cooldown):
-                print(f"🧠 Detected: {prediction}")
-                speak_word(prediction)
-                prev_prediction = prediction
-                last_spoken = current_time
-
-    # === Overlay UI ===
+    # Synthesis and playback happen on the speech worker thread
+    if speech is not None:
+        speech.say(text)
+
+def frame_hands(result):
+    """[(handedness, 42 values)] for the hands in a MediaPipe result, left first"""
+    hands_found = [(handedness, landmark_row(hand)) for handedness, hand in detected_hands(result)]
+    return [(handedness, landmarks) for handedness, landmarks in hands_found if len(landmarks) == 42]
+
+def predict_and_speak(hands_found):
+    """Label per hand; speaks each hand's label when it changed and the cooldown passed"""
+    if temporal is not None:
+        # The motion window follows one hand (--temporal implies --max-hands 1)
+        result = temporal.push(hands_found[0][1])
+        predictions = ["..." if result is None else result[0]]  # "..." while the window fills
+    else:
+        predictions = [gates.get(handedness).check(landmarks) if gates is not None else None
+                       for handedness, landmarks in hands_found]
+        misses = [i for i, prediction in enumerate(predictions) if prediction is None]
+        # Every hand the gates can't skip goes into one model call: model.predict()'s
+        # label per hand, or "unknown" when the best probability is below that
+        # class's calibrated threshold
+        results = classify_hands(model, [hands_found[i][1] for i in misses], 1, unknown)
+        for i, result in zip(misses, results):
+            predictions[i] = result[0]
+            if gates is not None:
+                gates.get(hands_found[i][0]).update(hands_found[i][1], predictions[i])
+
+    current_time = time.time()
+    for (handedness, _), prediction in zip(hands_found, predictions):
+        if prediction in ("...", UNKNOWN_LABEL):
+            continue  # shown, never spoken
+        if (prediction != prev_prediction.get(handedness)
+                and current_time - last_spoken.get(handedness, 0) > cooldown):
+            print(f"🧠 Detected: {prediction}")
+            speak_word(prediction)
+            prev_prediction[handedness] = prediction
+            last_spoken[handedness] = current_time
+    return predictions
+
+def prediction_label(hands_found, predictions):
+    """Overlay text: the label, or one label per hand"""
+    if len(predictions) == 1:
+        return predictions[0]
+    return ' | '.join(f'{handedness or "?"}: {prediction}'
+                      for (handedness, _), prediction in zip(hands_found, predictions))
+
+def hand_lost():
+    # A motion window must be made of consecutive frames of the same hand
+    if temporal is not None:
+        temporal.reset()
+
+def draw_overlay(frame, prediction_text, status_text=None):
     cv2.putText(frame, f'Gesture: {prediction_text}', (10, 60),
                 cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 255, 0), 2)
     cv2.putText(frame, 'SILEXA - Real-time Detection', (10, 30),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+    if status_text:
+        cv2.putText(frame, status_text, (10, 90),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 1)
     cv2.putText(frame, 'Press ESC to exit', (10, frame.shape[0] - 10),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.6, (180, 180, 180), 1)
 
-    cv2.imshow("SILEXA Sign Detection", frame)
-    if cv2.waitKey(1) & 0xFF == 27:
-        break
+# === Sequential loop ===
+def run_sequential(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        record(frame)
+
+        frame = cv2.flip(frame, 1)
+        result = find_hands(frame)
+
+        prediction_text = "No hand detected"
+
+        if result.multi_hand_landmarks:
+            for hand_landmarks in result.multi_hand_landmarks:
+                mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+
+            hands_found = frame_hands(result)
+            if hands_found:
+                prediction_text = prediction_label(hands_found, predict_and_speak(hands_found))
+        else:
+            hand_lost()
+
+        # === Overlay UI ===
+        draw_overlay(frame, prediction_text)
+
+        cv2.imshow("SILEXA Sign Detection", frame)
+        if cv2.waitKey(1) & 0xFF == 27:
+            break
+
+# === Pipelined loop ===
+# capture -> landmarks -> inference each run in their own thread; every
+# queue holds only the newest frame, so a slow stage skips stale frames
+# instead of falling further behind. Rendering stays on the main thread.
+def run_pipelined(cap):
+    def capture(_):
+        ret, frame = cap.read()
+        if not ret:
+            raise StopPipeline()
+        record(frame)
+        return {'frame': cv2.flip(frame, 1), 'captured_at': time.perf_counter()}
+
+    def find_landmarks(item):
+        result = find_hands(item['frame'])
+        item['drawn'] = result.multi_hand_landmarks or []
+        item['hands'] = frame_hands(result)
+        return item
+
+    def infer(item):
+        item['prediction'] = "No hand detected"
+        if item['hands']:
+            item['prediction'] = prediction_label(item['hands'], predict_and_speak(item['hands']))
+        elif not item['drawn']:
+            hand_lost()
+        return item
+
+    queues = {
+        'landmarks': DropOldestQueue(maxsize=1),
+        'inference': DropOldestQueue(maxsize=1),
+        'render': DropOldestQueue(maxsize=1)
+    }
+    stop = threading.Event()
+    stages = [
+        PipelineStage('capture', capture, None, queues['landmarks'], stop),
+        PipelineStage('landmarks', find_landmarks, queues['landmarks'], queues['inference'], stop),
+        PipelineStage('inference', infer, queues['inference'], queues['render'], stop)
+    ]
+    for stage in stages:
+        stage.start()
+
+    rendered = 0
+    latency_total = 0.0
+    last_report = time.perf_counter()
+    status_text = None
+    try:
+        while not stop.is_set():
+            item = queues['render'].get(timeout=0.1)
+            if item is None:
+                continue
+
+            frame = item['frame']
+            for hand_landmarks in item['drawn']:
+                mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+            draw_overlay(frame, item['prediction'], status_text)
+
+            cv2.imshow("SILEXA Sign Detection", frame)
+            rendered += 1
+            latency_total += time.perf_counter() - item['captured_at']
+            if cv2.waitKey(1) & 0xFF == 27:
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= REPORT_INTERVAL:
+                fps = rendered / (now - last_report)
+                latency_ms = latency_total / rendered * 1000.0
+                gated = f" | gated {gates.stats()['gated_ratio']:.0%}" if gates is not None else ""
+                tracking = f" | {adaptive.describe()}" if adaptive is not None else ""
+                print(f"📊 {format_report([s.stats for s in stages], queues, latency_ms)}"
+                      f" | display {fps:.1f} fps{gated}{tracking}")
+                status_text = f"{fps:.0f} fps, {latency_ms:.0f} ms"
+                rendered, latency_total, last_report = 0, 0.0, now
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join(timeout=1.0)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SILEXA real-time sign detection')
+    parser.add_argument('--max-hands', type=int, choices=range(1, MAX_HANDS + 1), default=1,
+                        help='hands tracked and classified per frame (all in one model call)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='crop to the hands and adapt resolution / model complexity '
+                             'to hold --target-fps (see adaptive_roi.py)')
+    parser.add_argument('--target-fps', type=float, default=TARGET_FPS,
+                        help='frame rate --adaptive aims for')
+    parser.add_argument('--record', metavar='CLIP',
+                        help='save the camera frames to a video for adaptive_roi.py replays')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='run capture, landmarks and inference in separate threads')
+    parser.add_argument('--tts-backend', choices=sorted(BACKENDS), default='gtts',
+                        help='speech synthesis engine (stub = offline, silent)')
+    parser.add_argument('--motion-threshold', type=float, default=MOTION_THRESHOLD,
+                        help='skip the model while the hand moves less than this '
+                             '(fraction of hand size, 0 = always predict)')
+    parser.add_argument('--refresh-every', type=int, default=REFRESH_EVERY,
+                        help='gated frames before the model must run again')
+    parser.add_argument('--temporal', action='store_true',
+                        help=f'classify a sliding window of frames with {TEMPORAL_MODEL_PATH} '
+                             '(python temporal.py train)')
+    parser.add_argument('--cascade', action='store_true',
+                        help="answer confident frames with the bundle's small first-stage "
+                             'forest (labels may rarely differ)')
+    parser.add_argument('--early-exit', action='store_true',
+                        help='stop walking trees once the vote is decided (same labels)')
+    parser.add_argument('--early-exit-margin', type=float, default=None,
+                        help='with --early-exit, also stop once the leading class is this '
+                             'far ahead (faster, labels may rarely differ)')
+    args = parser.parse_args()
+    if args.temporal and args.max_hands > 1:
+        print("⚠️ Temporal mode follows one hand, using --max-hands 1")
+        args.max_hands = 1
+
+    # === Webcam === opened on this thread while the model and MediaPipe load
+    with ThreadPoolExecutor(max_workers=1) as loader:
+        loading = loader.submit(load_models, args)
+        cap = open_camera()
+        loading.result()  # re-raises a failed load
+    if args.record:
+        start_recording(cap, args.record)
+
+    if args.temporal:
+        temporal = TemporalSession(*load_temporal(TEMPORAL_MODEL_PATH))
+        print(f"🎞️ Temporal mode: {temporal.ring.size}-frame window")
+        gates = None  # every frame has to reach the window
+    elif args.motion_threshold > 0:
+        gates = MotionGateRegistry(args.motion_threshold, args.refresh_every)
+    else:
+        gates = None
+
+    # === TTS worker, cache pre-warmed with every label ===
+    speech = SpeechWorker(BACKENDS[args.tts_backend]())
+    speech.prewarm(labels)
+    startup.ready()
+    print(startup.format())
+
+    print(f"🎥 SILEXA - Real-Time Sign Detection Started (up to {args.max_hands} "
+          f"hand{'s' if args.max_hands > 1 else ''})")
+    if args.pipeline:
+        print("🧵 Pipelined mode: capture / landmarks / inference threads")
+        run_pipelined(cap)
+    else:
+        run_sequential(cap)
 
-cap.release()
-cv2.destroyAllWindows()
+    cap.release()
+    if recorder is not None:
+        recorder.release()
+    cv2.destroyAllWindows()
+    speech.close()
+    if adaptive is not None:
+        stats = adaptive.stats()
+        print(f"🔍 Adaptive tracking: {stats['landmark_ms']:.1f} ms per frame, "
+              f"{adaptive.describe()}, {stats['fallbacks']} whole-frame fallbacks, "
+              f"{stats['level_changes']} level changes")
+    if gates is not None:
+        stats = gates.stats()
+        print(f"🖐️ Motion gate: {stats['evaluated']} frames predicted, "
+              f"{stats['gated']} reused ({stats['gated_ratio']:.0%})")
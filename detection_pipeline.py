@@ -0,0 +1,117 @@
+"""
+Threaded stage pipeline for the desktop detection loop
+
+Each stage (capture, landmarks, inference) runs in its own thread and hands
+its output to the next one through a small drop-oldest queue: when a slower
+stage falls behind, stale frames are discarded so it always works on the
+freshest one. Rendering stays on the main thread (cv2.imshow needs it).
+"""
+import threading
+import time
+from collections import deque
+
+
+class StopPipeline(Exception):
+    """Raised by a stage to shut the whole pipeline down (e.g. camera closed)"""
+
+
+class DropOldestQueue:
+    """Bounded queue whose put() never blocks: the oldest item is dropped"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Oldest queued item, or None if nothing arrived within timeout"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+
+class StageStats:
+    """Items processed and time spent working, for throughput reporting"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self._window_items = 0
+        self._window_start = time.perf_counter()
+
+    def record(self, seconds):
+        self.items += 1
+        self._window_items += 1
+        self.busy += seconds
+
+    def rate(self):
+        """Items per second since the previous call"""
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        rate = self._window_items / elapsed if elapsed > 0 else 0.0
+        self._window_items = 0
+        self._window_start = now
+        return rate
+
+    def avg_ms(self):
+        return self.busy / self.items * 1000.0 if self.items else 0.0
+
+
+class PipelineStage(threading.Thread):
+    """Runs `work(item)` on every item from `inbox` and puts the result in `outbox`.
+
+    A stage without an inbox is a source and calls work(None) in a loop.
+    Returning None from work drops the item.
+    """
+
+    def __init__(self, name, work, inbox, outbox, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop_event
+        self.stats = StageStats(name)
+        self.error = None
+
+    def run(self):
+        while not self.stop_event.is_set():
+            item = None
+            if self.inbox is not None:
+                item = self.inbox.get(timeout=0.1)
+                if item is None:
+                    continue
+
+            start = time.perf_counter()
+            try:
+                result = self.work(item)
+            except StopPipeline:
+                self.stop_event.set()
+                break
+            except Exception as e:
+                self.error = e
+                print(f"❌ {self.name} stage error: {e}")
+                self.stop_event.set()
+                break
+            self.stats.record(time.perf_counter() - start)
+
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+
+def format_report(stats, queues, latency_ms=None):
+    """One-line throughput summary: fps and avg ms per stage, drops per queue"""
+    parts = [f"{s.name} {s.rate():5.1f} fps ({s.avg_ms():.1f} ms)" for s in stats]
+    drops = ', '.join(f"{name} {q.dropped}" for name, q in queues.items())
+    line = ' | '.join(parts) + f" | dropped: {drops}"
+    if latency_ms is not None:
+        line += f" | latency {latency_ms:.0f} ms"
+    return line
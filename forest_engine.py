@@ -0,0 +1,318 @@
+"""
+Compiled RandomForest inference engine
+
+Flattens a fitted sklearn RandomForestClassifier into a handful of contiguous
+NumPy arrays and evaluates every tree at once, level by level, without going
+through sklearn's per-call validation and joblib dispatch. Results match
+model.predict / model.predict_proba exactly.
+
+EarlyExitForest evaluates the same arrays a chunk of trees at a time and
+stops for each frame once the vote is decided.
+"""
+import threading
+
+import numpy as np
+
+
+class CompiledForest:
+    """Drop-in replacement for a fitted RandomForestClassifier at predict time.
+
+    All trees are stored back to back in flat node arrays. Leaves point to
+    themselves (threshold +inf, both children == self) so a sample can be
+    walked down for max_depth steps without any per-node leaf checks.
+    """
+
+    def __init__(self, feature, threshold, children, leaf_id, leaf_value,
+                 roots, max_depth, classes, n_features):
+        self.feature = feature          # int, split feature per node
+        self.threshold = threshold      # float32, go left when x <= threshold
+        self.children = children        # int, (n_nodes, 2) left/right child
+        self.leaf_id = leaf_id          # int, row in leaf_value (-1 for splits)
+        self.leaf_value = leaf_value    # float64, per-leaf class distribution
+        self.roots = roots              # int, root node of every tree
+        self.max_depth = int(max_depth)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.n_classes_ = len(self.classes_)
+        self.n_estimators = len(roots)
+        # Traversal works on doubled node ids (2 * node + go_right) so each
+        # level is one gather into the flattened children array. Inputs may
+        # be narrow (memory-mapped model.forest); the index arrays are intp.
+        self._roots = np.asarray(roots, dtype=np.intp)
+        self._next2 = 2 * np.asarray(children, dtype=np.intp).reshape(-1)
+        self._feature2 = np.repeat(np.asarray(feature, dtype=np.intp), 2)
+        self._threshold2 = np.repeat(threshold, 2)
+        self._leaf2 = np.repeat(np.asarray(leaf_id, dtype=np.intp), 2)
+
+    def _as_matrix(self, X):
+        # sklearn's trees compare float32 features, so do the same
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f'X has {X.shape[-1]} features, but the model expects {self.n_features_in_}'
+            )
+        return X
+
+    def apply(self, X, trees=None):
+        """Return the leaf row reached in every tree, shape (n_samples, n_trees).
+
+        trees: optional slice selecting a range of trees to walk.
+        """
+        X = self._as_matrix(X)
+        roots = self._roots if trees is None else self._roots[trees]
+
+        if len(X) == 1:
+            # Single frame: index the feature vector directly
+            x = X[0]
+            node = roots * 2
+            for depth in range(self.max_depth):
+                # Most frames settle well above max_depth; check occasionally
+                if depth % 4 == 3 and (self._leaf2[node] >= 0).all():
+                    break
+                node = self._next2[node + (x[self._feature2[node]] > self._threshold2[node])]
+            return self._leaf2[node][np.newaxis, :]
+
+        # Several frames (e.g. both hands of one frame): gather from the
+        # flattened matrix, which is cheaper than 2-D fancy indexing, and stop
+        # once every frame has reached a leaf in every tree
+        flat = X.ravel()
+        offsets = np.arange(len(X))[:, np.newaxis] * X.shape[1]
+        node = np.broadcast_to(roots * 2, (len(X), len(roots)))
+        for depth in range(self.max_depth):
+            if depth % 4 == 3 and (self._leaf2[node] >= 0).all():
+                break
+            go_right = flat[offsets + self._feature2[node]] > self._threshold2[node]
+            node = self._next2[node + go_right]
+        return self._leaf2[node]
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        # Trees are summed one after another and then averaged, the same
+        # order of float operations RandomForestClassifier uses
+        proba = np.add.reduce(self.leaf_value[leaves.T], axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+EARLY_EXIT_CHUNK = 10       # trees walked between checks for a decided vote
+EARLY_EXIT_TOLERANCE = 1e-9  # slack for float error in the running tallies
+
+
+class EarlyExitForest:
+    """CompiledForest that stops walking trees once a frame's vote is decided.
+
+    Trees are evaluated in order, `chunk` at a time, while a running sum of
+    their leaf distributions is kept per frame. Every tree adds at most 1 to
+    any class, so once the leading class is ahead of the runner-up by more
+    than the number of trees left the label can no longer change: with
+    margin=None (exact mode) labels always equal CompiledForest.predict.
+
+    With a margin, a frame also stops as soon as its lead, averaged over the
+    trees evaluated so far, reaches `margin` - fewer trees, but the label may
+    occasionally differ from the full forest.
+
+    predict_proba for a frame that stopped early is the average over the
+    trees it evaluated; frames that ran every tree get the full forest's
+    probabilities exactly.
+
+    Batches walk each chunk of trees with CompiledForest.apply; a single
+    frame in margin mode walks trees one by one in plain Python.
+    """
+
+    def __init__(self, forest, margin=None, chunk=EARLY_EXIT_CHUNK):
+        self.forest = forest
+        self.margin = margin
+        self.chunk = int(chunk)
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.n_classes_ = forest.n_classes_
+        self.n_estimators = forest.n_estimators
+        self._lock = threading.Lock()
+        self.predictions = 0
+        self.trees_evaluated = 0
+        self._nodes = None  # Python node tuples for single-frame walks, built on first use
+        self._roots = None
+
+    def predict_proba(self, X):
+        X = self.forest._as_matrix(X)
+        if self.n_classes_ < 2:
+            return self.forest.predict_proba(X)
+        if len(X) == 1 and self.margin is not None:
+            proba, evaluated = self._walk_one(X[0])
+            proba = proba[np.newaxis, :]
+        elif len(X) == 1:
+            # An exact decision typically needs well over half of the trees;
+            # at that point walking them one by one in Python costs more than
+            # one vectorized walk of the whole forest
+            proba, evaluated = self.forest.predict_proba(X), self.n_estimators
+        else:
+            proba, evaluated = self._walk_chunks(X)
+        with self._lock:
+            self.predictions += len(X)
+            self.trees_evaluated += evaluated
+        return proba
+
+    def _decided(self, votes, trees_done):
+        """Rows of `votes` (running sums after trees_done trees) that can stop"""
+        top = np.partition(votes, -2, axis=-1)
+        lead = top[..., -1] - top[..., -2]
+        done = lead > self.n_estimators - trees_done + EARLY_EXIT_TOLERANCE
+        if self.margin is not None:
+            done |= lead >= self.margin * trees_done
+        return done
+
+    def _walk_chunks(self, X):
+        forest = self.forest
+        n_trees = self.n_estimators
+        tally = np.zeros((len(X), self.n_classes_))
+        active = np.arange(len(X))
+        evaluated = 0
+        for start in range(0, n_trees, self.chunk):
+            stop = min(start + self.chunk, n_trees)
+            leaves = forest.apply(X[active], slice(start, stop))
+            # One tree at a time, in order: rows that run every tree end up
+            # with exactly CompiledForest.predict_proba's sums
+            votes = tally[active]
+            for column in leaves.T:
+                votes += forest.leaf_value[column]
+            tally[active] = votes
+            evaluated += len(active) * (stop - start)
+            if stop == n_trees:
+                break
+            done = self._decided(votes, stop)
+            if done.any():
+                tally[active[done]] /= stop
+                active = active[~done]
+                if not len(active):
+                    break
+        tally[active] /= n_trees
+        return tally, evaluated
+
+    def _walk_one(self, x):
+        """Single frame: plain Python tree walks beat per-level NumPy calls"""
+        if self._nodes is None:
+            forest = self.forest
+            # (feature, threshold, left, right) per node; a leaf has feature
+            # -1 and its leaf_value row in place of the right child
+            is_leaf = forest.leaf_id >= 0
+            self._nodes = list(zip(np.where(is_leaf, -1, forest.feature).tolist(),
+                                   forest.threshold.tolist(),
+                                   forest.children[:, 0].tolist(),
+                                   np.where(is_leaf, forest.leaf_id, forest.children[:, 1]).tolist()))
+            self._roots = forest.roots.tolist()
+        nodes = self._nodes
+        x = x.tolist()
+
+        leaves = []
+        for node in self._roots:
+            feature, threshold, left, right = nodes[node]
+            while feature >= 0:
+                feature, threshold, left, right = nodes[right if x[feature] > threshold else left]
+            leaves.append(right)
+            if len(leaves) % self.chunk == 0 and len(leaves) < self.n_estimators:
+                # Summed from the first tree in order, as predict_proba does
+                votes = np.add.reduce(self.forest.leaf_value[leaves], axis=0)
+                if self._decided(votes, len(leaves)):
+                    return votes / len(leaves), len(leaves)
+        votes = np.add.reduce(self.forest.leaf_value[leaves], axis=0)
+        return votes / self.n_estimators, self.n_estimators
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'predictions': self.predictions,
+                'avg_trees': self.trees_evaluated / self.predictions if self.predictions else 0.0,
+                'n_estimators': self.n_estimators,
+                'margin': self.margin
+            }
+
+
+def _float32_floor(threshold):
+    """Largest float32 <= threshold.
+
+    For float32 inputs x, (x <= float64 t) and (x <= floor32(t)) always
+    agree, so float32 thresholds keep exact parity with sklearn.
+    """
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return t32
+
+
+def compile_forest(model):
+    """Convert a fitted RandomForestClassifier into a CompiledForest"""
+    if not hasattr(model, 'estimators_') or not hasattr(model, 'classes_'):
+        raise TypeError(f'Expected a fitted RandomForestClassifier, got {type(model)}')
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise TypeError('Multi-output forests are not supported')
+
+    features, thresholds, children, leaf_ids, leaf_values, roots = [], [], [], [], [], []
+    node_offset = 0
+    leaf_offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(node_offset, node_offset + n)
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = _float32_floor(tree.threshold)
+        threshold[is_leaf] = np.inf
+        left = np.where(is_leaf, own, tree.children_left + node_offset)
+        right = np.where(is_leaf, own, tree.children_right + node_offset)
+
+        leaf_id = np.full(n, -1, dtype=np.int64)
+        n_leaves = int(is_leaf.sum())
+        leaf_id[is_leaf] = np.arange(leaf_offset, leaf_offset + n_leaves)
+
+        # tree_.value already holds the per-leaf class fractions that
+        # DecisionTreeClassifier.predict_proba returns
+        value = tree.value[is_leaf, 0, :model.n_classes_].astype(np.float64)
+
+        features.append(feature)
+        thresholds.append(threshold)
+        children.append(np.column_stack([left, right]))
+        leaf_ids.append(leaf_id)
+        leaf_values.append(value)
+        roots.append(node_offset)
+
+        node_offset += n
+        leaf_offset += n_leaves
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompiledForest(
+        feature=np.concatenate(features).astype(np.intp),
+        threshold=np.concatenate(thresholds).astype(np.float32),
+        children=np.concatenate(children).astype(np.intp),
+        leaf_id=np.concatenate(leaf_ids).astype(np.intp),
+        leaf_value=np.ascontiguousarray(np.concatenate(leaf_values)),
+        roots=np.asarray(roots, dtype=np.intp),
+        max_depth=max_depth,
+        classes=model.classes_,
+        n_features=model.n_features_in_
+    )
+
+
+def maybe_compile(model):
+    """Compile a RandomForestClassifier; anything else is returned unchanged"""
+    try:
+        return compile_forest(model)
+    except TypeError:
+        return model
+
+
+def load_model(path='model.pkl'):
+    """Load the model from a model.pkl bundle, compiled when possible"""
+    from model_bundle import load_bundle
+
+    return maybe_compile(load_bundle(path)['model'])
@@ -0,0 +1,272 @@
+"""
+Compact array model file (model.forest)
+
+model.pkl holds sklearn tree objects; unpickling it imports sklearn and builds
+every tree in memory before forest_engine.py flattens them anyway. The same
+compiled forest is also written next to it as a few contiguous typed arrays:
+
+    feature     int16    split feature per node
+    threshold   float32  go left when x <= threshold
+    children    int32    (n_nodes, 2) left/right child, leaves point to self
+    roots       int32    root node of every tree
+    leaf_ptr    int32    per-leaf start into leaf_class / leaf_prob (CSR)
+    leaf_class  uint16   classes with a non-zero share in the leaf
+    leaf_prob   float64  their shares, stored exactly as sklearn has them
+
+Most leaves of a fully grown forest are pure, so the class distributions
+take one (class, share) pair instead of a float64 per class.
+
+Layout: MAGIC, uint32 header length, JSON header (bundle metadata, array
+dtypes / shapes / offsets, size and mtime of the model.pkl it was exported
+from), then the arrays at 64-byte aligned offsets. load_forest_bundle()
+memory-maps the file; only the dense leaf table and the engine's traversal
+arrays are built in memory. A file whose model.pkl has changed since export
+is ignored by load_serving_bundle(), which then reads the pickle.
+
+Usage:
+    python forest_file.py export [model.pkl]
+    python forest_file.py compare [model.pkl]   # size, load time, RSS
+"""
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'SLXFOREST'
+FORMAT_VERSION = 1
+ALIGN = 64
+
+# Bundle entries that are estimators, written as arrays instead of JSON
+FOREST_KEYS = ('model', 'cascade')
+
+
+def forest_path(bundle_path):
+    """model.pkl -> model.forest"""
+    return os.path.splitext(bundle_path)[0] + '.forest'
+
+
+def _source_stamp(bundle_path):
+    st = os.stat(bundle_path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _forest_arrays(forest):
+    """CompiledForest -> {name: array} in the on-disk dtypes"""
+    if forest.n_features_in_ > np.iinfo(np.int16).max or forest.n_classes_ > np.iinfo(np.uint16).max:
+        raise ValueError('Too many features or classes for the compact format')
+    nonzero = forest.leaf_value != 0
+    leaf_rows, leaf_class = np.nonzero(nonzero)
+    leaf_ptr = np.zeros(len(forest.leaf_value) + 1, dtype=np.int32)
+    np.cumsum(nonzero.sum(axis=1), out=leaf_ptr[1:])
+    return {
+        'feature': forest.feature.astype(np.int16),
+        'threshold': forest.threshold.astype(np.float32),
+        'children': forest.children.astype(np.int32),
+        'roots': forest.roots.astype(np.int32),
+        'leaf_ptr': leaf_ptr,
+        'leaf_class': leaf_class.astype(np.uint16),
+        'leaf_prob': forest.leaf_value[leaf_rows, leaf_class]
+    }
+
+
+def _jsonable(metadata):
+    """Entries of a bundle dict that survive a JSON round trip"""
+    out = {}
+    for key, value in metadata.items():
+        if key in FOREST_KEYS:
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        out[key] = value
+    return out
+
+
+def export_bundle(bundle, bundle_path, path=None):
+    """Write the bundle's forest (and cascade first stage) as a compact file.
+
+    Raises TypeError if the bundle's model is not a random forest.
+    """
+    from forest_engine import compile_forest
+
+    path = path or forest_path(bundle_path)
+    forests = {'model': compile_forest(bundle['model'])}
+    cascade = bundle.get('cascade')
+    if cascade is not None:
+        forests['cascade'] = compile_forest(cascade['model'])
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'bundle': _jsonable(bundle),
+        'cascade': _jsonable(cascade) if cascade is not None else None,
+        'source': _source_stamp(bundle_path),
+        'forests': {},
+    }
+    blobs = []
+    offset = 0
+    for name, forest in forests.items():
+        entry = header['forests'][name] = {
+            'classes': [str(c) for c in forest.classes_],
+            'n_features': forest.n_features_in_,
+            'max_depth': forest.max_depth,
+            'arrays': {}
+        }
+        for key, array in _forest_arrays(forest).items():
+            array = np.ascontiguousarray(array)
+            entry['arrays'][key] = {'dtype': array.dtype.str, 'shape': list(array.shape),
+                                    'offset': offset}
+            blobs.append((offset, array))
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGN) * ALIGN
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+        for blob_offset, array in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(buf, path):
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f'{path} is not a compact forest file')
+    (length,) = struct.unpack('<I', bytes(buf[len(MAGIC):len(MAGIC) + 4]))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buf[start:start + length]))
+    if header['format_version'] > FORMAT_VERSION:
+        raise ValueError(f"{path} is format version {header['format_version']}, "
+                         f"this code reads up to {FORMAT_VERSION}")
+    return header, -(-(start + length) // ALIGN) * ALIGN
+
+
+def _load_forest(buf, data_start, entry):
+    from forest_engine import CompiledForest
+
+    arrays = {}
+    for key, spec in entry['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        start = data_start + spec['offset']
+        arrays[key] = buf[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    children = arrays['children']
+    is_leaf = children[:, 0] == np.arange(len(children))
+    leaf_id = np.where(is_leaf, np.cumsum(is_leaf) - 1, -1)
+
+    leaf_ptr = arrays['leaf_ptr']
+    leaf_value = np.zeros((len(leaf_ptr) - 1, len(entry['classes'])))
+    rows = np.repeat(np.arange(len(leaf_value)), np.diff(leaf_ptr))
+    leaf_value[rows, arrays['leaf_class']] = arrays['leaf_prob']
+
+    return CompiledForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        children=children,
+        leaf_id=leaf_id,
+        leaf_value=leaf_value,
+        roots=arrays['roots'],
+        max_depth=entry['max_depth'],
+        classes=np.array(entry['classes'], dtype=object),
+        n_features=entry['n_features']
+    )
+
+
+def load_forest_bundle(path, bundle_path=None):
+    """Bundle dict from a compact file, 'model' being a CompiledForest.
+
+    With bundle_path, returns None when that model.pkl no longer matches the
+    one the file was exported from.
+    """
+    buf = np.memmap(path, dtype=np.uint8, mode='r')
+    header, data_start = _read_header(buf, path)
+    if bundle_path is not None and header['source'] != _source_stamp(bundle_path):
+        return None
+
+    bundle = dict(header['bundle'])
+    bundle['model'] = _load_forest(buf, data_start, header['forests']['model'])
+    if header['cascade'] is not None:
+        bundle['cascade'] = dict(header['cascade'],
+                                 model=_load_forest(buf, data_start, header['forests']['cascade']))
+    return bundle
+
+
+def load_serving_bundle(path='model.pkl'):
+    """Bundle for prediction only: the compact file when it is current,
+    otherwise the pickle. Use load_bundle() for anything that refits."""
+    from model_bundle import load_bundle
+
+    compact = forest_path(path)
+    if os.path.exists(compact):
+        try:
+            bundle = load_forest_bundle(compact, path)
+            if bundle is not None:
+                return bundle
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring {compact}: {e}")
+    return load_bundle(path)
+
+
+def _measure(code):
+    """Run a loader in a fresh interpreter: (seconds, RSS MB added)"""
+    import subprocess
+
+    script = (
+        'import time\n'
+        'import numpy\n'
+        'def rss():\n'
+        '    with open("/proc/self/status") as f:\n'
+        '        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))\n'
+        'base = rss()\n'
+        'start = time.perf_counter()\n'
+        f'{code}\n'
+        'elapsed = time.perf_counter() - start\n'
+        'print(elapsed, (rss() - base) / 1024)\n'
+    )
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    elapsed, rss = out.stdout.split()[-2:]
+    return float(elapsed), float(rss)
+
+
+def compare(bundle_path):
+    """Print size, load time (imports included) and RSS of the pickle vs the compact file"""
+    bundle_path = os.path.abspath(bundle_path)
+    compact = forest_path(bundle_path)
+    rows = [
+        ('model.pkl (load + compile)', bundle_path,
+         'from cascade import serving_model\n'
+         'from model_bundle import load_bundle\n'
+         f'serving_model(load_bundle({bundle_path!r}))'),
+        ('model.forest (mmap)', compact,
+         'from cascade import serving_model\n'
+         'from forest_file import load_forest_bundle\n'
+         f'serving_model(load_forest_bundle({compact!r}))'),
+    ]
+    print(f"{'':28s} {'size':>10s} {'load':>10s} {'RSS':>10s}")
+    for name, path, code in rows:
+        elapsed, rss = _measure(code)
+        print(f'{name:28s} {os.path.getsize(path) / 1024:8.0f}KB {elapsed * 1000:8.1f}ms {rss:8.1f}MB')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compact array model file')
+    parser.add_argument('command', choices=['export', 'compare'])
+    parser.add_argument('bundle', nargs='?', default='model.pkl')
+    args = parser.parse_args()
+
+    from model_bundle import load_bundle
+
+    if args.command == 'export' or not os.path.exists(forest_path(args.bundle)):
+        path = export_bundle(load_bundle(args.bundle), args.bundle)
+        print(f"✅ Exported {args.bundle} -> {path}")
+    if args.command == 'compare':
+        compare(args.bundle)
@@ -0,0 +1,303 @@
+"""
+Append-only binary gesture store
+
+Replaces gestures.csv as the training dataset. A store is a directory with:
+
+    landmarks.f32   N x 42 little-endian float32, fixed width (168 bytes/row)
+    labels.u16      N little-endian uint16 label ids
+    labels.json     label dictionary (id -> label text)
+    hands.u8        N handedness tags (multi_hand.py), only in stores that
+                    have had tagged rows appended; shorter than the other
+                    columns when tags started after the first rows
+
+The landmark file can be memory-mapped straight into training, the row count
+is a file size division, and appending a row is two small writes. Appends
+hold an exclusive lock on store.lock, so several processes (e.g. serve.py
+workers) can append to one store; without fcntl (Windows) they are only
+serialized within a process.
+
+open_store() imports gestures.csv into a scratch directory next to the store
+and renames it into place once the import is complete, so an interrupted
+import leaves no store behind (the next open imports again) rather than a
+partial one that looks complete.
+
+Usage:
+    python gesture_store.py import gestures.csv     # one-shot CSV import
+    python gesture_store.py export gestures.csv     # back to CSV
+    python gesture_store.py info
+"""
+import csv
+import json
+import os
+import shutil
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STORE_DIR = 'gesture_store'
+N_FEATURES = 42
+LANDMARK_DTYPE = np.dtype('<f4')
+LABEL_DTYPE = np.dtype('<u2')
+HAND_DTYPE = np.dtype('u1')
+ROW_BYTES = N_FEATURES * LANDMARK_DTYPE.itemsize
+
+
+class GestureStore:
+    """Fixed-width float32 landmark matrix plus label-id column"""
+
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        self.landmarks_path = os.path.join(path, 'landmarks.f32')
+        self.labels_path = os.path.join(path, 'labels.u16')
+        self.dictionary_path = os.path.join(path, 'labels.json')
+        self.hands_path = os.path.join(path, 'hands.u8')
+        self.lock_path = os.path.join(path, 'store.lock')
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        for file_path in (self.landmarks_path, self.labels_path):
+            if not os.path.exists(file_path):
+                open(file_path, 'ab').close()
+
+        self.label_names = []
+        self._label_ids = {}
+        self._reload_dictionary()
+
+    @staticmethod
+    def exists(path=STORE_DIR):
+        return os.path.exists(os.path.join(path, 'labels.u16'))
+
+    def __len__(self):
+        # labels.u16 is written after landmarks.f32, so its size is the
+        # number of complete rows
+        return os.path.getsize(self.labels_path) // LABEL_DTYPE.itemsize
+
+    def _reload_dictionary(self):
+        if os.path.exists(self.dictionary_path):
+            with open(self.dictionary_path, encoding='utf-8') as f:
+                self.label_names = json.load(f)
+            self._label_ids = {name: i for i, name in enumerate(self.label_names)}
+
+    def _label_id(self, label):
+        """Id for a label, adding it to the dictionary if new (lock held)"""
+        label = str(label)
+        label_id = self._label_ids.get(label)
+        if label_id is None:
+            # Another process (e.g. collect_data..py) may have added labels
+            self._reload_dictionary()
+            label_id = self._label_ids.get(label)
+        if label_id is None:
+            label_id = len(self.label_names)
+            if label_id > np.iinfo(LABEL_DTYPE).max:
+                raise ValueError('Too many distinct labels for a uint16 label column')
+            self.label_names.append(label)
+            self._label_ids[label] = label_id
+
+            tmp_path = f'{self.dictionary_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.label_names, f, ensure_ascii=False)
+            os.replace(tmp_path, self.dictionary_path)
+        return label_id
+
+    @contextmanager
+    def _process_lock(self):
+        """Exclusive lock across processes appending to this store"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def append(self, landmarks, label, hand=0):
+        """Append one 42-value row (hand: multi_hand.hand_tag())"""
+        return self.append_many([landmarks], [label], hands=[hand] if hand else None)
+
+    def append_many(self, rows, labels, fsync=False, hands=None):
+        """Append N rows with their labels; returns the new row count.
+
+        hands is an optional handedness tag per row. With fsync=True all
+        files are synced to disk before returning.
+        """
+        X = np.ascontiguousarray(rows, dtype=LANDMARK_DTYPE).reshape(-1, N_FEATURES)
+        if len(X) != len(labels):
+            raise ValueError(f'{len(X)} rows but {len(labels)} labels')
+        if hands is not None and len(hands) != len(X):
+            raise ValueError(f'{len(X)} rows but {len(hands)} hand tags')
+
+        with self._lock, self._process_lock():
+            ids = np.array([self._label_id(label) for label in labels], dtype=LABEL_DTYPE)
+
+            # Trim a torn landmark write left by a crash before appending
+            n_rows = len(self)
+            if os.path.getsize(self.landmarks_path) != n_rows * ROW_BYTES:
+                with open(self.landmarks_path, 'r+b') as f:
+                    f.truncate(n_rows * ROW_BYTES)
+
+            with open(self.landmarks_path, 'ab') as f:
+                f.write(X.tobytes())
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            if hands is not None or os.path.exists(self.hands_path):
+                self._append_hands(n_rows, hands, len(X), fsync)
+            with open(self.labels_path, 'ab') as f:
+                f.write(ids.tobytes())
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            return n_rows + len(X)
+
+    def _append_hands(self, n_rows, hands, count, fsync):
+        """Write tags for rows n_rows.. (lock held), untagged rows before as 0"""
+        tags = np.zeros(count, dtype=HAND_DTYPE) if hands is None else np.asarray(hands, dtype=HAND_DTYPE)
+        with open(self.hands_path, 'a+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size > n_rows:
+                f.truncate(n_rows)  # torn write
+            elif size < n_rows:
+                f.write(bytes(n_rows - size))
+            f.write(tags.tobytes())
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def landmarks(self, n_rows=None):
+        """Read-only memory-mapped N x 42 float32 matrix (no copy, no parsing)"""
+        n_rows = len(self) if n_rows is None else n_rows
+        if n_rows == 0:
+            return np.empty((0, N_FEATURES), dtype=LANDMARK_DTYPE)
+        return np.memmap(self.landmarks_path, dtype=LANDMARK_DTYPE, mode='r',
+                         shape=(n_rows, N_FEATURES))
+
+    def label_ids(self, n_rows=None):
+        """Read-only memory-mapped uint16 label-id column"""
+        n_rows = len(self) if n_rows is None else n_rows
+        if n_rows == 0:
+            return np.empty(0, dtype=LABEL_DTYPE)
+        return np.memmap(self.labels_path, dtype=LABEL_DTYPE, mode='r', shape=(n_rows,))
+
+    def hand_tags(self, n_rows=None):
+        """uint8 handedness tag per row, 0 where none was recorded"""
+        n_rows = len(self) if n_rows is None else n_rows
+        tags = np.zeros(n_rows, dtype=HAND_DTYPE)
+        if os.path.exists(self.hands_path):
+            with open(self.hands_path, 'rb') as f:
+                stored = np.frombuffer(f.read(n_rows), dtype=HAND_DTYPE)
+            tags[:len(stored)] = stored
+        return tags
+
+    def load(self):
+        """(X, y) for training: X memory-mapped, y as label strings"""
+        n_rows = len(self)
+        # Labels may have been added by another process
+        with self._lock:
+            self._reload_dictionary()
+        X = self.landmarks(n_rows)
+        y = np.asarray(self.label_names, dtype=object)[self.label_ids(n_rows)]
+        return X, y
+
+    def label_counts(self):
+        counts = np.bincount(self.label_ids(), minlength=len(self.label_names))
+        return {name: int(count) for name, count in zip(self.label_names, counts)}
+
+    def rows_for_label(self, label):
+        """Row indices for one label; landmarks()[idx] gives its samples"""
+        label_id = self._label_ids.get(str(label))
+        if label_id is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.label_ids() == label_id)
+
+    def import_csv(self, csv_path='gestures.csv', chunk_rows=65536):
+        """Append every row of a gestures.csv (header row is skipped)"""
+        imported = 0
+        rows, labels = [], []
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for record in csv.reader(f):
+                if len(record) != N_FEATURES + 1:
+                    continue
+                try:
+                    rows.append([float(v) for v in record[:N_FEATURES]])
+                except ValueError:
+                    continue  # header written by collect_data..py
+                labels.append(record[-1])
+                if len(rows) >= chunk_rows:
+                    self.append_many(rows, labels)
+                    imported += len(rows)
+                    rows, labels = [], []
+        if rows:
+            self.append_many(rows, labels)
+            imported += len(rows)
+        return imported
+
+    def export_csv(self, csv_path='gestures.csv'):
+        """Write 42 values + label per row; hand tags stay in the store"""
+        X, y = self.load()
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for row, label in zip(X, y):
+                writer.writerow([repr(float(v)) for v in row] + [label])
+        return len(X)
+
+
+def open_store(path=STORE_DIR, csv_path='gestures.csv'):
+    """Open the gesture store, importing gestures.csv the first time"""
+    if GestureStore.exists(path) or not os.path.exists(csv_path):
+        return GestureStore(path)
+
+    tmp_path = f'{os.path.normpath(path)}.import-{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    try:
+        imported = GestureStore(tmp_path).import_csv(csv_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not GestureStore.exists(path):
+            raise
+        # Another process finished its import first
+    else:
+        print(f"✅ Imported {imported} rows from {csv_path} into {path}/")
+    return GestureStore(path)
+
+
+def load_dataset(path=STORE_DIR, csv_path='gestures.csv'):
+    """(X, y) training data from the gesture store"""
+    return open_store(path, csv_path).load()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'info'
+    if command == 'import':
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else 'gestures.csv'
+        count = GestureStore().import_csv(csv_path)
+        print(f"✅ Imported {count} rows from {csv_path}")
+    elif command == 'export':
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else 'gestures.csv'
+        count = GestureStore().export_csv(csv_path)
+        print(f"✅ Exported {count} rows to {csv_path}")
+    else:
+        store = GestureStore()
+        print(f"📁 {store.path}: {len(store)} rows, {len(store.label_names)} labels")
+        for name, count in store.label_counts().items():
+            print(f"   {name}: {count}")
+        tags = store.hand_tags()
+        if tags.any():
+            from multi_hand import HAND_TAGS, PAIRED
+            print(f"🖐️ left {int(((tags & 0x3) == HAND_TAGS['Left']).sum())}, "
+                  f"right {int(((tags & 0x3) == HAND_TAGS['Right']).sum())}, "
+                  f"untagged {int(((tags & 0x3) == 0).sum())}, "
+                  f"two-hand captures {int((tags & PAIRED).astype(bool).sum()) // 2}")
@@ -0,0 +1,208 @@
+"""
+Background, batched writer for /api/save_gesture
+
+Request threads only enqueue rows; one writer thread appends them to the
+gesture store in batches, so concurrent collectors never interleave partial
+rows and no request pays for opening files.
+
+Durability modes:
+    'flush'  every batch is written to the OS before it is acknowledged
+             (survives a process crash)
+    'fsync'  additionally fsync()s after every `fsync_every` rows
+             (survives power loss, costs a disk sync)
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from gesture_store import N_FEATURES
+
+MAX_FAILED_RANGES = 1000    # failed submissions remembered for wait_for()
+
+
+class WriteFailed(Exception):
+    """The rows of a submission could not be appended to the store"""
+
+
+class GestureWriter:
+    """Single writer thread with a bounded queue in front of a GestureStore"""
+
+    def __init__(self, store, max_queue=10000, batch_rows=256, flush_interval=0.2,
+                 durability='flush', fsync_every=1000, put_timeout=0.5):
+        if durability not in ('flush', 'fsync'):
+            raise ValueError(f"durability must be 'flush' or 'fsync', got {durability!r}")
+
+        self.store = store
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.fsync_every = fsync_every
+        self.put_timeout = put_timeout
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        # _submit_lock keeps sequence numbers in queue order; it is never
+        # needed by the writer thread, so a blocked put() can't stall it
+        self._submit_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._next_seq = 0
+        self._submitted = 0     # last sequence number queued
+        self._written = 0       # last sequence number written (or failed)
+        self._failed = deque(maxlen=MAX_FAILED_RANGES)  # (first, last, error)
+        self._since_fsync = 0
+        self._closed = False
+
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rejected = 0
+        self.last_error = None
+
+        self._thread = threading.Thread(target=self._run, name='gesture-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, landmarks, label, hand=0):
+        """Queue one row and return its sequence number.
+
+        Raises ValueError for a row that isn't 42 finite numbers and
+        queue.Full when the writer can't keep up (backpressure).
+        """
+        return self.submit_group([landmarks], label, [hand])
+
+    def submit_group(self, rows, label, hands):
+        """Queue rows that must be stored consecutively (the hands of one
+        two-hand capture) as one item; returns its sequence number"""
+        # Checked here, on the request thread: a bad row that reached the
+        # writer would fail the whole batch, other clients' rows included
+        try:
+            group = np.asarray(rows, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError('Landmarks must be numbers') from None
+        if group.ndim != 2 or group.shape[1] != N_FEATURES or not len(group):
+            raise ValueError(f'Invalid landmarks shape: {list(group.shape)}, expected N x {N_FEATURES}')
+        if not np.isfinite(group).all():
+            raise ValueError('Landmarks must be finite numbers')
+        if len(hands) != len(group):
+            raise ValueError(f'{len(group)} rows but {len(hands)} hand tags')
+        item = group, label, list(hands)
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError('Gesture writer is closed')
+            seq = self._next_seq + 1
+            try:
+                # Sequence numbers must reach the queue in order, so the put
+                # happens under the submit lock (but not under _cond)
+                self._queue.put((seq, *item), timeout=self.put_timeout)
+            except queue.Full:
+                self.rejected += 1
+                raise
+            self._next_seq = seq
+            with self._cond:
+                self._submitted = seq
+        return seq
+
+    def wait_for(self, seq, timeout=None, first=None):
+        """Block until submission `seq` has been written; False on timeout.
+
+        Raises WriteFailed when its rows (or those of any submission from
+        `first` on) could not be appended.
+        """
+        first = seq if first is None else first
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._written >= seq, timeout):
+                return False
+            for start, end, error in self._failed:
+                if start <= seq and end >= first:
+                    raise WriteFailed(error)
+        return True
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been handled"""
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self, timeout=5.0):
+        """Stop accepting rows, drain the queue and stop the thread"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _take_batch(self):
+        """Block for the first row, then gather until size or time limit"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._take_batch()
+            if not batch:
+                continue
+
+            rows, labels, hands = [], [], []
+            for _, group, label, tags in batch:
+                rows.append(group)
+                labels.extend([label] * len(group))
+                hands.extend(tags)
+            rows = np.concatenate(rows)
+
+            error = None
+            sync = False
+            if self.durability == 'fsync':
+                self._since_fsync += len(rows)
+                sync = self._since_fsync >= self.fsync_every or stop
+            try:
+                self.store.append_many(rows, labels, fsync=sync,
+                                       hands=hands if any(hands) else None)
+                self.rows_written += len(rows)
+                if sync:
+                    self._since_fsync = 0
+            except Exception as e:
+                print(f"❌ Gesture writer error: {e}")
+                self.rows_failed += len(rows)
+                self.last_error = error = str(e)
+
+            self.batches += 1
+            with self._cond:
+                if error is not None:
+                    self._failed.append((batch[0][0], batch[-1][0], error))
+                self._written = batch[-1][0]
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            pending = self._submitted - self._written
+        return {
+            'durability': self.durability,
+            'queue_depth': self._queue.qsize(),
+            'pending_rows': pending,
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+            'rows_failed': self.rows_failed,
+            'rejected': self.rejected,
+            'last_error': self.last_error
+        }
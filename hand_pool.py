@@ -0,0 +1,230 @@
+"""
+Server-side hand landmark extraction
+
+HandPool runs MediaPipe Hands in a few worker threads so clients that can't
+run MediaPipe themselves can upload camera frames. Hands objects are not
+thread-safe, so every worker owns its own:
+
+    - frames with a session id always go to the same worker, which keeps one
+      tracking (static_image_mode=False) Hands per session, so tracking
+      carries over from frame to frame
+    - frames without a session use the worker's static_image_mode=True Hands
+
+Each worker has a bounded queue; when it is full, submit() raises PoolBusy
+and the endpoint answers 503 instead of letting latency grow without bound.
+A request that times out cancels its frames (ExtractTimeout, answered with
+504), so workers don't spend MediaPipe time on results nobody will read.
+Decoding (cv2.imdecode) also happens on the worker.
+"""
+import base64
+import queue
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+N_FEATURES = 42
+
+
+class PoolBusy(Exception):
+    """The worker queue for this frame is full"""
+
+
+class ExtractTimeout(Exception):
+    """The frames were not processed in time (and were cancelled if still queued)"""
+
+
+def mediapipe_hands(static):
+    import mediapipe as mp
+    return mp.solutions.hands.Hands(
+        static_image_mode=static,
+        max_num_hands=1,
+        model_complexity=0,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+def decode_frame(data):
+    """JPEG/PNG bytes -> BGR image (ndarray input is passed through)"""
+    import cv2
+    import numpy as np
+
+    if isinstance(data, np.ndarray):
+        return data
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError('Could not decode image (expected JPEG or PNG)')
+    return frame
+
+
+def frames_from_request(req):
+    """(list of image bytes, session id) from a Flask request.
+
+    Accepts multipart uploads (one or more 'frame' files), a raw image/*
+    body, or JSON {"frame": b64} / {"frames": [b64, ...]} where each entry
+    may be a data: URL. The session comes from the form, JSON or ?session=.
+    """
+    session = req.args.get('session')
+    if req.files:
+        frames = [f.read() for f in req.files.getlist('frame') or req.files.values()]
+        return frames, req.form.get('session', session)
+    if req.mimetype and req.mimetype.startswith('image/'):
+        return [req.get_data()], session
+
+    data = req.get_json(silent=True) or {}
+    encoded = data.get('frames') or ([data['frame']] if data.get('frame') else [])
+    frames = []
+    for item in encoded:
+        if ',' in item[:100] and item.startswith('data:'):
+            item = item.split(',', 1)[1]
+        frames.append(base64.b64decode(item))
+    return frames, data.get('session', session)
+
+
+class _Worker(threading.Thread):
+    def __init__(self, index, queue_size, hands_factory, decoder, max_sessions, session_idle):
+        super().__init__(name=f'hand-worker-{index}', daemon=True)
+        self.tasks = queue.Queue(maxsize=queue_size)
+        self.hands_factory = hands_factory
+        self.decoder = decoder
+        self.max_sessions = max_sessions
+        self.session_idle = session_idle
+        self.static_hands = None
+        self.sessions = OrderedDict()  # session -> [hands, last_used]
+        self.frames = 0
+        self.busy = 0.0
+
+    def _hands_for(self, session):
+        if session is None:
+            if self.static_hands is None:
+                self.static_hands = self.hands_factory(True)
+            return self.static_hands
+
+        now = time.monotonic()
+        # Close trackers for sessions that went quiet, then the least
+        # recently used one if there are still too many
+        for old, (hands, last_used) in list(self.sessions.items()):
+            if now - last_used > self.session_idle and old != session:
+                self._close(self.sessions.pop(old)[0])
+        if session not in self.sessions:
+            while len(self.sessions) >= self.max_sessions:
+                self._close(self.sessions.popitem(last=False)[1][0])
+            self.sessions[session] = [self.hands_factory(False), now]
+        entry = self.sessions[session]
+        entry[1] = now
+        self.sessions.move_to_end(session)
+        return entry[0]
+
+    @staticmethod
+    def _close(hands):
+        close = getattr(hands, 'close', None)
+        if close is not None:
+            close()
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            frames, session, mirror, future = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.perf_counter()
+            try:
+                hands = self._hands_for(session)
+                future.set_result([self._landmarks(hands, frame, mirror) for frame in frames])
+            except Exception as e:
+                future.set_exception(e)
+            self.frames += len(frames)
+            self.busy += time.perf_counter() - start
+
+    def _landmarks(self, hands, data, mirror):
+        import numpy as np
+
+        frame = self.decoder(data)
+        # BGR -> RGB, and mirrored like the webcam frames the model was
+        # trained on, in a single copy
+        rgb = frame[:, ::-1, ::-1] if mirror else frame[:, :, ::-1]
+        result = hands.process(np.ascontiguousarray(rgb))
+        if not result.multi_hand_landmarks:
+            return None
+        row = []
+        for lm in result.multi_hand_landmarks[0].landmark:
+            row.extend([float(lm.x), float(lm.y)])
+        return row if len(row) == N_FEATURES else None
+
+
+class HandPool:
+    """Worker threads that turn image frames into 42-value landmark rows"""
+
+    def __init__(self, workers=2, queue_size=8, max_sessions=4, session_idle=30.0,
+                 hands_factory=mediapipe_hands, decoder=decode_frame):
+        self._workers = [
+            _Worker(i, queue_size, hands_factory, decoder, max_sessions, session_idle)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'shed': 0, 'timed_out': 0, 'cancelled': 0}
+
+    def _pick(self, session):
+        if session is not None:
+            # Stable affinity: a session's frames always reach the same tracker
+            return self._workers[zlib.crc32(str(session).encode('utf-8')) % len(self._workers)]
+        return min(self._workers, key=lambda w: w.tasks.qsize())
+
+    def submit(self, frames, session=None, mirror=True):
+        """Future for [landmarks or None per frame]; raises PoolBusy when full"""
+        future = Future()
+        worker = self._pick(session)
+        try:
+            worker.tasks.put_nowait((list(frames), session, mirror, future))
+        except queue.Full:
+            with self._lock:
+                self._stats['shed'] += 1
+            raise PoolBusy(f'{worker.name} queue is full')
+        with self._lock:
+            self._stats['requests'] += 1
+        return future
+
+    def extract(self, frames, session=None, mirror=True, timeout=5.0):
+        """[landmarks or None per frame]; raises PoolBusy or ExtractTimeout"""
+        future = self.submit(frames, session, mirror)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # Still queued: the worker skips it. Already running: the
+            # result is dropped.
+            cancelled = future.cancel()
+            with self._lock:
+                self._stats['timed_out'] += 1
+                self._stats['cancelled'] += int(cancelled)
+            raise ExtractTimeout(f'No landmarks after {timeout:g}s - frame workers are behind') from None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = [
+            {
+                'name': w.name,
+                'queued': w.tasks.qsize(),
+                'frames': w.frames,
+                'avg_ms': w.busy / w.frames * 1000.0 if w.frames else 0.0,
+                'sessions': len(w.sessions)
+            }
+            for w in self._workers
+        ]
+        return stats
+
+    def close(self):
+        for worker in self._workers:
+            try:
+                worker.tasks.put(None, timeout=1.0)
+            except queue.Full:
+                pass
+        for worker in self._workers:
+            worker.join(timeout=2.0)
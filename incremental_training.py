@@ -0,0 +1,148 @@
+"""
+Incremental model updates
+
+Instead of refitting the whole forest on every retrain, grow the existing
+RandomForestClassifier (warm_start) with a few trees fitted on the rows that
+arrived since the last fit plus a slice of recent data, and retire the oldest
+trees once the forest reaches MAX_TREES. The gesture store is append-only, so
+the bundle's n_dataset_rows marks exactly where the new rows start.
+
+A full rebuild is chosen instead when:
+    - there is no usable bundle (missing, legacy pickle, not a forest)
+    - the new rows contain labels the model has never seen
+    - FULL_REBUILD_EVERY incremental updates have happened since the last one
+    - accuracy on the new rows has drifted DRIFT_ACCURACY_DROP below the
+      accuracy recorded by the last full rebuild (an update's own holdout is
+      a handful of new rows - too noisy to become the baseline - so it is
+      stored as update_accuracy and the bundle's accuracy carries over)
+    - the store shrank (it was rebuilt)
+"""
+import numpy as np
+from sklearn.utils.class_weight import compute_class_weight
+
+from model_bundle import data_fingerprint
+
+INCREMENTAL_TREES = 20      # trees added per incremental update
+MAX_TREES = 300             # oldest trees are retired beyond this
+FULL_REBUILD_EVERY = 10     # incremental updates between forced full rebuilds
+DRIFT_ACCURACY_DROP = 0.15  # rebuild when new-row accuracy falls this far
+RECENT_ROWS = 2000          # most recent older rows mixed into each update
+ANCHOR_ROWS_PER_CLASS = 20  # older rows per class so every class is present
+HOLDOUT_FRACTION = 0.2      # share of new rows kept back for evaluation
+
+
+def choose_mode(bundle, X, y):
+    """Return ('full' | 'incremental', reason) for the data in the store"""
+    if bundle is None or bundle.get('n_dataset_rows') is None:
+        return 'full', 'no bundle with dataset metadata'
+
+    model = bundle['model']
+    if not hasattr(model, 'estimators_') or not hasattr(model, 'warm_start'):
+        return 'full', 'model is not a random forest'
+
+    n_old = bundle['n_dataset_rows']
+    if len(X) < n_old:
+        return 'full', 'dataset is smaller than when the model was trained'
+    if len(X) == n_old:
+        return 'full', 'no new rows since the last fit'
+
+    # Older rows count too: a label whose rows all landed in the previous
+    # fit's test split was never learned, and the warm-started trees can't
+    # add a class to the forest
+    new_labels = set(np.unique(y)) - set(bundle['classes'])
+    if new_labels:
+        return 'full', f'new labels: {sorted(new_labels)}'
+
+    if bundle.get('incremental_updates', 0) >= FULL_REBUILD_EVERY:
+        return 'full', f'{FULL_REBUILD_EVERY} incremental updates since the last rebuild'
+
+    baseline = bundle.get('accuracy')
+    if baseline is not None:
+        new_accuracy = float((model.predict(X[n_old:]) == y[n_old:]).mean())
+        if new_accuracy < baseline - DRIFT_ACCURACY_DROP:
+            return 'full', f'drift: accuracy on new rows {new_accuracy:.2f} vs {baseline:.2f}'
+
+    return 'incremental', f'{len(X) - n_old} new rows'
+
+
+def _update_rows(X, y, n_old, classes, rng):
+    """Row indices for one update: new rows, recent rows and per-class anchors"""
+    new_rows = np.arange(n_old, len(X))
+    recent_rows = np.arange(max(0, n_old - RECENT_ROWS), n_old)
+
+    # warm_start requires every class in each fit, so add a few old rows of
+    # each class (older than the recent window). Look in a random sample
+    # first and only scan all older rows for classes the sample missed.
+    anchors = []
+    n_older = max(0, n_old - RECENT_ROWS)
+    sample = rng.choice(n_older, min(n_older, 50 * ANCHOR_ROWS_PER_CLASS * len(classes)), replace=False)
+    sample_labels = y[sample]
+    for label in classes:
+        rows = sample[sample_labels == label]
+        if len(rows) < ANCHOR_ROWS_PER_CLASS:
+            rows = np.flatnonzero(y[:n_older] == label)
+        if len(rows):
+            anchors.append(rng.choice(rows, min(len(rows), ANCHOR_ROWS_PER_CLASS), replace=False))
+    anchor_rows = np.concatenate(anchors) if anchors else np.empty(0, dtype=np.intp)
+
+    return new_rows, np.concatenate([recent_rows, anchor_rows])
+
+
+def incremental_update(bundle, X, y, random_state=None):
+    """Grow the bundle's forest with trees fitted on the new rows.
+
+    Returns (model, info) where info holds the metadata for the new bundle.
+    """
+    model = bundle['model']
+    n_old = bundle['n_dataset_rows']
+    rng = np.random.default_rng(random_state)
+
+    new_rows, context_rows = _update_rows(X, y, n_old, bundle['classes'], rng)
+    rng.shuffle(new_rows)
+    n_holdout = int(len(new_rows) * HOLDOUT_FRACTION) if len(new_rows) >= 10 else 0
+    holdout_rows, fit_new_rows = new_rows[:n_holdout], new_rows[n_holdout:]
+    fit_rows = np.sort(np.concatenate([fit_new_rows, context_rows]))
+
+    X_fit, y_fit = np.asarray(X[fit_rows]), y[fit_rows]
+    missing = set(bundle['classes']) - set(np.unique(y_fit))
+    if missing:
+        raise ValueError(f'Incremental fit is missing classes {sorted(missing)}')
+
+    # 'balanced' class weights would be computed from this subset's label
+    # counts (sklearn warns about it with warm_start); weight by the whole
+    # store instead, like the trees from the full fit
+    class_weight = model.class_weight
+    if class_weight in ('balanced', 'balanced_subsample'):
+        classes = np.asarray(bundle['classes'])
+        weights = compute_class_weight('balanced', classes=classes, y=y)
+        model.set_params(class_weight=dict(zip(classes, weights)))
+
+    n_before = len(model.estimators_)
+    model.set_params(warm_start=True, n_estimators=n_before + INCREMENTAL_TREES)
+    model.fit(X_fit, y_fit)
+    model.set_params(warm_start=False, class_weight=class_weight)
+
+    # Retire the oldest trees (they were fitted on the oldest data)
+    retired = max(0, len(model.estimators_) - MAX_TREES)
+    if retired:
+        model.estimators_ = model.estimators_[retired:]
+        model.set_params(n_estimators=len(model.estimators_))
+
+    update_accuracy = (float((model.predict(X[holdout_rows]) == y[holdout_rows]).mean())
+                       if n_holdout else None)
+
+    info = {
+        'training_mode': 'incremental',
+        'incremental_updates': bundle.get('incremental_updates', 0) + 1,
+        'trees_added': INCREMENTAL_TREES,
+        'trees_retired': retired,
+        'new_rows': int(len(new_rows)),
+        'n_train_rows': int(len(fit_rows)),
+        # Chain the previous fingerprint with the new rows instead of
+        # rehashing the whole corpus
+        'data_fingerprint': data_fingerprint(X[n_old:], y[n_old:],
+                                             previous=bundle.get('data_fingerprint')),
+        'accuracy': bundle.get('accuracy'),
+        'update_accuracy': update_accuracy
+    }
+    return model, info
@@ -0,0 +1,263 @@
+"""
+Batch landmark extraction from recorded videos and images
+
+Turns folders of media into gesture store rows without a webcam. The folder
+name is the label:
+
+    recordings/
+        hello/session1.mp4
+        hello/IMG_0001.jpg
+        thumbs up/clip.mov
+
+Files are spread over a process pool; every worker owns its own MediaPipe
+Hands instances. The main process de-duplicates the rows (quantized to
+DEDUP_STEP, per label, including rows already in the store) and appends them.
+Finished files are recorded in a manifest inside the store so an interrupted
+run can simply be started again.
+
+Usage:
+    python ingest_media.py recordings/ [--workers 8] [--every 3] [--no-flip]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from gesture_store import N_FEATURES, STORE_DIR, open_store
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+MANIFEST_FILE = 'ingest_manifest.json'
+DEDUP_STEP = 0.005  # landmark grid used to detect duplicate rows (0 disables)
+
+
+def find_media(root):
+    """Sorted (path, label) for every video/image one folder below root"""
+    media = []
+    for label in sorted(os.listdir(root)):
+        folder = os.path.join(root, label)
+        if not os.path.isdir(folder):
+            continue
+        for dirpath, _, filenames in os.walk(folder):
+            for name in sorted(filenames):
+                if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS | IMAGE_EXTENSIONS:
+                    media.append((os.path.join(dirpath, name), label))
+    return media
+
+
+def file_key(path, root):
+    """Manifest key: relative path plus size and mtime, so edited files rerun"""
+    stat = os.stat(path)
+    return f'{os.path.relpath(path, root)}|{stat.st_size}|{stat.st_mtime_ns}'
+
+
+class Manifest:
+    """Files already ingested into a store (JSON, rewritten atomically)"""
+
+    def __init__(self, store_path):
+        self.path = os.path.join(store_path, MANIFEST_FILE)
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.files = json.load(f)
+
+    def __contains__(self, key):
+        return key in self.files
+
+    def add(self, key, info):
+        self.files[key] = info
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.files, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+class Deduplicator:
+    """Drops rows whose quantized landmarks were already seen for that label"""
+
+    def __init__(self, step=DEDUP_STEP):
+        self.step = step
+        self.seen = set()
+
+    def _keys(self, rows, label):
+        grid = np.round(np.asarray(rows, dtype=np.float32) / self.step).astype(np.int32)
+        prefix = label.encode('utf-8') + b'\0'
+        return [prefix + row.tobytes() for row in grid]
+
+    def seed(self, X, y):
+        """Remember rows already in the store"""
+        if not self.step:
+            return
+        for label in np.unique(y):
+            self.seen.update(self._keys(X[y == label], str(label)))
+
+    def filter(self, rows, label):
+        """Rows not seen before (also removes repeats within `rows`)"""
+        if not self.step or not len(rows):
+            return rows
+        keep = []
+        for i, key in enumerate(self._keys(rows, label)):
+            if key not in self.seen:
+                self.seen.add(key)
+                keep.append(i)
+        return rows[keep]
+
+
+# === Worker process ===
+_hands = {}  # static_image_mode -> Hands, one set per worker process
+
+
+def _init_worker():
+    # Keep each worker on one core; the pool provides the parallelism
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def _get_hands(static):
+    if static not in _hands:
+        import mediapipe as mp
+        _hands[static] = mp.solutions.hands.Hands(
+            static_image_mode=static,
+            max_num_hands=1,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    return _hands[static]
+
+
+def _landmarks(hands, frame, flip):
+    import cv2
+
+    if flip:
+        # Match the mirrored webcam frames collect_data..py and detect_sign.py use
+        frame = cv2.flip(frame, 1)
+    result = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    if not result.multi_hand_landmarks:
+        return None
+    row = []
+    for lm in result.multi_hand_landmarks[0].landmark:
+        row.extend([lm.x, lm.y])
+    return row if len(row) == N_FEATURES else None
+
+
+def extract_file(path, every=1, flip=True):
+    """(rows, frames_read) for one video or image, run in a pool worker"""
+    import cv2
+
+    rows = []
+    frames = 0
+    if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+        frame = cv2.imread(path)
+        if frame is None:
+            raise ValueError(f'Could not read image {path}')
+        frames = 1
+        row = _landmarks(_get_hands(True), frame, flip)
+        if row is not None:
+            rows.append(row)
+    else:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise ValueError(f'Could not open video {path}')
+        # Fresh tracker per video so tracking state never carries across files
+        hands = _get_hands(False)
+        hands.reset()
+        try:
+            while True:
+                # grab() skips decoding the frames we don't sample
+                if not cap.grab():
+                    break
+                frames += 1
+                if (frames - 1) % every:
+                    continue
+                ok, frame = cap.retrieve()
+                if not ok:
+                    break
+                row = _landmarks(hands, frame, flip)
+                if row is not None:
+                    rows.append(row)
+        finally:
+            cap.release()
+
+    return np.asarray(rows, dtype=np.float32).reshape(-1, N_FEATURES), frames
+
+
+# === Main process ===
+def ingest(root, store_path=STORE_DIR, workers=None, every=1, flip=True,
+           dedup_step=DEDUP_STEP, resume=True):
+    """Extract landmarks from every file under root into the gesture store"""
+    store = open_store(store_path)
+    manifest = Manifest(store_path)
+
+    media = find_media(root)
+    todo = []
+    for path, label in media:
+        key = file_key(path, root)
+        if resume and key in manifest:
+            continue
+        todo.append((path, label, key))
+    print(f"📁 {len(media)} files under {root}, {len(media) - len(todo)} already ingested")
+
+    dedup = Deduplicator(dedup_step)
+    if len(store):
+        X, y = store.load()
+        dedup.seed(X, y)
+
+    totals = {'files': 0, 'failed': 0, 'frames': 0, 'hands': 0, 'rows': 0, 'duplicates': 0}
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    # spawn: MediaPipe and OpenCV do not survive a fork reliably
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker) as pool:
+        futures = {pool.submit(extract_file, path, every, flip): (path, label, key)
+                   for path, label, key in todo}
+        for future in as_completed(futures):
+            path, label, key = futures[future]
+            try:
+                rows, frames = future.result()
+            except Exception as e:
+                totals['failed'] += 1
+                print(f"❌ {path}: {e}")
+                continue
+
+            new_rows = dedup.filter(rows, label)
+            if len(new_rows):
+                store.append_many(new_rows, [label] * len(new_rows))
+            # Rows first, then the manifest: a crash in between only means the
+            # file is re-read next time, and dedup drops its rows again
+            manifest.add(key, {'label': label, 'frames': frames, 'rows': int(len(new_rows))})
+
+            totals['files'] += 1
+            totals['frames'] += frames
+            totals['hands'] += len(rows)
+            totals['rows'] += len(new_rows)
+            totals['duplicates'] += len(rows) - len(new_rows)
+            print(f"✅ [{totals['files'] + totals['failed']}/{len(todo)}] {path}: "
+                  f"{len(new_rows)} rows ({frames} frames, {len(rows) - len(new_rows)} duplicates)")
+
+    totals['seconds'] = time.perf_counter() - start
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract gesture landmarks from video/image folders')
+    parser.add_argument('root', help='directory with one sub-folder per label')
+    parser.add_argument('--store', default=STORE_DIR, help='gesture store directory')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--every', type=int, default=1, help='use every Nth video frame')
+    parser.add_argument('--no-flip', action='store_true',
+                        help='media is already mirrored like the webcam preview')
+    parser.add_argument('--dedup-step', type=float, default=DEDUP_STEP,
+                        help='quantization step for duplicate detection (0 disables)')
+    parser.add_argument('--no-resume', action='store_true', help='ignore the ingest manifest')
+    args = parser.parse_args()
+
+    totals = ingest(args.root, args.store, args.workers, max(1, args.every), not args.no_flip,
+                    args.dedup_step, not args.no_resume)
+    rate = totals['frames'] / totals['seconds'] if totals['seconds'] else 0.0
+    print(f"🏁 {totals['files']} files, {totals['failed']} failed, {totals['frames']} frames "
+          f"({rate:.0f} frames/s), {totals['hands']} hands, {totals['rows']} rows added, "
+          f"{totals['duplicates']} duplicates skipped")
@@ -0,0 +1,105 @@
+"""
+Versioned, self-describing model bundle (model.pkl)
+
+Besides the fitted estimator the bundle records everything the loaders used
+to recompute from gestures.csv - class list, feature schema, row counts and a
+fingerprint of the training data - so loading never has to touch the dataset.
+
+joblib is imported by save_bundle() / load_bundle() only: servers that read
+model.forest (and incremental_training.py's fingerprinting) don't pay for it.
+"""
+import hashlib
+import os
+from datetime import datetime
+
+import numpy as np
+
+BUNDLE_FORMAT = 'silexa-model-bundle'
+BUNDLE_VERSION = 1
+
+# Same column names collect_data..py writes: 0_x, 0_y, ..., 20_x, 20_y
+FEATURE_NAMES = [f'{i}_{axis}' for i in range(21) for axis in ('x', 'y')]
+
+
+def data_fingerprint(X, y, previous=None):
+    """SHA-256 over the float32 landmark matrix and its labels.
+
+    With `previous`, the digest chains onto an earlier fingerprint so rows
+    appended since then can be hashed without re-reading the old ones.
+    """
+    digest = hashlib.sha256()
+    if previous is not None:
+        digest.update(previous.encode('ascii'))
+    digest.update(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+    digest.update('\n'.join(str(label) for label in y).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def make_bundle(model, X, y, n_train_rows=None, **extra):
+    """Wrap a fitted model with its metadata.
+
+    X, y is the full dataset the model was built from; n_train_rows is how
+    many of those rows it was actually fit on (defaults to all of them).
+    Passing data_fingerprint in `extra` skips hashing X.
+    """
+    fingerprint = extra.pop('data_fingerprint', None) or data_fingerprint(X, y)
+    bundle = {
+        'format': BUNDLE_FORMAT,
+        'version': BUNDLE_VERSION,
+        'model': model,
+        'classes': [str(c) for c in model.classes_],
+        'feature_names': list(FEATURE_NAMES),
+        'n_features': int(model.n_features_in_),
+        'n_dataset_rows': int(len(X)),
+        'n_train_rows': int(len(X) if n_train_rows is None else n_train_rows),
+        'data_fingerprint': fingerprint,
+        'created_at': datetime.now().isoformat(timespec='seconds')
+    }
+    bundle.update(extra)
+    return bundle
+
+
+def save_bundle(model, X, y, path='model.pkl', n_train_rows=None, **extra):
+    """Write the bundle atomically so readers never see a partial file.
+
+    A forest is also exported as the compact array file next to it (see
+    forest_file.py), which serving code loads instead of the pickle.
+    """
+    import joblib
+    from forest_file import export_bundle
+
+    bundle = make_bundle(model, X, y, n_train_rows=n_train_rows, **extra)
+    tmp_path = f'{path}.tmp'
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+    try:
+        export_bundle(bundle, path)
+    except TypeError:
+        pass  # not a random forest: the pickle is the only copy
+    return bundle
+
+
+def load_bundle(path='model.pkl'):
+    """Read a bundle; a bare pickled estimator from older versions is wrapped"""
+    import joblib
+
+    obj = joblib.load(path)
+    if isinstance(obj, dict) and obj.get('format') == BUNDLE_FORMAT:
+        if obj.get('version', 0) > BUNDLE_VERSION:
+            raise ValueError(f"{path} is bundle version {obj['version']}, "
+                             f"this code reads up to {BUNDLE_VERSION}")
+        return obj
+
+    # Legacy model.pkl: classes_ is exactly sorted(unique labels)
+    return {
+        'format': BUNDLE_FORMAT,
+        'version': 0,
+        'model': obj,
+        'classes': [str(c) for c in obj.classes_],
+        'feature_names': list(FEATURE_NAMES),
+        'n_features': int(getattr(obj, 'n_features_in_', len(FEATURE_NAMES))),
+        'n_dataset_rows': None,
+        'n_train_rows': None,
+        'data_fingerprint': None,
+        'created_at': None
+    }
@@ -0,0 +1,131 @@
+"""
+Motion gating: skip the model while the hand holds still
+
+A MotionGate remembers the last landmark vector that was actually classified
+and its result. For every new frame it measures how far the landmarks moved
+since then - the RMS displacement of the 21 points divided by the hand's
+size (bounding-box diagonal), so the threshold means the same thing close to
+and far from the camera. Below the threshold the previous result is reused.
+After refresh_every gated frames in a row the model runs anyway, so a slow
+drift can never keep an old label forever.
+
+One gate per stream: detect_sign.py keeps one per hand, the web app one per
+session id (and hand), each in a MotionGateRegistry.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MOTION_THRESHOLD = 0.02   # RMS landmark movement as a fraction of hand size
+REFRESH_EVERY = 15        # gated frames before the model is forced to run
+MAX_SESSIONS = 256        # gates kept by a registry (least recently used go)
+
+
+def hand_size(landmarks):
+    """Bounding-box diagonal of a 42-value landmark vector"""
+    points = np.asarray(landmarks, dtype=np.float32).reshape(21, 2)
+    width, height = points.max(axis=0) - points.min(axis=0)
+    return math.hypot(width, height)
+
+
+def hand_motion(a, b):
+    """Size-normalized RMS distance between two 42-value landmark vectors"""
+    size = hand_size(a)
+    d = np.asarray(b, dtype=np.float32).ravel() - np.asarray(a, dtype=np.float32).ravel()
+    return math.sqrt(float(d @ d) / 21) / size if size > 0 else float('inf')
+
+
+class MotionGate:
+    """Reuses the last result until the hand moves or the refresh is due"""
+
+    def __init__(self, threshold=MOTION_THRESHOLD, refresh_every=REFRESH_EVERY):
+        self.threshold = threshold
+        self.refresh_every = refresh_every
+        self.evaluated = 0
+        self.gated = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the last result (e.g. after the model changed)"""
+        self._landmarks = None
+        self._result = None
+        self._limit = 0.0
+        self._streak = 0
+
+    def check(self, landmarks):
+        """Previous result if the model can be skipped for this frame, else None"""
+        if self._landmarks is not None and self._streak < self.refresh_every:
+            # hand_motion() < threshold, with the reference hand's size folded
+            # into _limit at update() time: one subtract and one dot per frame
+            d = np.asarray(landmarks, dtype=np.float32).ravel() - self._landmarks
+            if float(d @ d) < self._limit:
+                self._streak += 1
+                self.gated += 1
+                return self._result
+        return None
+
+    def update(self, landmarks, result):
+        """Record a frame the model was actually run on"""
+        self._landmarks = np.array(landmarks, dtype=np.float32).ravel()
+        self._result = result
+        # sum of squared shifts allowed: (threshold * size)^2 * 21 points
+        self._limit = (self.threshold * hand_size(self._landmarks)) ** 2 * 21
+        self._streak = 0
+        self.evaluated += 1
+
+    def stats(self):
+        total = self.evaluated + self.gated
+        return {
+            'evaluated': self.evaluated,
+            'gated': self.gated,
+            'gated_ratio': self.gated / total if total else 0.0
+        }
+
+
+class MotionGateRegistry:
+    """One MotionGate per session id, least recently used evicted"""
+
+    def __init__(self, threshold=MOTION_THRESHOLD, refresh_every=REFRESH_EVERY,
+                 max_sessions=MAX_SESSIONS):
+        self.threshold = threshold
+        self.refresh_every = refresh_every
+        self.max_sessions = max_sessions
+        self._gates = OrderedDict()
+        self._lock = threading.Lock()
+        self._retired = {'evaluated': 0, 'gated': 0}
+
+    def get(self, session):
+        with self._lock:
+            gate = self._gates.get(session)
+            if gate is None:
+                gate = self._gates[session] = MotionGate(self.threshold, self.refresh_every)
+                while len(self._gates) > self.max_sessions:
+                    _, old = self._gates.popitem(last=False)
+                    self._retired['evaluated'] += old.evaluated
+                    self._retired['gated'] += old.gated
+            else:
+                self._gates.move_to_end(session)
+            return gate
+
+    def clear(self):
+        """Drop every remembered result; counters are kept"""
+        with self._lock:
+            for gate in self._gates.values():
+                gate.reset()
+
+    def stats(self):
+        with self._lock:
+            evaluated = self._retired['evaluated'] + sum(g.evaluated for g in self._gates.values())
+            gated = self._retired['gated'] + sum(g.gated for g in self._gates.values())
+            sessions = len(self._gates)
+        total = evaluated + gated
+        return {
+            'sessions': sessions,
+            'evaluated': evaluated,
+            'gated': gated,
+            'gated_ratio': gated / total if total else 0.0,
+            'threshold': self.threshold,
+            'refresh_every': self.refresh_every
+        }
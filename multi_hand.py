@@ -0,0 +1,124 @@
+"""
+Up to two hands per frame
+
+The model classifies one hand: 42 values, the 21 (x, y) landmarks of a single
+hand. With two hands in view each hand is a row of its own, and all rows of a
+frame go to the model in one predict_proba call (classify_hands), so a second
+hand costs one more row in the same call, not a second call.
+
+MediaPipe reports a handedness per detected hand ('Left' / 'Right', as seen
+in the mirrored frames every SILEXA client processes). It keeps the two hands
+of a frame apart - results, motion gates and speech are per hand - and is
+recorded with the training rows in the gesture store as a uint8 tag:
+
+    0   not recorded (rows collected before tags existed, CSV imports)
+    1   Left
+    2   Right
+    +4  one of the two hands of a two-hand capture; the pair is stored as two
+        consecutive rows, left hand first
+"""
+import numpy as np
+
+from rejection import top_k
+
+MAX_HANDS = 2
+N_FEATURES = 42
+
+HAND_TAGS = {'Left': 1, 'Right': 2}
+HAND_NAMES = {tag: name for name, tag in HAND_TAGS.items()}
+PAIRED = 0x4
+
+
+def hand_tag(handedness, paired=False):
+    """Store tag for a handedness ('Left', 'Right' or None)"""
+    return HAND_TAGS.get(handedness, 0) | (PAIRED if paired else 0)
+
+
+def tag_handedness(tag):
+    """'Left', 'Right' or None for a store tag"""
+    return HAND_NAMES.get(int(tag) & 0x3)
+
+
+def landmark_row(hand_landmarks):
+    """42-value row for one MediaPipe hand"""
+    row = []
+    for lm in hand_landmarks.landmark:
+        row.extend([lm.x, lm.y])
+    return row
+
+
+def detected_hands(result, max_hands=MAX_HANDS):
+    """[(handedness, hand_landmarks)] of a MediaPipe Hands result, left first.
+
+    A fixed order keeps a hand's result on the same side of the overlay and
+    makes stored pairs consistent; hands without a handedness sort last.
+    """
+    if not result.multi_hand_landmarks:
+        return []
+    handedness = [None] * len(result.multi_hand_landmarks)
+    for i, entry in enumerate(result.multi_handedness or []):
+        if i < len(handedness):
+            handedness[i] = entry.classification[0].label
+    return left_first(list(zip(handedness, result.multi_hand_landmarks))[:max_hands])
+
+
+def left_first(hands):
+    """[(handedness, ...)] sorted left, right, then hands without handedness"""
+    return sorted(hands, key=lambda hand: HAND_TAGS.get(hand[0], len(HAND_TAGS) + 1))
+
+
+def check_landmarks(landmarks):
+    """Raise ValueError unless `landmarks` is N_FEATURES finite numbers.
+
+    NaN would score differently from sklearn and can't be quantized to a
+    prediction cache key.
+    """
+    if not isinstance(landmarks, (list, tuple)) or len(landmarks) != N_FEATURES:
+        count = len(landmarks) if isinstance(landmarks, (list, tuple)) else 0
+        raise ValueError(f'Invalid landmarks count: {count}, expected {N_FEATURES}')
+    try:
+        finite = np.isfinite(np.asarray(landmarks, dtype=np.float64)).all()
+    except (TypeError, ValueError):
+        finite = False
+    if not finite:
+        raise ValueError('Landmarks must be finite numbers')
+
+
+def parse_hands(data, max_hands=MAX_HANDS):
+    """[(handedness, landmarks)] from a JSON request body.
+
+    Accepts {"landmarks": [42 values], "handedness": "Left"} (handedness
+    optional) or {"hands": [{"landmarks": [...], "handedness": "Left"}, ...]}
+    with up to max_hands entries. Raises ValueError with a message for the
+    client.
+    """
+    if 'hands' in data:
+        entries = data['hands']
+        if not isinstance(entries, list) or not entries:
+            raise ValueError('"hands" must be a non-empty list')
+        if len(entries) > max_hands:
+            raise ValueError(f'Too many hands: {len(entries)}, maximum is {max_hands}')
+    else:
+        entries = [data]
+
+    hands = []
+    for entry in entries:
+        landmarks = entry.get('landmarks', []) if isinstance(entry, dict) else []
+        check_landmarks(landmarks)
+        handedness = entry.get('handedness')
+        if handedness is not None and handedness not in HAND_TAGS:
+            raise ValueError(f'Invalid handedness: {handedness!r}, expected "Left" or "Right"')
+        hands.append((handedness, landmarks))
+
+    named = [handedness for handedness, _ in hands if handedness is not None]
+    if len(named) != len(set(named)):
+        raise ValueError('Two hands with the same handedness')
+    return hands
+
+
+def classify_hands(model, rows, k=1, unknown=None):
+    """top_k() result per hand row, all rows in one predict_proba call"""
+    if not rows:
+        return []
+    proba = model.predict_proba(np.asarray(rows, dtype=np.float32))
+    return [top_k(p, model.classes_, k, unknown) for p in proba]
@@ -0,0 +1,90 @@
+"""
+LRU cache for /api/predict keyed on quantized landmarks
+
+A hand held still sends almost the same 42 floats many times a second.
+Rounding every coordinate to a grid of `step` makes those frames share one
+key, so the forest only runs when the hand actually moves.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-entry bookkeeping cost (OrderedDict node, tuple, floats)
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    """Thread-safe LRU cache bounded by entry count and approximate memory"""
+
+    def __init__(self, step=0.005, max_entries=4096, max_bytes=4 * 1024 * 1024):
+        self.step = step
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Bumped by clear() so results computed with an old model can't be
+        # stored after the model has been swapped
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, landmarks):
+        """Quantize a landmark vector to the cache grid"""
+        grid = np.round(np.asarray(landmarks, dtype=np.float32) / self.step)
+        return grid.astype(np.int32).tobytes()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, generation=None):
+        size = len(key) + sys.getsizeof(value) + ENTRY_OVERHEAD_BYTES
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after /api/retrain swapped the model"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'step': self.step,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'generation': self.generation
+            }
@@ -19,15 +19,14 @@ print(f"📁 templates exists: {os.path.exists('templates')}")
 
 # Test 4: Model loading
 try:
-    import joblib
-    import pandas as pd
+    from model_bundle import load_bundle
     
-    model = joblib.load('model.pkl')
-    data = pd.read_csv('gestures.csv', header=None)
-    labels = sorted(data.iloc[:, -1].unique())
+    bundle = load_bundle('model.pkl')
+    model = bundle['model']
+    labels = bundle['classes']
     
     print(f"✅ Model loaded: {type(model)}")
-    print(f"✅ Data loaded: {data.shape}")
+    print(f"✅ Bundle version {bundle['version']}, trained on {bundle['n_dataset_rows']} rows")
     print(f"✅ Labels: {len(labels)} gestures")
     print(f"   First 5 labels: {labels[:5]}")
     
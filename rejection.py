@@ -0,0 +1,121 @@
+"""
+Top-k predictions and unknown-gesture rejection
+
+A forest always names some gesture, even for a half-visible hand, a blurred
+frame or a pose it was never trained on; such frames just get a low winning
+share of the votes. Training calibrates a threshold per class on held-out
+rows from the confidence the model gives its correct predictions: the
+UNKNOWN_QUANTILE quantile over all classes, lowered for a class whose own
+quantile is lower (poses the model is never very sure of, such as 'I'). A
+class's own quantile never raises its threshold - with the dozen or so held-out
+rows per class it is too noisy and rejects good frames - and classes with
+fewer than MIN_CALIBRATION_ROWS correct rows use the overall one. A frame
+whose best probability is below the threshold of its best class is answered
+with UNKNOWN_LABEL.
+
+The thresholds are stored in the model bundle under 'unknown', with a report
+measured out of sample (each half of the held-out rows scored with
+thresholds calibrated on the other half): the share of correct and of wrong
+predictions that get rejected.
+
+top_k() turns one predict_proba row into the response fields, so a single
+model call gives the label, its confidence and the k best alternatives.
+"""
+import numpy as np
+
+UNKNOWN_LABEL = 'unknown'
+UNKNOWN_QUANTILE = 0.05
+MIN_CALIBRATION_ROWS = 10
+TOP_K = 3
+
+
+def _thresholds(confidence, predicted, correct, classes, quantile):
+    overall = float(np.quantile(confidence[correct], quantile))
+    thresholds = {}
+    for label in classes:
+        rows = correct & (predicted == label)
+        thresholds[str(label)] = (min(float(np.quantile(confidence[rows], quantile)), overall)
+                                  if rows.sum() >= MIN_CALIBRATION_ROWS else overall)
+    return thresholds, overall
+
+
+def _rejected(confidence, predicted, thresholds, default):
+    limits = np.array([thresholds.get(str(label), default) for label in predicted])
+    return confidence < limits
+
+
+def calibrate_unknown(model, X_holdout, y_holdout, quantile=UNKNOWN_QUANTILE, random_state=42):
+    """Per-class rejection thresholds for `model`, or None with too few rows"""
+    proba = model.predict_proba(X_holdout)
+    best = proba.argmax(axis=1)
+    confidence = proba[np.arange(len(proba)), best]
+    predicted = model.classes_[best]
+    correct = predicted == np.asarray(y_holdout)
+    if correct.sum() < 2 * MIN_CALIBRATION_ROWS:
+        return None
+
+    thresholds, default = _thresholds(confidence, predicted, correct, model.classes_, quantile)
+
+    rng = np.random.default_rng(random_state)
+    order = rng.permutation(len(predicted))
+    halves = (order[:len(order) // 2], order[len(order) // 2:])
+    rejected = np.zeros(len(predicted), dtype=bool)
+    for fit, held in (halves, halves[::-1]):
+        fold, fold_default = _thresholds(confidence[fit], predicted[fit], correct[fit],
+                                         model.classes_, quantile)
+        rejected[held] = _rejected(confidence[held], predicted[held], fold, fold_default)
+
+    return {
+        'thresholds': thresholds,
+        'default': default,
+        'quantile': quantile,
+        'report': {
+            'correct_rejected': float(rejected[correct].mean()),
+            'wrong_rejected': float(rejected[~correct].mean()) if (~correct).any() else 0.0,
+            'evaluation_rows': int(len(predicted))
+        }
+    }
+
+
+def format_report(unknown):
+    report = unknown['report']
+    return (f"rejects {report['wrong_rejected']:.0%} of wrong and "
+            f"{report['correct_rejected']:.1%} of correct held-out predictions")
+
+
+def rejected(proba, classes, unknown):
+    """Per row of a predict_proba matrix: is the best class below its threshold"""
+    if unknown is None:
+        return np.zeros(len(proba), dtype=bool)
+    limits = np.array([unknown['thresholds'].get(str(label), unknown['default']) for label in classes])
+    best = proba.argmax(axis=1)
+    return proba[np.arange(len(proba)), best] < limits[best]
+
+
+def response_fields(result):
+    """JSON fields for a top_k() result"""
+    label, confidence, alternatives = result
+    return {
+        'prediction': label,
+        'confidence': confidence,
+        'unknown': label == UNKNOWN_LABEL,
+        'top_k': [{'label': name, 'probability': p} for name, p in alternatives]
+    }
+
+
+def top_k(proba, classes, k=TOP_K, unknown=None):
+    """Response fields for one predict_proba row.
+
+    Returns (label, confidence, [(label, probability), ...]); label is
+    UNKNOWN_LABEL when `unknown` (the bundle entry) rejects the frame. The
+    first alternative is always the model's own best class.
+    """
+    # Stable sort on -p: ties keep argmax's lowest-index-first order
+    order = np.argsort(-proba, kind='stable')[:max(k, 1)]
+    best = str(classes[order[0]])
+    confidence = float(proba[order[0]])
+    # Classes no tree voted for aren't alternatives
+    alternatives = [(str(classes[i]), float(proba[i])) for i in order if proba[i] > 0 or i == order[0]]
+    if unknown is not None and confidence < unknown['thresholds'].get(best, unknown['default']):
+        return UNKNOWN_LABEL, confidence, alternatives
+    return best, confidence, alternatives
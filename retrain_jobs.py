@@ -0,0 +1,282 @@
+"""
+Background retrain jobs
+
+/api/retrain used to load the data, fit a forest and write model.pkl inside
+the HTTP request. RetrainManager runs that work in a separate process, hands
+back a job id immediately and reports progress while it runs. When a job
+finishes, `on_complete` is called in the server process so the new model can
+be swapped in. Requests made while a job is running are coalesced into a
+single follow-up job.
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from cascade import build_cascade, calibrate_serving_unknown
+from gesture_store import STORE_DIR, GestureStore
+from incremental_training import choose_mode, incremental_update
+from model_bundle import load_bundle, save_bundle
+
+# Rough share of the job done when each stage starts
+STAGES = {
+    'queued': 0.0,
+    'loading': 0.05,
+    'training': 0.15,
+    'evaluating': 0.8,
+    'saving': 0.9,
+    'done': 1.0
+}
+MAX_JOBS_KEPT = 50
+CASCADE_ROWS = 20000  # recent rows used to recalibrate the cascade after an incremental update
+
+
+def train_and_save(store_path, model_path, report, mode='auto'):
+    """Fit (or incrementally update) a forest and write the model bundle.
+
+    mode is 'full', 'incremental' or 'auto' (incremental unless
+    incremental_training.choose_mode asks for a rebuild). Runs in the worker
+    process; `report(stage, **info)` sends progress back.
+    """
+    from sklearn.model_selection import train_test_split
+
+    report('loading')
+    X, y = GestureStore(store_path).load()
+
+    bundle = None
+    if mode != 'full' and os.path.exists(model_path):
+        bundle = load_bundle(model_path)
+    if mode != 'full':
+        chosen, reason = choose_mode(bundle, X, y)
+        if mode == 'incremental' and chosen == 'full':
+            reason = f'incremental update not possible ({reason})'
+        mode = chosen
+    else:
+        reason = 'full rebuild requested'
+
+    if mode == 'incremental':
+        report('training', total_samples=len(X), mode=mode, reason=reason)
+        clf, info = incremental_update(bundle, X, y)
+
+        report('evaluating')
+        # The forest changed, so the cascade's first stage is refit and
+        # recalibrated on recent rows
+        recent = np.arange(max(0, len(X) - CASCADE_ROWS), len(X))
+        X_fit, X_hold, y_fit, y_hold = train_test_split(np.asarray(X[recent]), y[recent],
+                                                        test_size=0.3, random_state=42)
+        info['cascade'] = build_cascade(clf, X_fit, y_fit, X_hold, y_hold)
+        # Rows the updated forest hasn't seen are few, so the full forest's
+        # unknown thresholds are kept: the classes are the same and most
+        # trees too. The first stage is new, so the cascade's are
+        # recalibrated (falling back to the forest's with too few rows).
+        if info['cascade'] is not None:
+            calibrate_serving_unknown(clf, info['cascade'], X_hold, y_hold)
+        info['unknown'] = bundle.get('unknown')
+
+        report('saving')
+        save_bundle(clf, X, y, model_path, **info)
+        return {
+            'accuracy': info['accuracy'],
+            'update_accuracy': info['update_accuracy'],
+            'total_samples': int(len(X)),
+            'mode': mode,
+            'reason': reason,
+            'new_rows': info['new_rows'],
+            'n_estimators': len(clf.estimators_),
+            'cascade': info['cascade']['report'] if info['cascade'] else None,
+            'unknown': info['unknown']['report'] if info['unknown'] else None
+        }
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    report('training', total_samples=len(X), mode=mode, reason=reason)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    clf = RandomForestClassifier()
+    clf.fit(X_train, y_train)
+
+    report('evaluating')
+    accuracy = float((clf.predict(X_test) == y_test).mean())
+    cascade = build_cascade(clf, X_train, y_train, X_test, y_test)
+    unknown = calibrate_serving_unknown(clf, cascade, X_test, y_test)
+
+    report('saving')
+    save_bundle(clf, X, y, model_path, n_train_rows=len(X_train), accuracy=accuracy,
+                training_mode='full', incremental_updates=0, cascade=cascade, unknown=unknown)
+    return {
+        'accuracy': accuracy,
+        'total_samples': int(len(X)),
+        'mode': 'full',
+        'reason': reason,
+        'n_estimators': len(clf.estimators_),
+        'cascade': cascade['report'] if cascade else None,
+        'unknown': unknown['report'] if unknown else None
+    }
+
+
+def _run_job(store_path, model_path, mode, messages):
+    """Worker process entry point"""
+    def report(stage, **info):
+        messages.put(('stage', stage, info))
+
+    try:
+        result = train_and_save(store_path, model_path, report, mode)
+        messages.put(('done', 'done', result))
+    except Exception as e:
+        messages.put(('failed', 'failed', {'error': str(e)}))
+
+
+class RetrainManager:
+    """At most one running retrain process plus one coalesced follow-up"""
+
+    def __init__(self, on_complete, store_path=STORE_DIR, model_path='model.pkl',
+                 before_start=None):
+        self.on_complete = on_complete      # called with the finished job
+        self.before_start = before_start    # e.g. flush queued gesture saves
+        self.store_path = store_path
+        self.model_path = model_path
+
+        # spawn: never fork a process that is running Flask threads
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._running = None
+        self._pending = None
+
+    def _new_job(self, mode):
+        job = {
+            'id': str(next(self._ids)),
+            'mode': mode,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'requests': 1,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        self._jobs[job['id']] = job
+        while len(self._jobs) > MAX_JOBS_KEPT:
+            oldest = next(iter(self._jobs))
+            if self._jobs[oldest]['status'] in ('queued', 'running'):
+                break
+            del self._jobs[oldest]
+        return job
+
+    def submit(self, mode='auto'):
+        """Start a retrain, or join the one that will run next.
+
+        mode: 'auto', 'incremental' or 'full'. When requests are coalesced,
+        a 'full' request upgrades the pending job to a full rebuild.
+        """
+        if mode not in ('auto', 'incremental', 'full'):
+            raise ValueError(f'Unknown retrain mode: {mode}')
+
+        with self._lock:
+            if self._running is None:
+                job = self._new_job(mode)
+                self._start(job)
+            elif self._pending is not None:
+                job = self._pending
+                job['requests'] += 1
+                if mode == 'full':
+                    job['mode'] = 'full'
+            else:
+                # A job is already fitting on older data; run once more after it
+                job = self._pending = self._new_job(mode)
+            return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(str(job_id))
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job has finished; returns its final state"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] in ('done', 'failed'):
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                return job
+            time.sleep(0.1)
+
+    def _start(self, job):
+        """Launch the worker process for `job` (lock held)"""
+        self._running = job
+        job['status'] = 'running'
+        job['started_at'] = datetime.now().isoformat(timespec='seconds')
+        threading.Thread(target=self._monitor, args=(job,),
+                         name=f"retrain-{job['id']}", daemon=True).start()
+
+    def _monitor(self, job):
+        if self.before_start is not None:
+            try:
+                self.before_start()
+            except Exception as e:
+                print(f"⚠️ Retrain pre-start hook failed: {e}")
+
+        try:
+            messages = self._context.Queue()
+            process = self._context.Process(
+                target=_run_job, args=(self.store_path, self.model_path, job['mode'], messages),
+                name=f"retrain-{job['id']}", daemon=True
+            )
+            process.start()
+        except Exception as e:
+            # e.g. spawn bootstrapping failed; the job must still finish, or
+            # every later request would join a follow-up that never starts
+            self._finish(job, 'failed', {'error': f'Retrain process could not start: {e}'})
+            return
+
+        outcome, info = None, {}
+        while outcome is None:
+            try:
+                kind, stage, info = messages.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    outcome, info = 'failed', {'error': f'Retrain process exited with code {process.exitcode}'}
+                continue
+            if kind == 'stage':
+                with self._lock:
+                    job['stage'] = stage
+                    job['progress'] = STAGES.get(stage, job['progress'])
+                    if 'reason' in info:
+                        job['training_mode'] = info['mode']
+                        job['reason'] = info['reason']
+            else:
+                outcome = kind
+        process.join(timeout=5.0)
+
+        if outcome == 'done':
+            try:
+                # Swap the new model in before the job reports done
+                self.on_complete(info)
+            except Exception as e:
+                outcome, info = 'failed', {'error': f'Model swap failed: {e}'}
+        self._finish(job, outcome, info)
+
+    def _finish(self, job, outcome, info):
+        """Record the outcome and start the coalesced follow-up, if any"""
+        with self._lock:
+            job['status'] = outcome
+            job['stage'] = outcome
+            job['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            if outcome == 'done':
+                job['progress'] = 1.0
+                job['result'] = info
+            else:
+                job['error'] = info.get('error')
+
+            self._running = None
+            if self._pending is not None:
+                follow_up, self._pending = self._pending, None
+                self._start(follow_up)
@@ -0,0 +1,366 @@
+"""
+Production serving: prefork workers sharing one model load
+
+    python serve.py                          # one worker per CPU core, port 5000
+    python serve.py --workers 4 --port 8000
+
+app.py's __main__ runs Flask's single-process development server. Here the
+master process loads the model once (model.forest, memory-mapped), opens the
+listening socket and then forks the workers. The forest arrays are inherited
+copy-on-write and the mapped file is shared through the page cache, so each
+extra worker only adds its own interpreter state, not another model. Every
+worker runs a threaded WSGI server on the inherited socket; the kernel hands
+each connection to whichever worker accepts it.
+
+Retraining: /api/retrain on any worker is forwarded to a single
+RetrainManager in a retrain server process, so there is one job at a time
+and its status can be polled from any worker. That process is started
+before anything else, so the master itself never runs a thread and forking
+it is always safe. The gesture store is opened (and gestures.csv imported,
+the first time) in the master before the first fork, so workers never race
+to import it. The master watches model.pkl / model.forest;
+when a new model lands (from a retrain or python train_model.py) it loads
+it once and replaces the workers one at a time - the new worker is forked
+first, the old one stops accepting, finishes its requests (up to
+DRAIN_TIMEOUT) and exits. Workers therefore keep sharing a single copy of
+the model; per-worker state (stream sessions, motion gates, caches) starts
+over, as it would after a swap_model() anyway.
+
+The master restarts workers that exit and prints per-worker memory (RSS,
+PSS, private) and aggregate requests/s every REPORT_EVERY seconds;
+GET /api/workers returns the same figures. POSIX only (os.fork).
+"""
+import argparse
+import gc
+import os
+import secrets
+import signal
+import socket
+import threading
+import time
+from multiprocessing import RawArray
+from multiprocessing.managers import BaseManager
+
+# app first: its startup report times the Flask import
+import app as silexa
+from flask import jsonify
+from retrain_jobs import RetrainManager
+
+REPORT_EVERY = 30.0         # seconds between master reports
+MODEL_CHECK_EVERY = 1.0     # seconds between model file checks in the master
+RESTART_DELAY = 1.0         # seconds before a crashed worker is replaced
+DRAIN_TIMEOUT = 10.0        # seconds a retiring worker may finish requests
+
+
+class RetrainServer(BaseManager):
+    """Process running the one RetrainManager, shared by all workers"""
+
+
+_retrain_manager = None
+_retrain_manager_lock = threading.Lock()
+
+
+def shared_retrain_manager():
+    """The RetrainManager of the retrain server process (created on first use)"""
+    global _retrain_manager
+    with _retrain_manager_lock:
+        if _retrain_manager is None:
+            # The master notices the new model files and recycles the workers
+            _retrain_manager = RetrainManager(
+                on_complete=lambda result: print(f"✅ Retrain finished (accuracy {result['accuracy']:.3f})"),
+                model_path=silexa.MODEL_PATH)
+        return _retrain_manager
+
+
+RetrainServer.register('retrain_manager', callable=shared_retrain_manager)
+
+
+class RetrainClient:
+    """Worker-side stand-in for app.retrain_manager; jobs run in the master"""
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self._proxy = None
+        self._lock = threading.Lock()
+
+    def _manager(self):
+        with self._lock:
+            if self._proxy is None:
+                server = RetrainServer(address=self.address, authkey=self.authkey)
+                server.connect()
+                self._proxy = server.retrain_manager()
+            return self._proxy
+
+    def submit(self, mode='auto'):
+        # Rows this worker has queued must be on disk before the job loads
+        # the store; other workers flush theirs within a writer interval
+        silexa.get_gesture_writer().flush(timeout=10.0)
+        return self._manager().submit(mode)
+
+    def get(self, job_id):
+        return self._manager().get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        return self._manager().wait(job_id, timeout)
+
+
+def model_stamp(path=None):
+    """(size, mtime) of model.pkl and model.forest, None for a missing file"""
+    from forest_file import forest_path
+
+    path = path or silexa.MODEL_PATH
+    stamp = []
+    for file_path in (path, forest_path(path)):
+        try:
+            st = os.stat(file_path)
+            stamp.append((st.st_size, st.st_mtime_ns))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def process_memory(pid):
+    """RSS / PSS / private / shared MB of a process, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        'rss_mb': round(fields.get('Rss', 0.0), 1),
+        'pss_mb': round(fields.get('Pss', 0.0), 1),
+        'private_mb': round(fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0), 1),
+        'shared_mb': round(fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0), 1)
+    }
+
+
+class WorkerTable:
+    """pid and request count per worker slot, in memory shared across fork"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.pids = RawArray('q', workers)
+        self.requests = RawArray('q', workers)
+        self.started_at = time.time()
+
+    def report(self):
+        workers = []
+        for slot in range(self.workers):
+            pid = self.pids[slot]
+            workers.append({
+                'slot': slot,
+                'pid': pid,
+                'requests': self.requests[slot],
+                'memory': process_memory(pid) if pid else None
+            })
+        total = sum(w['requests'] for w in workers)
+        uptime = time.time() - self.started_at
+        return {
+            'workers': workers,
+            'total_requests': total,
+            'uptime_s': round(uptime, 1),
+            'requests_per_s': round(total / uptime, 1) if uptime > 0 else 0.0,
+            'total_pss_mb': round(sum(w['memory']['pss_mb'] for w in workers if w['memory']), 1)
+        }
+
+
+def format_report(report, rate):
+    lines = [f"📊 {len(report['workers'])} workers, {report['total_requests']} requests, "
+             f"{rate:.1f} req/s (last interval), total PSS {report['total_pss_mb']:.1f} MB"]
+    for w in report['workers']:
+        memory = w['memory'] or {}
+        lines.append(f"   worker {w['slot']} pid {w['pid']}: {w['requests']} requests, "
+                     f"RSS {memory.get('rss_mb', 0):.1f} MB, PSS {memory.get('pss_mb', 0):.1f} MB, "
+                     f"private {memory.get('private_mb', 0):.1f} MB")
+    return '\n'.join(lines)
+
+
+class RequestCounter:
+    """WSGI middleware counting requests into this worker's slot"""
+
+    def __init__(self, wsgi_app, table, slot):
+        self.wsgi_app = wsgi_app
+        self.table = table
+        self.slot = slot
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.table.requests[self.slot] += 1
+        return self.wsgi_app(environ, start_response)
+
+
+def run_worker(slot, listener, host, table, retrain_address, authkey):
+    """Body of a forked worker process; never returns"""
+    from werkzeug.serving import make_server
+
+    silexa.retrain_manager = RetrainClient(retrain_address, authkey)
+    server = make_server(host, listener.getsockname()[1], RequestCounter(silexa.app, table, slot),
+                         threaded=True, fd=listener.fileno())
+    # Connection threads are joined on exit, so accepted requests finish
+    server.daemon_threads = False
+
+    # SIGTERM: stop accepting; the master handles Ctrl+C
+    signal.signal(signal.SIGTERM,
+                  lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        server.serve_forever()
+        drain = threading.Thread(target=server.server_close, daemon=True)
+        drain.start()
+        drain.join(DRAIN_TIMEOUT)
+    finally:
+        os._exit(0)
+
+
+class Master:
+    """Loads the model, forks the workers and keeps them running"""
+
+    def __init__(self, host='0.0.0.0', port=5000, workers=None):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.table = WorkerTable(self.workers)
+        self.children = {}      # pid -> slot
+        self.retiring = set()   # pids asked to exit after a model change
+        self.stopping = False
+        self.loaded_stamp = None
+
+        self.authkey = secrets.token_bytes(16)
+        self.retrain_server = None
+        self.listener = None
+
+    def load_model(self):
+        # Stamp first: a model written while loading is picked up next check
+        self.loaded_stamp = model_stamp()
+        silexa.initialize_model()
+
+    def spawn(self, slot):
+        # Objects that exist now are never scanned by the workers' garbage
+        # collector, which would otherwise write to (and so un-share) the
+        # pages they live on
+        gc.freeze()
+        pid = os.fork()
+        if pid == 0:
+            run_worker(slot, self.listener, self.host, self.table,
+                       self.retrain_server.address, self.authkey)
+        self.table.pids[slot] = pid
+        self.children[pid] = slot
+
+    def recycle(self):
+        """Replace every worker, one at a time, with a fork of the current master"""
+        for slot in range(self.workers):
+            old = self.table.pids[slot]
+            self.spawn(slot)
+            if old in self.children:
+                del self.children[old]
+                self.retiring.add(old)
+                self._stop(old, DRAIN_TIMEOUT + 5.0)
+
+    def _stop(self, pid, timeout):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    break
+            except ChildProcessError:
+                break
+            time.sleep(0.05)
+        else:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.retiring.discard(pid)
+
+    def _reap(self):
+        """Restart workers that exited on their own.
+
+        Only worker pids are waited for: the retrain server is a child too,
+        and reaping it would hide its exit from multiprocessing.
+        """
+        for pid in list(self.children):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, None
+            if not done:
+                continue
+            slot = self.children.pop(pid)
+            print(f"⚠️ Worker {slot} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(RESTART_DELAY)
+            if not self.stopping:
+                self.spawn(slot)
+
+    def run(self):
+        print(f"🚀 Starting SILEXA with {self.workers} workers")
+        # First, while this process has no threads: the retrain server is
+        # forked from it, and so is every worker later on
+        self.retrain_server = RetrainServer(address=('127.0.0.1', 0), authkey=self.authkey)
+        self.retrain_server.start(signal.signal, (signal.SIGINT, signal.SIG_IGN))
+        self.load_model()
+        print(silexa.startup.format())
+        # Import gestures.csv once, here, instead of in whichever worker
+        # saves a gesture first
+        silexa.get_gesture_store()
+
+        @silexa.app.route('/api/workers')
+        def worker_stats():
+            """Per-worker memory and request counts"""
+            return jsonify({'success': True, 'pid': os.getpid(), **self.table.report()})
+
+        self.listener = socket.create_server((self.host, self.port), backlog=128)
+        for slot in range(self.workers):
+            self.spawn(slot)
+        print(f"🌐 Serving on http://{self.host}:{self.port} (master pid {os.getpid()})")
+
+        def stop(*_):
+            self.stopping = True
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        last_check = last_report = time.monotonic()
+        last_total = 0
+        previous_stamp = self.loaded_stamp
+        while not self.stopping:
+            self._reap()
+            now = time.monotonic()
+
+            if now - last_check >= MODEL_CHECK_EVERY:
+                # A retrain replaces model.pkl and then writes model.forest:
+                # reload once the files have stopped changing
+                stamp = model_stamp()
+                if stamp != self.loaded_stamp and stamp == previous_stamp:
+                    print("🔄 Model changed on disk, reloading and recycling workers")
+                    self.load_model()
+                    self.recycle()
+                previous_stamp, last_check = stamp, now
+
+            if now - last_report >= REPORT_EVERY:
+                report = self.table.report()
+                rate = (report['total_requests'] - last_total) / (now - last_report)
+                print(format_report(report, rate))
+                last_report, last_total = now, report['total_requests']
+            time.sleep(0.2)
+
+        print("🛑 Stopping workers")
+        for pid in list(self.children):
+            self._stop(pid, DRAIN_TIMEOUT + 5.0)
+        self.retrain_server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='SILEXA production server (prefork workers)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU core)')
+    args = parser.parse_args()
+    Master(args.host, args.port, args.workers).run()
@@ -1,21 +1,59 @@
+from startup_timing import StartupTimer
+
+startup = StartupTimer()
+
 from flask import Flask, render_template, request, jsonify
+startup.mark('import flask')
 import os
 import json
-import joblib
-import pandas as pd
+import threading
+import numpy as np
+startup.mark('import numpy')
+from rejection import response_fields, top_k
 
 app = Flask(__name__)
 
-# Global variables - LOAD REAL MODEL
-try:
-    model = joblib.load('model.pkl')
-    data = pd.read_csv('gestures.csv', header=None)
-    labels = sorted(data.iloc[:, -1].unique())
-    print(f"✅ Real model loaded: {len(labels)} labels")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
-    labels = ['A', 'B', 'C', 'Hi', 'No', 'hello', 'surprised', 'thinking', 'thumbs up']
+# Upper bound on frames accepted by /api/predict_batch in one call
+MAX_BATCH_FRAMES = 256
+
+# Global variables - LOAD REAL MODEL (in the background, see load_model)
+model = None
+labels = ['A', 'B', 'C', 'Hi', 'No', 'hello', 'surprised', 'thinking', 'thumbs up']
+unknown = None  # per-class "unknown" thresholds from the bundle (rejection.py)
+model_ready = threading.Event()
+
+def load_model():
+    global model, labels, unknown
+    try:
+        from forest_engine import maybe_compile
+        from forest_file import load_serving_bundle
+
+        with startup.step('load model'):
+            bundle = load_serving_bundle('model.pkl')
+            labels = bundle['classes']
+            unknown = bundle.get('unknown')
+            model = maybe_compile(bundle['model'])
+        print(f"✅ Real model loaded: {len(labels)} labels")
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+    model_ready.set()
+    startup.ready()
+    print(startup.format())
+
+# Requests are accepted while this runs; /api/ready answers 503 until it's done
+threading.Thread(target=load_model, name='model-loader', daemon=True).start()
+
+@app.route('/api/ready')
+def ready():
+    """Readiness probe: 200 once the model is loaded"""
+    ok = model is not None
+    return jsonify({
+        'success': ok,
+        'ready': ok,
+        'error': None if ok else ('Model is still loading' if not model_ready.is_set()
+                                  else 'Model not loaded - check model.pkl file'),
+        'startup': startup.report()
+    }), 200 if ok else 503
 
 @app.route('/')
 def index():
@@ -39,18 +77,18 @@ def about():
 
 @app.route('/api/predict', methods=['POST'])
 def predict_gesture():
-    """API endpoint - EXACT same as detect_sign.py"""
+    """API endpoint - same labels as detect_sign.py, "unknown" included"""
     try:
         data = request.get_json()
         landmarks = data.get('landmarks', [])
 
         if len(landmarks) == 42 and model is not None:
-            # EXACT same prediction as detect_sign.py line 74
-            prediction = model.predict([landmarks])[0]
+            # Same label as detect_sign.py (or "unknown"), with the
+            # confidence and runners-up from the same single model call
+            result = top_k(model.predict_proba([landmarks])[0], model.classes_, unknown=unknown)
             return jsonify({
                 'success': True,
-                'prediction': prediction,
-                'confidence': 'high'
+                **response_fields(result)
             })
         else:
             return jsonify({
@@ -64,6 +102,40 @@ def predict_gesture():
             'error': str(e)
         })
 
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_gesture_batch():
+    """API endpoint - N frames in, one model call"""
+    try:
+        data = request.get_json()
+        frames = data.get('frames', [])
+
+        try:
+            X = np.asarray(frames, dtype=np.float32)
+        except (TypeError, ValueError):
+            X = np.empty((0,))
+
+        if (X.ndim == 2 and X.shape[1] == 42 and 0 < len(X) <= MAX_BATCH_FRAMES
+                and np.isfinite(X).all() and model is not None):
+            proba = model.predict_proba(X)
+            return jsonify({
+                'success': True,
+                'count': len(X),
+                'predictions': [
+                    response_fields(top_k(row, model.classes_, unknown=unknown)) for row in proba
+                ]
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid frames (expected N x 42) or model not loaded'
+            })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/api/save_gesture', methods=['POST'])
 def save_gesture():
     """API endpoint to save gesture data"""
@@ -0,0 +1,153 @@
+"""
+Cold-start timing
+
+A StartupTimer is created first thing in a server module; it records how long
+the interpreter took to start, each group of imports (mark() after them) and
+each initialization step (with timer.step('load model'): ...), and how long
+after process start the server was ready. app.py prints the report once the
+model is loaded and GET /api/ready returns it.
+
+For a per-module breakdown of the imports themselves:
+
+    python startup_timing.py              # import app
+    python startup_timing.py detect_sign --top 15
+
+runs `python -X importtime -c "import <module>"` in a fresh interpreter and
+lists the modules that were imported directly by project code, with their
+cumulative import time.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def process_age():
+    """Seconds since this process started (Linux /proc), None elsewhere"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTimer:
+    """Named durations of the import and initialization steps of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.steps = []
+        self.ready_after = None
+        # Interpreter start-up before this module ran (clock tick resolution)
+        boot = process_age()
+        if boot is not None:
+            self.steps.append(('python start', boot))
+
+    def mark(self, name):
+        """Record the time since the previous mark as step `name`"""
+        now = time.perf_counter()
+        with self._lock:
+            self.steps.append((name, now - self._last))
+            self._last = now
+
+    @contextmanager
+    def step(self, name):
+        """Time a block; may run in another thread, alongside marks"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append((name, time.perf_counter() - start))
+
+    def ready(self):
+        """Record that the process is ready to serve (first call wins)"""
+        with self._lock:
+            if self.ready_after is None:
+                self.ready_after = self._since_start()
+
+    def _since_start(self):
+        boot = dict(self.steps).get('python start', 0.0)
+        return boot + time.perf_counter() - self.started
+
+    def report(self):
+        with self._lock:
+            return {
+                'steps': [{'name': name, 'ms': round(seconds * 1000, 1)} for name, seconds in self.steps],
+                'ready_ms': round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+                'uptime_s': round(self._since_start(), 1)
+            }
+
+    def format(self):
+        report = self.report()
+        lines = ['⏱️ Startup time:']
+        for entry in report['steps']:
+            lines.append(f"   {entry['name']:<24s} {entry['ms']:8.1f} ms")
+        if report['ready_ms'] is not None:
+            lines.append(f"   {'ready after':<24s} {report['ready_ms']:8.1f} ms")
+        return '\n'.join(lines)
+
+
+def import_breakdown(module, cwd=None):
+    """[(name, cumulative_us, level)] of everything `import module` loads.
+
+    Parsed from -X importtime in a fresh interpreter; level 1 is the module
+    itself, 2 its direct imports and so on.
+    """
+    import subprocess
+
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                         capture_output=True, text=True,
+                         cwd=cwd or os.path.dirname(os.path.abspath(__file__)))
+    if out.returncode != 0:
+        # e.g. an optional dependency missing: report what did get imported
+        print(f"⚠️ import {module} failed: {out.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        level = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(cumulative), level))
+    return rows
+
+
+def project_imports(rows, root=None):
+    """Imports made directly by project modules, with their cumulative time.
+
+    -X importtime prints children before their parent, so the parent of a
+    row is the next row below it at a lower level.
+    """
+    root = root or os.path.dirname(os.path.abspath(__file__))
+    local = {os.path.splitext(name)[0] for name in os.listdir(root) if name.endswith('.py')}
+    direct = {}
+    open_parents = {}   # level -> module being imported at that level
+    for name, cumulative, level in reversed(rows):
+        open_parents[level] = name
+        parent = open_parents.get(level - 1)
+        if parent in local and name.split('.')[0] not in local:
+            direct[f'{parent} -> {name}'] = cumulative
+    return sorted(direct.items(), key=lambda item: -item[1])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Import-time breakdown of a SILEXA module')
+    parser.add_argument('module', nargs='?', default='app')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    rows = import_breakdown(args.module)
+    total = next((cumulative for name, cumulative, level in rows if name == args.module), None)
+    if total is not None:
+        print(f"⏱️ import {args.module}: {total / 1000:.1f} ms")
+    for name, cumulative in project_imports(rows)[:args.top]:
+        print(f"   {name:<48s} {cumulative / 1000:8.1f} ms")
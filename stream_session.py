@@ -0,0 +1,134 @@
+"""
+Streaming predictions over one long-lived connection
+
+A StreamSession sits between a WebSocket (or anything with the same
+receive/send shape) and the prediction function. Incoming frames go into a
+single "latest" slot: if the client pushes faster than frames are scored,
+the unscored frame is replaced by the newer one and counted as dropped.
+Frames carry a client sequence number; anything older than the newest frame
+already accepted is discarded. Every reply echoes the sequence number of the
+frame it belongs to. Replies come from two threads (errors for malformed
+messages from the receive loop, predictions from the scoring thread), so
+sends are serialized: a WebSocket is not safe to write from both at once.
+
+Client -> server (text):  {"seq": 17, "landmarks": [x1, y1, ...]}
+Server -> client (text):  {"seq": 17, "prediction": "hello", "confidence": 0.93,
+                           "unknown": false, "top_k": [...], "cached": false,
+                           "dropped": 3, "latency_ms": 1.4}
+"""
+import itertools
+import json
+import threading
+import time
+
+from multi_hand import check_landmarks
+from rejection import response_fields
+
+
+class StreamSession:
+    """Latest-frame slot plus the thread that scores it"""
+
+    def __init__(self, predict, send, session_id=None, gate=None):
+        self.predict = predict      # rows -> [(rejection.top_k() result, cached)]
+        self.send = send            # str -> None
+        self.session_id = session_id
+        self.gate = gate            # optional motion_gate.MotionGate
+        self._auto_seq = itertools.count(1)
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._slot = None
+        self._last_seq = 0
+        self._closed = False
+        self._stats = {
+            'received': 0,
+            'predicted': 0,
+            'dropped': 0,       # replaced before they were scored
+            'out_of_order': 0,  # older than a frame already accepted
+            'invalid': 0
+        }
+        self._thread = threading.Thread(target=self._run, name=f'stream-{session_id}', daemon=True)
+        self._thread.start()
+
+    def push(self, message):
+        """Queue one frame message (JSON text); never blocks on inference"""
+        try:
+            data = json.loads(message)
+            landmarks = data['landmarks']
+            check_landmarks(landmarks)
+            seq = int(data['seq']) if 'seq' in data else next(self._auto_seq)
+        except (ValueError, KeyError, TypeError) as e:
+            with self._cond:
+                self._stats['invalid'] += 1
+            self._reply({'seq': None, 'error': str(e)})
+            return
+
+        with self._cond:
+            self._stats['received'] += 1
+            if seq <= self._last_seq:
+                self._stats['out_of_order'] += 1
+                return
+            self._last_seq = seq
+            if self._slot is not None:
+                self._stats['dropped'] += 1
+            self._slot = (seq, landmarks, time.perf_counter())
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._slot is not None)
+                if self._closed:
+                    return
+                (seq, landmarks, received_at), self._slot = self._slot, None
+
+            try:
+                prediction = self.gate.check(landmarks) if self.gate is not None else None
+                if prediction is not None:
+                    # Hand hasn't moved: same answer, no model call
+                    reply = {'seq': seq, **response_fields(prediction), 'cached': True, 'gated': True}
+                else:
+                    prediction, cached = self.predict([landmarks])[0]
+                    if self.gate is not None:
+                        self.gate.update(landmarks, prediction)
+                    reply = {'seq': seq, **response_fields(prediction), 'cached': cached}
+            except Exception as e:
+                reply = {'seq': seq, 'error': str(e)}
+            with self._cond:
+                self._stats['predicted'] += 1
+                reply['dropped'] = self._stats['dropped']
+            reply['latency_ms'] = round((time.perf_counter() - received_at) * 1000.0, 2)
+            if not self._reply(reply):
+                self.close(wait=False)
+
+    def _reply(self, message):
+        try:
+            with self._send_lock:
+                self.send(json.dumps(message))
+            return True
+        except Exception:
+            # Connection went away; the receive loop will notice as well
+            return False
+
+    def serve(self, receive):
+        """Receive loop: feed every message from `receive()` until it returns None"""
+        try:
+            while not self._closed:
+                message = receive()
+                if message is None:
+                    break
+                self.push(message)
+        finally:
+            self.close()
+
+    def close(self, wait=True):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=2.0)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+        stats['session'] = self.session_id
+        return stats
@@ -0,0 +1,284 @@
+"""
+Sliding-window (temporal) gesture recognition
+
+Motions like "Hi" or "good morning !" can't be told apart from one frame.
+This mode classifies a window of the most recent frames instead:
+
+    RingWindow      fixed-size ring buffer of landmark frames that keeps
+                    running sums, so window features cost O(1) per new frame
+                    (independent of the window length)
+    window features last frame, per-coordinate mean and std, displacement
+                    (newest - oldest) and mean absolute velocity: 5 x 42
+    sequence model  random forest over window features, trained from runs of
+                    consecutive same-label rows in the gesture store (e.g. a
+                    recording session or an ingest_media.py video), saved as
+                    a model bundle in temporal_model.pkl
+
+Windows with at least MIN_FRAMES frames are classified, in training and live,
+so short recordings still contribute.
+
+Usage:
+    python temporal.py train [--window 10]
+"""
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+N_FEATURES = 42
+WINDOW = 10             # frames per window
+MIN_FRAMES = 3          # windows shorter than this are not classified
+RESYNC_EVERY = 1024     # frames between exact recomputations of running sums
+TEMPORAL_MODEL_PATH = 'temporal_model.pkl'
+MAX_SESSIONS = 256
+
+FEATURE_GROUPS = ('last', 'mean', 'std', 'displacement', 'speed')
+TEMPORAL_FEATURE_NAMES = [f'{group}_{i}_{axis}' for group in FEATURE_GROUPS
+                          for i in range(21) for axis in ('x', 'y')]
+
+
+class RingWindow:
+    """Last `size` frames plus running sums for O(1) window features"""
+
+    def __init__(self, size=WINDOW):
+        self.size = size
+        self.frames = np.zeros((size, N_FEATURES), dtype=np.float64)
+        # |frame - previous frame| for each slot (the oldest slot's is unused)
+        self.steps = np.zeros((size, N_FEATURES), dtype=np.float64)
+        self.reset()
+
+    def reset(self):
+        """Empty the window (e.g. the hand left the frame)"""
+        self.count = 0
+        self.newest = -1
+        self.pushed = 0
+        self._sum = np.zeros(N_FEATURES)
+        self._sum_sq = np.zeros(N_FEATURES)
+        self._step_sum = np.zeros(N_FEATURES)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def oldest(self):
+        return (self.newest - self.count + 1) % self.size
+
+    def push(self, landmarks):
+        """Add a frame; ValueError for a non-finite one, which would poison
+        the running sums until the next resync"""
+        frame = np.asarray(landmarks, dtype=np.float64).reshape(N_FEATURES)
+        if not np.isfinite(frame).all():
+            raise ValueError('Landmarks must be finite numbers')
+        slot = (self.newest + 1) % self.size
+
+        if self.count == self.size:
+            # Evict the oldest frame; the step into the next-oldest frame
+            # leaves the window with it
+            old = self.frames[slot]
+            self._sum -= old
+            self._sum_sq -= old * old
+            self._step_sum -= self.steps[(slot + 1) % self.size]
+        else:
+            self.count += 1
+
+        if self.newest >= 0 and self.count > 1:
+            step = np.abs(frame - self.frames[self.newest])
+            self._step_sum += step
+            self.steps[slot] = step
+        self.frames[slot] = frame
+        self._sum += frame
+        self._sum_sq += frame * frame
+        self.newest = slot
+
+        self.pushed += 1
+        if self.pushed % RESYNC_EVERY == 0:
+            self._resync()
+
+    def _resync(self):
+        """Recompute the running sums exactly to shed floating-point drift"""
+        slots = [(self.oldest + i) % self.size for i in range(self.count)]
+        window = self.frames[slots]
+        self._sum = window.sum(axis=0)
+        self._sum_sq = (window * window).sum(axis=0)
+        self._step_sum = self.steps[slots[1:]].sum(axis=0)
+
+    def features(self):
+        """Window feature vector (5 x 42), see FEATURE_GROUPS"""
+        n = self.count
+        mean = self._sum / n
+        std = np.sqrt(np.maximum(self._sum_sq / n - mean * mean, 0.0))
+        last = self.frames[self.newest]
+        displacement = last - self.frames[self.oldest]
+        speed = self._step_sum / (n - 1) if n > 1 else np.zeros(N_FEATURES)
+        return np.concatenate([last, mean, std, displacement, speed])
+
+
+def window_features(frames):
+    """Same features computed directly from a (n, 42) window, oldest first"""
+    frames = np.asarray(frames, dtype=np.float64)
+    mean = frames.mean(axis=0)
+    speed = np.abs(np.diff(frames, axis=0)).mean(axis=0) if len(frames) > 1 else np.zeros(N_FEATURES)
+    return np.concatenate([frames[-1], mean, frames.std(axis=0), frames[-1] - frames[0], speed])
+
+
+def label_runs(y):
+    """(label, start, stop) for every run of consecutive equal labels"""
+    runs = []
+    start = 0
+    for label, group in itertools.groupby(y):
+        length = sum(1 for _ in group)
+        runs.append((label, start, start + length))
+        start += length
+    return runs
+
+
+def build_windows(X, y, window=WINDOW, runs=None):
+    """Window features and labels from runs of consecutive same-label rows"""
+    features, labels = [], []
+    for label, start, stop in runs if runs is not None else label_runs(y):
+        ring = RingWindow(window)
+        for row in X[start:stop]:
+            ring.push(row)
+            if len(ring) >= MIN_FRAMES:
+                features.append(ring.features())
+                labels.append(label)
+    features = np.asarray(features, dtype=np.float32).reshape(-1, len(TEMPORAL_FEATURE_NAMES))
+    return features, np.asarray(labels, dtype=object)
+
+
+def split_runs(y, test_fraction=0.2):
+    """Train/test runs: the last part of every run is held out, so
+    overlapping windows never appear on both sides"""
+    train, test = [], []
+    for label, start, stop in label_runs(y):
+        cut = stop - int((stop - start) * test_fraction)
+        train.append((label, start, cut))
+        if stop - cut >= MIN_FRAMES:
+            test.append((label, cut, stop))
+    return train, test
+
+
+def train_temporal(X, y, window=WINDOW, path=TEMPORAL_MODEL_PATH):
+    """Fit and save the sequence model; returns a report dict"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    from model_bundle import save_bundle
+
+    runs = label_runs(y)
+    too_short = sorted({label for label, start, stop in runs if stop - start < MIN_FRAMES})
+
+    train_runs, test_runs = split_runs(y)
+    X_train, y_train = build_windows(X, y, window, train_runs)
+    X_test, y_test = build_windows(X, y, window, test_runs)
+    clf = RandomForestClassifier(random_state=42)
+    clf.fit(X_train, y_train)
+    accuracy = float((clf.predict(X_test) == y_test).mean()) if len(X_test) else None
+
+    # Baseline: single-frame forest on the same split, scored on the newest
+    # frame of every test window
+    frame_accuracy = None
+    if len(X_test):
+        frame_rows = np.concatenate([np.arange(start, stop) for _, start, stop in train_runs])
+        test_rows = np.concatenate([np.arange(start + MIN_FRAMES - 1, stop)
+                                    for _, start, stop in test_runs])
+        frame_clf = RandomForestClassifier(random_state=42).fit(X[frame_rows], y[frame_rows])
+        frame_accuracy = float((frame_clf.predict(X[test_rows]) == y[test_rows]).mean())
+
+    # Final model on every window
+    X_all, y_all = build_windows(X, y, window, runs)
+    clf = RandomForestClassifier(random_state=42)
+    clf.fit(X_all, y_all)
+    save_bundle(clf, X, y, path, n_train_rows=len(X_all), accuracy=accuracy,
+                kind='temporal', window=window, min_frames=MIN_FRAMES,
+                feature_names=list(TEMPORAL_FEATURE_NAMES))
+    return {
+        'windows': len(X_all),
+        'accuracy': accuracy,
+        'frame_accuracy': frame_accuracy,
+        'test_windows': len(X_test),
+        'labels_without_streams': too_short
+    }
+
+
+def load_temporal(path=TEMPORAL_MODEL_PATH):
+    """(model, window) from a temporal bundle"""
+    from forest_engine import maybe_compile
+    from forest_file import load_serving_bundle
+
+    bundle = load_serving_bundle(path)
+    if bundle.get('kind') != 'temporal':
+        raise ValueError(f'{path} is not a temporal model bundle')
+    return maybe_compile(bundle['model']), bundle['window']
+
+
+class TemporalSession:
+    """One stream: ring buffer of its frames + the shared sequence model"""
+
+    def __init__(self, model, window=WINDOW):
+        self.model = model
+        self.ring = RingWindow(window)
+        self._lock = threading.Lock()
+
+    def push(self, landmarks):
+        """Add a frame; returns (prediction, confidence) or None while warming up"""
+        with self._lock:
+            self.ring.push(landmarks)
+            if len(self.ring) < MIN_FRAMES:
+                return None
+            features = self.ring.features().reshape(1, -1)
+        proba = self.model.predict_proba(features)[0]
+        best = int(proba.argmax())
+        return self.model.classes_[best], float(proba[best])
+
+    def reset(self):
+        with self._lock:
+            self.ring.reset()
+
+
+class TemporalRegistry:
+    """TemporalSession per session id, least recently used evicted"""
+
+    def __init__(self, model, window=WINDOW, max_sessions=MAX_SESSIONS):
+        self.model = model
+        self.window = window
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session):
+        with self._lock:
+            state = self._sessions.get(session)
+            if state is None:
+                state = self._sessions[session] = TemporalSession(self.model, self.window)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session)
+            return state
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train the sliding-window gesture model')
+    parser.add_argument('command', choices=['train'])
+    parser.add_argument('--window', type=int, default=WINDOW, help='frames per window')
+    parser.add_argument('--output', default=TEMPORAL_MODEL_PATH)
+    args = parser.parse_args()
+
+    from gesture_store import load_dataset
+
+    X, y = load_dataset()
+    report = train_temporal(X, y, args.window, args.output)
+    print(f"✅ Temporal model saved to {args.output}: {report['windows']} windows")
+    if report['accuracy'] is not None:
+        print(f"📊 Held-out accuracy (end of each recording): {report['accuracy']:.3f} "
+              f"on {report['test_windows']} windows "
+              f"(single-frame model: {report['frame_accuracy']:.3f})")
+    if report['labels_without_streams']:
+        print(f"⚠️ Fewer than {MIN_FRAMES} consecutive frames, not learned: "
+              f"{report['labels_without_streams']}")
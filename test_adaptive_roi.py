@@ -0,0 +1,59 @@
+"""
+Test adaptive tracking: crop geometry, the quality controller and replay summaries
+"""
+from adaptive_roi import (LEVELS, PATIENCE, QualityController, inside, roi_box,
+                          summarize)
+
+
+def test_roi_box_stays_square_and_inside_the_frame():
+    for box in [(300, 200, 380, 300), (0, 0, 50, 40), (600, 440, 640, 480), (10, 10, 630, 470)]:
+        x0, y0, x1, y1 = roi_box(box, 640, 480)
+        assert 0 <= x0 < x1 <= 640 and 0 <= y0 < y1 <= 480
+        assert x1 - x0 == y1 - y0 >= min(224, 480)
+
+    crop = roi_box((300, 200, 380, 300), 640, 480)
+    assert inside((300, 200, 380, 300), crop)
+    assert not inside((300, 200, crop[2], 300), crop)
+
+
+def test_controller_steps_down_when_slow_and_backs_off():
+    controller = QualityController(target_fps=30)
+    start = controller.level
+    slow, fast = 1 / 15, 1 / 200
+
+    for _ in range(PATIENCE):
+        controller.observe(slow, slow, now=0.0)
+    assert controller.level == start + 1
+
+    # Fast again, but the upgrade waits out the hold
+    for _ in range(PATIENCE):
+        controller.observe(1 / 30, fast, now=1.0)
+    assert controller.level == start + 1
+    for _ in range(PATIENCE):
+        controller.observe(1 / 30, fast, now=10.0)
+    assert controller.level == start
+
+    # Undoing that upgrade doubles the hold
+    for _ in range(PATIENCE):
+        controller.observe(slow, slow, now=11.0)
+    for _ in range(PATIENCE):
+        controller.observe(1 / 30, fast, now=18.0)
+    assert controller.level == start + 1
+    for _ in range(PATIENCE):
+        controller.observe(1 / 30, fast, now=22.0)
+    assert controller.level == start
+
+    for _ in range(PATIENCE * len(LEVELS) * 2):
+        controller.observe(slow, slow, now=30.0)
+    assert controller.setting == LEVELS[-1]
+
+
+def test_summarize_against_reference():
+    row = [0.1 * i for i in range(42)]
+    fixed = [(row, 'A', 0.02), (row, 'B', 0.02), (None, None, 0.02)]
+    adaptive = [(row, 'A', 0.01), (row, 'A', 0.01), (row, 'A', 0.01)]
+    summary = summarize(adaptive, ['A', 'B', 'B'], fixed)
+    assert summary['hand_rate'] == 1.0
+    assert abs(summary['fps'] - 100.0) < 1e-6
+    assert summary['accuracy'] == 1 / 3
+    assert summary['agreement'] == 0.5 and summary['landmark_error'] == 0.0
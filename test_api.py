@@ -2,21 +2,21 @@
 Test Flask API with exact same data as desktop version
 """
 from flask import Flask, request, jsonify
-import joblib
-import pandas as pd
 import json
+from forest_engine import maybe_compile
+from forest_file import load_serving_bundle
 
 app = Flask(__name__)
 
-# Load model and data (same as detect_sign.py)
-print("🔍 Loading model and data...")
-model = joblib.load('model.pkl')
-data = pd.read_csv('gestures.csv', header=None)
-labels = sorted(data.iloc[:, -1].unique())
+# Load model bundle (same as detect_sign.py)
+print("🔍 Loading model...")
+bundle = load_serving_bundle('model.pkl')
+model = maybe_compile(bundle['model'])
+labels = bundle['classes']
 
 print(f"✅ Model loaded: {type(model)}")
 print(f"✅ Labels: {labels}")
-print(f"✅ Data shape: {data.shape}")
+print(f"✅ Trained on: {bundle['n_dataset_rows']} rows")
 
 @app.route('/')
 def home():
@@ -24,7 +24,7 @@ def home():
     <h1>🧪 SILEXA API Test</h1>
     <p>Model: {type(model)}</p>
     <p>Labels: {labels}</p>
-    <p>Data shape: {data.shape}</p>
+    <p>Trained on: {bundle['n_dataset_rows']} rows</p>
     
     <h2>Test with Sample Data</h2>
     <button onclick="testSample()">Test Sample Prediction</button>
@@ -49,7 +49,11 @@ def home():
 def test_sample():
     """Test with sample data from CSV"""
     try:
-        # Get first row from CSV (same data as desktop test)
+        # Get first row from CSV (same data as desktop test); pandas is only
+        # needed here, and only the sample row is read
+        import pandas as pd
+
+        data = pd.read_csv('gestures.csv', header=None, nrows=1)
         sample_landmarks = data.iloc[0, :-1].values.tolist()
         expected_label = data.iloc[0, -1]
         
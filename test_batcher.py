@@ -0,0 +1,85 @@
+"""
+Test the /api/predict micro-batcher: per-caller results, timeouts, model swaps
+"""
+import threading
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from batcher import MicroBatcher
+from test_rejection import make_model
+
+
+def test_concurrent_callers_get_their_own_rows():
+    model, X, _ = make_model()
+    X = X.astype(np.float32)
+    batcher = MicroBatcher(lambda: model, window_ms=5.0, max_rows=32)
+    errors = []
+
+    def caller(offset):
+        try:
+            for i in range(20):
+                rows = X[(offset + i) % 150:(offset + i) % 150 + 1 + i % 4]
+                proba, classes = batcher.predict_proba(rows)
+                assert list(classes) == list(model.classes_)
+                np.testing.assert_array_equal(proba, model.predict_proba(rows))
+        except Exception as e:
+            errors.append(e)
+
+    callers = [threading.Thread(target=caller, args=(17 * i,)) for i in range(8)]
+    for thread in callers:
+        thread.start()
+    for thread in callers:
+        thread.join(timeout=30.0)
+    batcher.stop()
+    assert not errors
+    stats = batcher.stats()
+    assert stats['requests'] == 160 and stats['batches'] < 160
+
+
+def test_timeout():
+    release = threading.Event()
+    model, X, _ = make_model()
+
+    def slow_model():
+        release.wait(5.0)
+        return model
+
+    batcher = MicroBatcher(slow_model, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher.predict_proba(X[:1])
+    release.set()
+    batcher.stop()
+
+
+def test_model_swap_keeps_proba_and_classes_together():
+    old, X, y = make_model()
+    X = X.astype(np.float32)
+    # Different labels and column order than the old model
+    new = RandomForestClassifier(n_estimators=10, random_state=1).fit(X, np.where(y == 'A', 'Z', y))
+    served = [old]
+    batcher = MicroBatcher(lambda: served[0], window_ms=1.0)
+    errors = []
+
+    def caller():
+        try:
+            for i in range(50):
+                rows = X[i:i + 2]
+                proba, classes = batcher.predict_proba(rows)
+                model = old if list(classes) == list(old.classes_) else new
+                assert list(classes) == list(model.classes_)
+                np.testing.assert_array_equal(proba, model.predict_proba(rows))
+        except Exception as e:
+            errors.append(e)
+
+    callers = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in callers:
+        thread.start()
+    served[0] = new
+    for thread in callers:
+        thread.join(timeout=30.0)
+    assert not errors
+    proba, classes = batcher.predict_proba(X[:1])
+    assert list(classes) == list(new.classes_)
+    batcher.stop()
@@ -1,18 +1,27 @@
 """
 Test to ensure web version matches desktop version exactly
+
+Both answer with the forest's best class, or "unknown" when its probability
+is below that class's calibrated threshold (rejection.py), so the labels
+here come from the same rejection-aware call as detect_sign.py and
+/api/predict; the raw model.predict() label is printed alongside.
 """
 import cv2
 import mediapipe as mp
-import joblib
+from cascade import serving_model, serving_unknown
+from forest_file import load_serving_bundle
+from multi_hand import MAX_HANDS, classify_hands, detected_hands, landmark_row
 import pandas as pd
 import numpy as np
 import time
 
 # Load model and labels (same as both versions)
 print("Loading model and labels...")
-model = joblib.load('model.pkl')
-data = pd.read_csv('gestures.csv', header=None)
-labels = sorted(data.iloc[:, -1].unique())
+bundle = load_serving_bundle('model.pkl')
+model = serving_model(bundle)
+unknown = serving_unknown(bundle, model)
+labels = bundle['classes']
+data = pd.read_csv('gestures.csv', header=None, nrows=1)
 
 print(f"Model: {type(model)}")
 print(f"Labels: {labels}")
@@ -21,7 +30,7 @@ print(f"Labels: {labels}")
 mp_hands = mp.solutions.hands
 hands = mp_hands.Hands(
     static_image_mode=False,
-    max_num_hands=1,
+    max_num_hands=MAX_HANDS,
     model_complexity=0,
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5
@@ -35,9 +44,9 @@ sample_label = data.iloc[0, -1]
 print(f"Sample landmarks length: {len(sample_landmarks)}")
 print(f"Sample label: {sample_label}")
 
-# Test prediction (exact same as detect_sign.py line 74)
-prediction = model.predict([sample_landmarks])[0]
-print(f"Prediction: {prediction}")
+# Test prediction (exact same as detect_sign.py: label or "unknown")
+prediction = classify_hands(model, [list(sample_landmarks)], 1, unknown)[0][0]
+print(f"Prediction: {prediction} (model.predict: {model.predict([sample_landmarks])[0]})")
 print(f"Matches expected: {prediction == sample_label}")
 
 # Test with camera (same as detect_sign.py)
@@ -62,24 +71,24 @@ while True:
     
     prediction_text = "No hand detected"
     
-    if result.multi_hand_landmarks:
-        hand_landmarks = result.multi_hand_landmarks[0]
-        mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+    detected = detected_hands(result)
+    if detected:
+        for _, hand_landmarks in detected:
+            mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+        
+        # EXACT same landmark extraction as detect_sign.py, one row per hand
+        rows = [landmark_row(hand_landmarks) for _, hand_landmarks in detected]
         
-        # EXACT same landmark extraction as detect_sign.py
-        landmarks = []
-        for lm in hand_landmarks.landmark:
-            landmarks.extend([lm.x, lm.y])
+        # EXACT same prediction as detect_sign.py: every hand in one call,
+        # "unknown" below the class threshold
+        predictions = [label for label, _, _ in classify_hands(model, rows, 1, unknown)]
+        prediction_text = ' | '.join(f"{handedness or '?'}: {prediction}"
+                                     for (handedness, _), prediction in zip(detected, predictions))
         
-        if len(landmarks) == 42:
-            # EXACT same prediction as detect_sign.py
-            prediction = model.predict([landmarks])[0]
-            prediction_text = prediction
-            
-            frame_count += 1
-            if frame_count % 30 == 0:  # Every 30 frames
-                print(f"🧠 Frame {frame_count}: Detected '{prediction}'")
-                print(f"   Landmarks sample: {landmarks[:6]}")  # First 3 points
+        frame_count += 1
+        if frame_count % 30 == 0:  # Every 30 frames
+            print(f"🧠 Frame {frame_count}: Detected {prediction_text}")
+            print(f"   Landmarks sample: {rows[0][:6]}")  # First 3 points
     
     # Display (same as detect_sign.py)
     cv2.putText(frame, f'Gesture: {prediction_text}', (10, 60),
@@ -94,19 +103,16 @@ while True:
     key = cv2.waitKey(1) & 0xFF
     if key == ord('q'):
         break
-    elif key == ord('s') and result.multi_hand_landmarks:
-        # Single frame test
-        hand_landmarks = result.multi_hand_landmarks[0]
-        landmarks = []
-        for lm in hand_landmarks.landmark:
-            landmarks.extend([lm.x, lm.y])
-        
-        if len(landmarks) == 42:
-            prediction = model.predict([landmarks])[0]
-            print(f"\n🔍 SINGLE FRAME TEST:")
+    elif key == ord('s') and detected:
+        # Single frame test: batched predictions must match per-hand ones
+        for (handedness, _), landmarks, batched in zip(detected, rows, predictions):
+            prediction, confidence, _ = classify_hands(model, [landmarks], 1, unknown)[0]
+            print(f"\n🔍 SINGLE FRAME TEST ({handedness or 'unknown'} hand):")
             print(f"   Landmarks length: {len(landmarks)}")
             print(f"   First 10 values: {landmarks[:10]}")
-            print(f"   Prediction: '{prediction}'")
+            print(f"   Prediction: '{prediction}' (confidence {confidence:.2f}, "
+                  f"model.predict: '{model.predict([landmarks])[0]}')")
+            print(f"   Matches batched call: {prediction == batched}")
             print(f"   Available labels: {labels}")
 
 cap.release()
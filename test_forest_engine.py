@@ -0,0 +1,88 @@
+"""
+Test that the compiled forest engine matches sklearn exactly
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from forest_engine import EarlyExitForest, compile_forest
+from model_bundle import load_bundle
+
+
+def load_reference():
+    """model.pkl and every row of gestures.csv (trains a forest if no model.pkl)"""
+    data = pd.read_csv('gestures.csv', header=None)
+    X = data.iloc[:, :-1].values.astype(np.float64)
+    y = data.iloc[:, -1].values
+
+    if os.path.exists('model.pkl'):
+        model = load_bundle('model.pkl')['model']
+    else:
+        from sklearn.ensemble import RandomForestClassifier
+        model = RandomForestClassifier(random_state=42).fit(X, y)
+    return model, X
+
+
+def test_batch_parity():
+    model, X = load_reference()
+    compiled = compile_forest(model)
+
+    assert (compiled.predict(X) == model.predict(X)).all()
+    assert np.array_equal(compiled.predict_proba(X), model.predict_proba(X))
+
+
+def test_single_frame_parity():
+    model, X = load_reference()
+    compiled = compile_forest(model)
+
+    for row in X:
+        assert compiled.predict([row])[0] == model.predict([row])[0]
+
+
+def test_early_exit_exact_labels():
+    model, X = load_reference()
+    compiled = compile_forest(model)
+    early = EarlyExitForest(compiled)
+
+    assert (early.predict(X) == compiled.predict(X)).all()
+    for row in X[:200]:
+        assert early.predict([row])[0] == compiled.predict([row])[0]
+    assert early.stats()['avg_trees'] <= compiled.n_estimators
+
+
+def test_early_exit_margin_single_frame_walk():
+    model, X = load_reference()
+    compiled = compile_forest(model)
+    # One chunk spanning every tree never stops early: the single-frame
+    # Python walk must then give the full forest's probabilities exactly
+    early = EarlyExitForest(compiled, margin=0.5, chunk=compiled.n_estimators)
+
+    for row in X[:200]:
+        assert np.array_equal(early.predict_proba([row]), compiled.predict_proba([row]))
+    assert early.stats()['avg_trees'] == compiled.n_estimators
+
+
+if __name__ == '__main__':
+    print("🔍 Compiled forest vs sklearn")
+    model, X = load_reference()
+    compiled = compile_forest(model)
+
+    matches = (compiled.predict(X) == model.predict(X)).sum()
+    print(f"✅ Label parity: {matches}/{len(X)} rows")
+    print(f"✅ Probabilities identical: {np.array_equal(compiled.predict_proba(X), model.predict_proba(X))}")
+
+    early = EarlyExitForest(compiled)
+    print(f"✅ Early exit (exact) label parity: {(early.predict(X) == compiled.predict(X)).sum()}/{len(X)} rows, "
+          f"{early.stats()['avg_trees']:.1f} of {compiled.n_estimators} trees per frame")
+
+    for name, predict in [('sklearn', model.predict), ('compiled', compiled.predict),
+                          ('margin 0.3', EarlyExitForest(compiled, margin=0.3).predict)]:
+        times = []
+        for row in X[:300]:
+            start = time.perf_counter()
+            predict([row])
+            times.append((time.perf_counter() - start) * 1e6)
+        print(f"⏱️ {name:9s} single frame: p50 {np.percentile(times, 50):8.1f} us, "
+              f"p99 {np.percentile(times, 99):8.1f} us")
@@ -0,0 +1,41 @@
+"""
+Test that model.forest round-trips the compiled forest exactly
+"""
+import os
+
+import joblib
+import numpy as np
+
+from forest_engine import compile_forest
+from forest_file import export_bundle, load_forest_bundle, load_serving_bundle
+from model_bundle import make_bundle
+from test_forest_engine import load_reference
+
+
+def write_bundle(tmp_path):
+    model, X = load_reference()
+    bundle = make_bundle(model, X, model.predict(X))
+    path = str(tmp_path / 'model.pkl')
+    joblib.dump(bundle, path)
+    export_bundle(bundle, path)
+    return path, model, X
+
+
+def test_round_trip_parity(tmp_path):
+    path, model, X = write_bundle(tmp_path)
+    loaded = load_forest_bundle(str(tmp_path / 'model.forest'), path)
+    compiled = compile_forest(model)
+
+    assert loaded['classes'] == [str(c) for c in model.classes_]
+    assert np.array_equal(loaded['model'].predict_proba(X), compiled.predict_proba(X))
+    for row in X[:100]:
+        assert loaded['model'].predict([row])[0] == model.predict([row])[0]
+
+
+def test_stale_file_falls_back_to_pickle(tmp_path):
+    path, model, X = write_bundle(tmp_path)
+    assert type(load_serving_bundle(path)['model']).__name__ == 'CompiledForest'
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert hasattr(load_serving_bundle(path)['model'], 'estimators_')
@@ -0,0 +1,31 @@
+"""
+Test the gesture store's one-shot CSV import
+"""
+import pytest
+
+from gesture_store import GestureStore, open_store
+
+
+def write_csv(path, n_rows):
+    with open(path, 'w') as f:
+        f.write(','.join(f'x{i}' for i in range(42)) + ',label\n')
+        for i in range(n_rows):
+            f.write(','.join(['0.5'] * 42) + f',{"AB"[i % 2]}\n')
+
+
+def test_import_is_all_or_nothing(tmp_path, monkeypatch):
+    csv_path, path = tmp_path / 'gestures.csv', str(tmp_path / 'store')
+    write_csv(csv_path, 10)
+
+    def crash(self, rows, labels, fsync=False, hands=None):
+        raise KeyboardInterrupt
+    with monkeypatch.context() as patch:
+        patch.setattr(GestureStore, 'append_many', crash)
+        with pytest.raises(KeyboardInterrupt):
+            open_store(path, csv_path)
+    assert not GestureStore.exists(path)
+    assert [p.name for p in tmp_path.iterdir()] == ['gestures.csv']
+
+    store = open_store(path, csv_path)
+    assert len(store) == 10 and list(store.label_counts()) == ['A', 'B']
+    assert len(open_store(path, csv_path)) == 10
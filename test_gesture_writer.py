@@ -0,0 +1,69 @@
+"""
+Test the background gesture writer: backpressure and failed writes
+"""
+import queue
+import threading
+import time
+
+import pytest
+
+from gesture_writer import GestureWriter, WriteFailed
+
+
+class SlowStore:
+    def __init__(self):
+        self.rows = 0
+
+    def append_many(self, rows, labels, fsync=False, hands=None):
+        time.sleep(0.02)
+        self.rows += len(rows)
+
+
+class BrokenStore:
+    def append_many(self, rows, labels, fsync=False, hands=None):
+        raise OSError('disk full')
+
+
+def test_full_queue_does_not_stall_the_writer():
+    store = SlowStore()
+    writer = GestureWriter(store, max_queue=4, batch_rows=4, flush_interval=0.01, put_timeout=1.0)
+
+    def produce():
+        for _ in range(25):
+            while True:
+                try:
+                    writer.submit([0.0] * 42, 'A')
+                    break
+                except queue.Full:
+                    pass
+
+    producers = [threading.Thread(target=produce) for _ in range(4)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join(timeout=10.0)
+    assert writer.flush(timeout=10.0)
+    assert store.rows == 100
+    writer.close()
+
+
+def test_failed_write_is_reported():
+    writer = GestureWriter(BrokenStore(), flush_interval=0.01)
+    seq = writer.submit([0.0] * 42, 'A')
+    with pytest.raises(WriteFailed):
+        writer.wait_for(seq, timeout=5.0)
+    assert writer.stats()['rows_failed'] == 1
+    writer.close()
+
+
+def test_bad_rows_are_rejected_before_the_queue():
+    store = SlowStore()
+    writer = GestureWriter(store, flush_interval=0.01)
+    first = writer.submit([0.0] * 42, 'A')
+    for row in (['x'] * 42, [None] * 42, [0.0] * 41, [float('inf')] + [0.0] * 41):
+        with pytest.raises(ValueError):
+            writer.submit(row, 'A')
+    last = writer.submit([1.0] * 42, 'A')
+    assert writer.wait_for(last, timeout=5.0, first=first)
+    assert store.rows == 2 and writer.stats()['rows_failed'] == 0
+    writer.close()
@@ -0,0 +1,38 @@
+"""
+Test that timed-out frame requests are cancelled, not processed later
+"""
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from hand_pool import ExtractTimeout, HandPool
+
+
+class BlockingHands:
+    def __init__(self, release):
+        self.release = release
+
+    def process(self, image):
+        self.release.wait(5.0)
+        return SimpleNamespace(multi_hand_landmarks=None)
+
+
+def test_timed_out_frames_are_cancelled():
+    release = threading.Event()
+    pool = HandPool(workers=1, hands_factory=lambda static: BlockingHands(release),
+                    decoder=lambda data: data)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    running = pool.submit([frame])  # occupies the only worker
+
+    for _ in range(3):
+        with pytest.raises(ExtractTimeout, match='frame workers are behind'):
+            pool.extract([frame], timeout=0.05)
+
+    release.set()
+    assert running.result(5.0) == [None]
+    pool.close()
+    stats = pool.stats()
+    assert stats['timed_out'] == stats['cancelled'] == 3
+    assert stats['workers'][0]['frames'] == 1
@@ -0,0 +1,48 @@
+"""
+Test two-hand requests, batched per-hand classification and stored hand tags
+"""
+import numpy as np
+import pytest
+
+from gesture_store import GestureStore
+from multi_hand import PAIRED, classify_hands, hand_tag, parse_hands, tag_handedness
+from test_rejection import make_model
+
+
+def test_batched_hands_match_single_calls():
+    model, X, y = make_model()
+    results = classify_hands(model, [list(X[0]), list(X[1])])
+    assert [label for label, _, _ in results] == [model.predict([X[0]])[0], model.predict([X[1]])[0]]
+
+
+def test_parse_hands():
+    row = [0.5] * 42
+    assert parse_hands({'landmarks': row}) == [(None, row)]
+    hands = parse_hands({'hands': [{'landmarks': row, 'handedness': 'Right'},
+                                   {'landmarks': row, 'handedness': 'Left'}]})
+    assert [handedness for handedness, _ in hands] == ['Right', 'Left']
+
+    for data in ({'landmarks': row[:40]},
+                 {'hands': []},
+                 {'hands': [{'landmarks': row}] * 3},
+                 {'hands': [{'landmarks': row, 'handedness': 'Left'}] * 2},
+                 {'landmarks': [None] * 42},
+                 {'landmarks': row[:41] + [float('nan')]},
+                 {'hands': [{'landmarks': row[:41] + ['x']}]}):
+        with pytest.raises(ValueError):
+            parse_hands(data)
+
+
+def test_hand_tags_round_trip(tmp_path):
+    store = GestureStore(str(tmp_path))
+    row = np.zeros(42)
+    store.append(row, 'A')  # before tags: no hands.u8 yet
+    assert not (tmp_path / 'hands.u8').exists()
+
+    store.append_many([row, row], ['B', 'B'],
+                      hands=[hand_tag('Left', paired=True), hand_tag('Right', paired=True)])
+    store.append(row, 'C')
+    tags = store.hand_tags()
+    assert len(tags) == len(store) == 4
+    assert [tag_handedness(tag) for tag in tags] == [None, 'Left', 'Right', None]
+    assert [bool(tag & PAIRED) for tag in tags] == [False, True, True, False]
@@ -0,0 +1,57 @@
+"""
+Test top-k responses and unknown-gesture rejection
+"""
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from cascade import (CascadeModel, build_cascade, calibrate_serving_unknown, serving_model,
+                     serving_unknown)
+from rejection import UNKNOWN_LABEL, calibrate_unknown, rejected, top_k
+
+
+def make_model():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 1, size=(4, 42))
+    y = np.repeat(np.array(['A', 'B', 'C', 'D']), 150)
+    X = centers[np.searchsorted(['A', 'B', 'C', 'D'], y)] + rng.normal(0, 0.15, size=(len(y), 42))
+    order = rng.permutation(len(y))
+    X, y = X[order], y[order]
+    model = RandomForestClassifier(n_estimators=30, random_state=0).fit(X[:400], y[:400])
+    return model, X[400:], y[400:]
+
+
+def test_top_k_matches_predict():
+    model, X, y = make_model()
+    proba = model.predict_proba(X)
+    for row, expected in zip(proba, model.predict(X)):
+        label, confidence, alternatives = top_k(row, model.classes_, k=3)
+        assert label == expected
+        assert confidence == alternatives[0][1] == row.max()
+        probabilities = [p for _, p in alternatives]
+        assert probabilities == sorted(probabilities, reverse=True) and len(alternatives) <= 3
+
+
+def test_calibrated_rejection():
+    model, X, y = make_model()
+    unknown = calibrate_unknown(model, X, y)
+    assert set(unknown['thresholds']) == set(model.classes_)
+    assert all(t <= unknown['default'] for t in unknown['thresholds'].values())
+
+    noise = np.random.default_rng(1).uniform(-1, 2, size=(200, 42))
+    proba = model.predict_proba(noise)
+    flags = rejected(proba, model.classes_, unknown)
+    labels = [top_k(row, model.classes_, unknown=unknown)[0] for row in proba]
+    assert [label == UNKNOWN_LABEL for label in labels] == list(flags)
+    assert rejected(model.predict_proba(X), model.classes_, unknown).mean() < flags.mean()
+
+
+def test_thresholds_calibrated_on_the_served_model():
+    model, X, y = make_model()
+    cascade = build_cascade(model, X[:100], y[:100], X[100:], y[100:])
+    unknown = calibrate_serving_unknown(model, cascade, X, y)
+    bundle = {'model': model, 'cascade': cascade, 'unknown': unknown}
+    full, first = serving_model(bundle), serving_model(bundle, cascade=True)
+    assert isinstance(first, CascadeModel)
+    assert serving_unknown(bundle, full) is unknown
+    assert serving_unknown(bundle, first) is cascade['unknown'] is not None
+    assert cascade['unknown'] == calibrate_unknown(first, X, y)
@@ -0,0 +1,22 @@
+"""
+Test that a retrain job which can't start still finishes
+"""
+from retrain_jobs import RetrainManager
+
+
+class BrokenContext:
+    def Queue(self):
+        raise OSError('spawn bootstrapping failed')
+
+
+def test_job_fails_when_the_process_cannot_start():
+    manager = RetrainManager(on_complete=lambda result: None)
+    manager._context = BrokenContext()
+
+    job = manager.wait(manager.submit()['id'], timeout=5.0)
+    assert job['status'] == 'failed' and 'spawn bootstrapping failed' in job['error']
+
+    # Not stuck: the next request gets a job of its own that finishes too
+    follow_up = manager.submit()
+    assert follow_up['id'] != job['id']
+    assert manager.wait(follow_up['id'], timeout=5.0)['status'] == 'failed'
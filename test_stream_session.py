@@ -0,0 +1,47 @@
+"""
+Test StreamSession's latest-frame slot: sequence order and dropped frames
+"""
+import json
+import threading
+import time
+
+from stream_session import StreamSession
+
+
+def frame(seq, value):
+    return json.dumps({'seq': seq, 'landmarks': [value] * 42})
+
+
+def test_stale_frames_are_dropped_and_replies_keep_order():
+    started, release = threading.Event(), threading.Event()
+    scored, replies = [], []
+
+    def predict(rows):
+        scored.append(rows[0][0])
+        started.set()
+        release.wait(5.0)
+        return [(('A', 0.9, [('A', 0.9)]), False)]
+
+    session = StreamSession(predict, lambda message: replies.append(json.loads(message)))
+    session.push(frame(1, 0.1))
+    assert started.wait(5.0)            # frame 1 is being scored
+
+    session.push(frame(2, 0.2))
+    session.push(frame(3, 0.3))         # replaces 2 before it was scored
+    session.push(frame(2, 0.2))         # older than 3
+    session.push(frame(3, 0.3))         # not newer than 3
+    session.push(json.dumps({'seq': 4, 'landmarks': [None] * 42}))
+    release.set()
+
+    deadline = time.monotonic() + 5.0
+    while len(replies) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    session.close()
+
+    assert scored == [0.1, 0.3]
+    assert replies[0]['seq'] is None and 'error' in replies[0]
+    assert [reply['seq'] for reply in replies[1:]] == [1, 3]
+    assert replies[2]['dropped'] == 1
+    stats = session.stats()
+    assert (stats['received'], stats['predicted'], stats['dropped'],
+            stats['out_of_order'], stats['invalid']) == (5, 2, 1, 2, 1)
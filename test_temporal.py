@@ -0,0 +1,37 @@
+"""
+Test the sliding-window features kept by RingWindow
+"""
+import numpy as np
+import pytest
+
+import temporal
+from temporal import RingWindow, window_features
+
+
+@pytest.mark.parametrize('resync_every', [temporal.RESYNC_EVERY, 7])
+def test_incremental_features_match_direct(monkeypatch, resync_every):
+    monkeypatch.setattr(temporal, 'RESYNC_EVERY', resync_every)
+    frames = np.random.default_rng(0).uniform(0, 1, size=(40, 42))
+    ring = RingWindow(5)
+    # 40 frames through a 5-slot ring: eight wraparounds, and with
+    # resync_every=7 five exact recomputations in between
+    for i, frame in enumerate(frames):
+        ring.push(frame)
+        window = frames[max(0, i + 1 - 5):i + 1]
+        assert len(ring) == len(window)
+        np.testing.assert_allclose(ring.features(), window_features(window), atol=1e-9)
+
+    ring.reset()
+    ring.push(frames[0])
+    np.testing.assert_allclose(ring.features(), window_features(frames[:1]), atol=1e-12)
+
+
+def test_non_finite_frames_are_rejected():
+    ring = RingWindow(10)
+    ring.push(np.full(42, 0.5))
+    for frame in ([None] * 42, [float('nan')] * 42, [0.5] * 41 + [float('inf')]):
+        with pytest.raises(ValueError):
+            ring.push(frame)
+    assert len(ring) == 1
+    ring.push(np.full(42, 0.7))
+    assert np.isfinite(ring.features()).all()
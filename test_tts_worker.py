@@ -0,0 +1,83 @@
+"""
+Test the background speech worker with the offline stub backend
+"""
+import os
+import tempfile
+import threading
+
+from tts_worker import AudioCache, SpeechWorker, StubBackend
+
+
+def make_worker(cache_dir, player=None):
+    played = []
+    backend = StubBackend()
+    worker = SpeechWorker(backend, cache_dir=cache_dir,
+                          player=player or (lambda path: played.append(path)))
+    return worker, backend, played
+
+
+def test_phrase_synthesized_once():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        worker, backend, played = make_worker(cache_dir)
+        for _ in range(3):
+            worker.say('hello')
+            worker.wait_idle(timeout=5.0)
+        worker.close()
+
+        assert backend.calls == [('hello', 'en')]
+        assert len(played) == 3 and len(set(played)) == 1
+        assert worker.stats()['cache_hits'] == 2
+
+
+def test_cache_persists_and_is_keyed_by_backend_and_lang():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = AudioCache(cache_dir)
+        backend = StubBackend()
+        en_path, cached = cache.get(backend, 'en', 'hello')
+        assert not cached and os.path.exists(en_path)
+        assert cache.get(backend, 'en', 'hello') == (en_path, True)
+        assert cache.path_for(backend, 'fr', 'hello') != en_path
+
+        # A new worker reuses the files written by an earlier one
+        worker, backend, played = make_worker(cache_dir)
+        worker.say('hello')
+        worker.wait_idle(timeout=5.0)
+        worker.close()
+        assert backend.calls == [] and played == [en_path]
+
+
+def test_duplicates_collapse_while_busy():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        release = threading.Event()
+        worker, backend, _ = make_worker(cache_dir, player=lambda path: release.wait(5.0))
+        worker.say('A')          # occupies the worker
+        worker.wait_idle(timeout=0.2)
+        worker.say('B')
+        worker.say('B')
+        worker.say('B')
+        stats = worker.stats()
+        release.set()
+        worker.wait_idle(timeout=5.0)
+        worker.close()
+
+        assert stats['collapsed'] == 2 and stats['pending'] == 1
+        assert worker.stats()['spoken'] == 2
+
+
+def test_prewarm_fills_cache_without_playing():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        worker, backend, played = make_worker(cache_dir)
+        worker.prewarm(['A', 'B', 'hello'])
+        worker.wait_idle(timeout=5.0)
+        worker.close()
+
+        assert sorted(text for text, _ in backend.calls) == ['A', 'B', 'hello']
+        assert played == []
+        assert len(os.listdir(cache_dir)) == 3
+
+
+if __name__ == '__main__':
+    for test in [test_phrase_synthesized_once, test_cache_persists_and_is_keyed_by_backend_and_lang,
+                 test_duplicates_collapse_while_busy, test_prewarm_fills_cache_without_playing]:
+        test()
+        print(f"✅ {test.__name__}")
@@ -1,14 +1,15 @@
-import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split, RandomizedSearchCV, cross_val_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report
-import joblib
-import matplotlib.pyplot as plt
+from model_bundle import save_bundle
+from cascade import build_cascade, calibrate_serving_unknown, format_report
+import rejection
+from gesture_store import load_dataset
 
-# Load data (CSV has no headers, last column is the label)
-data = pd.read_csv('gestures.csv', header=None)
-X = data.iloc[:, :-1]  # All columns except the last one (features)
-y = data.iloc[:, -1]   # Last column (labels)
+# Load data from the binary gesture store (memory-mapped N x 42 float32
+# landmarks + labels; gestures.csv is imported automatically the first time)
+X, y = load_dataset()
 
 # Split data into training and testing sets (80% training, 20% testing)
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -42,17 +43,34 @@ print(f"Mean CV accuracy: {cv_scores.mean():.2f}")
 
 # Print dataset info
 print(f"\nDataset Info:")
-print(f"Total samples: {len(data)}")
+print(f"Total samples: {len(X)}")
 print(f"Features: {X.shape[1]}")
 print(f"Training samples: {len(X_train)}")
 print(f"Test samples: {len(X_test)}")
-print(f"Unique labels: {sorted(y.unique())}")
+print(f"Unique labels: {sorted(np.unique(y))}")
+
+# Cheap first-stage model for the prediction cascade, calibrated on the test split
+cascade = build_cascade(clf.best_estimator_, X_train, y_train, X_test, y_test)
+if cascade is not None:
+    print(f"\nCascade: {format_report(cascade)}")
+
+# Per-class confidence thresholds below which a frame is answered "unknown",
+# for the full forest and for the cascade as the apps serve them
+unknown = calibrate_serving_unknown(clf.best_estimator_, cascade, X_test, y_test)
+if unknown is not None:
+    print(f"Unknown rejection: {rejection.format_report(unknown)}")
 
-# Save best model
-joblib.dump(clf.best_estimator_, 'model.pkl')
-print("✅ Model saved to model.pkl")
+# Save best model as a self-describing bundle (classes, schema, row counts,
+# data fingerprint) so loaders never have to re-read gestures.csv
+save_bundle(clf.best_estimator_, X, y, 'model.pkl', n_train_rows=len(X_train),
+            accuracy=float((y_pred == y_test).mean()),
+            training_mode='full', incremental_updates=0, cascade=cascade, unknown=unknown)
+print("✅ Model bundle saved to model.pkl")
+print("✅ Compact array copy saved to model.forest (used by the apps for fast loading)")
+
+# Optional: Plot feature importance (matplotlib is only imported here)
+import matplotlib.pyplot as plt
 
-# Optional: Plot feature importance
 importances = clf.best_estimator_.feature_importances_
 plt.figure(figsize=(10, 4))
 plt.title("Feature Importances")
@@ -0,0 +1,199 @@
+"""
+Background text-to-speech with an on-disk phrase cache
+
+speak_word used to synthesize, save, play and delete voice.mp3 on the video
+loop thread. SpeechWorker does that on its own thread instead: say() only
+queues the phrase (repeats of a phrase that is already waiting are dropped)
+and synthesized audio is kept in a content-addressed cache, keyed by
+backend, language and text, so each phrase is synthesized once.
+
+Backends only need a `name`, an `extension` and `synthesize(text, lang)`
+returning the audio bytes. StubBackend works offline and is used by tests.
+"""
+import hashlib
+import io
+import os
+import threading
+import wave
+from collections import deque
+
+TTS_CACHE_DIR = 'tts_cache'
+MAX_PENDING = 3  # older queued phrases are dropped, they are no longer current
+
+
+class GTTSBackend:
+    """Google Translate TTS (needs network on a cache miss)"""
+
+    name = 'gtts'
+    extension = 'mp3'
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class StubBackend:
+    """Offline stand-in: a short silent WAV per phrase, and a record of calls"""
+
+    name = 'stub'
+    extension = 'wav'
+
+    def __init__(self, duration=0.1, sample_rate=8000):
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.calls = []
+
+    def synthesize(self, text, lang):
+        self.calls.append((text, lang))
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b'\x00\x00' * int(self.duration * self.sample_rate))
+        return buffer.getvalue()
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'stub': StubBackend
+}
+
+
+def play_file(path):
+    """Default player: playsound when installed, otherwise just log"""
+    try:
+        from playsound import playsound
+    except ImportError:
+        print(f"🔈 (no audio player) {path}")
+        return
+    playsound(path)
+
+
+class AudioCache:
+    """Synthesized phrases on disk, one file per (backend, lang, text)"""
+
+    def __init__(self, path=TTS_CACHE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def path_for(self, backend, lang, text):
+        key = hashlib.sha256(f'{backend.name}|{lang}|{text}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, f'{key}.{backend.extension}')
+
+    def get(self, backend, lang, text):
+        """(path, cached) - synthesizes and stores the phrase on a miss"""
+        path = self.path_for(backend, lang, text)
+        if os.path.exists(path):
+            return path, True
+
+        audio = backend.synthesize(text, lang)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        return path, False
+
+
+class SpeechWorker:
+    """Speaks phrases on a background thread so callers never block"""
+
+    def __init__(self, backend=None, lang='en', cache_dir=TTS_CACHE_DIR, player=play_file,
+                 max_pending=MAX_PENDING):
+        self.backend = backend if backend is not None else GTTSBackend()
+        self.lang = lang
+        self.cache = AudioCache(cache_dir)
+        self.player = player
+        self.max_pending = max_pending
+
+        self._speech = deque()   # phrases to play, oldest first
+        self._warmup = deque()   # phrases to synthesize only
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._stats = {
+            'requested': 0,
+            'collapsed': 0,
+            'dropped': 0,
+            'spoken': 0,
+            'cache_hits': 0,
+            'synthesized': 0,
+            'errors': 0
+        }
+
+        self._thread = threading.Thread(target=self._run, name='speech-worker', daemon=True)
+        self._thread.start()
+
+    def say(self, text):
+        """Queue a phrase; returns immediately"""
+        with self._cond:
+            self._stats['requested'] += 1
+            if text in self._speech:
+                self._stats['collapsed'] += 1
+                return
+            self._speech.append(text)
+            while len(self._speech) > self.max_pending:
+                self._speech.popleft()
+                self._stats['dropped'] += 1
+            self._cond.notify()
+
+    def prewarm(self, texts):
+        """Synthesize phrases into the cache in the background (no playback)"""
+        with self._cond:
+            for text in texts:
+                if text not in self._warmup:
+                    self._warmup.append(str(text))
+            self._cond.notify()
+
+    def wait_idle(self, timeout=None):
+        """Block until both queues are empty and nothing is being processed"""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not (self._speech or self._warmup or self._busy), timeout)
+
+    def close(self, timeout=2.0):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._speech)
+            stats['warmup_pending'] = len(self._warmup)
+            stats['backend'] = self.backend.name
+            return stats
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or self._speech or self._warmup)
+                if self._closed:
+                    return
+                # Speech always goes before cache warm-up
+                if self._speech:
+                    text, play = self._speech.popleft(), True
+                else:
+                    text, play = self._warmup.popleft(), False
+                self._busy = True
+
+            try:
+                path, cached = self.cache.get(self.backend, self.lang, text)
+                with self._cond:
+                    self._stats['cache_hits' if cached else 'synthesized'] += 1
+                if play:
+                    self.player(path)
+                    with self._cond:
+                        self._stats['spoken'] += 1
+            except Exception as e:
+                with self._cond:
+                    self._stats['errors'] += 1
+                print(f"[TTS Error]: {e} - Would have said: {text}")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
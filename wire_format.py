@@ -0,0 +1,97 @@
+"""
+Compact binary encoding for landmark requests and prediction responses
+
+Instead of a JSON list of 42 numbers, a client may POST the raw landmarks:
+
+    Content-Type: application/x-landmarks-f32
+    body: N frames x 42 little-endian float32 (168 bytes per frame)
+
+The body is wrapped by np.frombuffer without copying or parsing. Predictions
+for such a request come back in the same spirit:
+
+    Content-Type: application/x-predictions
+    body: N records of <uint16 label index><float32 confidence> (6 bytes each)
+    X-Labels-Version: digest of the label list the indices refer to
+
+Label indices refer to the list served by /api/labels; when the
+X-Labels-Version header changes (after a retrain), fetch it again. The index
+UNKNOWN_INDEX (0xFFFF) marks a frame rejected as no known gesture (see
+rejection.py). A client that sends binary but wants JSON back sends
+Accept: application/json.
+"""
+import hashlib
+
+import numpy as np
+
+LANDMARKS_MIME = 'application/x-landmarks-f32'
+PREDICTIONS_MIME = 'application/x-predictions'
+N_FEATURES = 42
+FRAME_DTYPE = np.dtype('<f4')
+FRAME_BYTES = N_FEATURES * FRAME_DTYPE.itemsize
+PREDICTION_DTYPE = np.dtype([('label', '<u2'), ('confidence', '<f4')])
+UNKNOWN_INDEX = 0xFFFF
+
+
+def is_binary(req):
+    """True when a Flask request carries packed float32 landmarks"""
+    return req.mimetype == LANDMARKS_MIME
+
+
+def wants_binary(req):
+    """Binary reply for binary requests, unless the client asked for JSON"""
+    return is_binary(req) and 'application/json' not in req.accept_mimetypes.values()
+
+
+def decode_frames(body, max_frames=None):
+    """N x 42 float32 array viewing `body` (read-only, no copy).
+
+    Raises ValueError for a size that isn't a whole number of frames, too
+    many frames, or NaN/infinite values.
+    """
+    if not body or len(body) % FRAME_BYTES:
+        raise ValueError(f'Body is {len(body)} bytes, expected a multiple of {FRAME_BYTES} '
+                         f'({N_FEATURES} little-endian float32 per frame)')
+    X = np.frombuffer(body, dtype=FRAME_DTYPE).reshape(-1, N_FEATURES)
+    if max_frames is not None and len(X) > max_frames:
+        raise ValueError(f'Too many frames: {len(X)}, maximum is {max_frames}')
+    if not np.isfinite(X).all():
+        raise ValueError('Frames contain NaN or infinite values')
+    return X
+
+
+def encode_frames(X):
+    """Client side: pack landmark rows for a LANDMARKS_MIME request"""
+    return np.ascontiguousarray(X, dtype=FRAME_DTYPE).reshape(-1, N_FEATURES).tobytes()
+
+
+def labels_version(labels):
+    """Short digest identifying a label list"""
+    return hashlib.sha1('\n'.join(str(label) for label in labels).encode('utf-8')).hexdigest()[:12]
+
+
+def encode_predictions(indices, confidences):
+    """Pack label indices and confidences into PREDICTION_DTYPE records"""
+    out = np.empty(len(indices), dtype=PREDICTION_DTYPE)
+    out['label'] = indices
+    out['confidence'] = confidences
+    return out.tobytes()
+
+
+def decode_predictions(body):
+    """Client side: (label indices, confidences) from a PREDICTIONS_MIME body"""
+    records = np.frombuffer(body, dtype=PREDICTION_DTYPE)
+    return records['label'], records['confidence']
+
+
+def predictions_response(proba, classes, rejected=None):
+    """Flask response with the argmax label index and confidence per row;
+    rows flagged in `rejected` get UNKNOWN_INDEX"""
+    from flask import Response
+
+    best = proba.argmax(axis=1)
+    confidences = proba[np.arange(len(best)), best]
+    if rejected is not None:
+        best = np.where(rejected, UNKNOWN_INDEX, best)
+    body = encode_predictions(best, confidences)
+    return Response(body, mimetype=PREDICTIONS_MIME,
+                    headers={'X-Labels-Version': labels_version(classes)})
@@ -1,5 +1,14 @@
+from startup_timing import StartupTimer
+
+startup = StartupTimer()
+
 from flask import Flask, render_template, request, jsonify
+startup.mark('import flask')
 import os
+import queue
+import threading
+
+from gesture_writer import WriteFailed
 
 app = Flask(__name__)
 
@@ -7,22 +16,122 @@ app = Flask(__name__)
 model = None
 labels = ['A', 'B', 'C', 'Hi', 'No', 'hello', 'surprised', 'thinking', 'thumbs up']
 
-try:
-    import joblib
-    import pandas as pd
-    
-    if os.path.exists('model.pkl'):
-        model = joblib.load('model.pkl')
-        print("✅ Model loaded successfully")
-    
-    if os.path.exists('gestures.csv'):
-        data = pd.read_csv('gestures.csv', header=None)
-        labels = sorted(data.iloc[:, -1].unique())
-        print(f"✅ Labels loaded: {len(labels)} gestures")
-    
-except Exception as e:
-    print(f"⚠️ Model loading failed: {e}")
-    print("Using fallback mode")
+# Upper bound on frames accepted by /api/predict_batch in one call
+MAX_BATCH_FRAMES = 256
+
+# Upper bound on images accepted by /api/predict_frame in one call
+MAX_UPLOAD_FRAMES = 16
+
+# The (model, labels) pair actually served. Retrain replaces the tuple in a
+# single assignment, so requests that read it once always get a matching pair.
+served = (model, labels)
+# Per-class thresholds for "unknown" answers (rejection.py), from the bundle
+unknown = None
+
+# The model loads in a background thread started at import, so the server
+# is up at once; prediction endpoints answer 503 until it is done
+model_ready = threading.Event()
+
+def load_model():
+    global served, unknown
+    try:
+        from cascade import serving_model
+        from forest_file import load_serving_bundle
+
+        if os.path.exists('model.pkl'):
+            with startup.step('load model'):
+                bundle = load_serving_bundle('model.pkl')
+                unknown = bundle.get('unknown')
+                served = (serving_model(bundle), bundle['classes'])
+            print("✅ Model loaded successfully")
+            print(f"✅ Labels loaded: {len(served[1])} gestures")
+
+    except Exception as e:
+        print(f"⚠️ Model loading failed: {e}")
+        print("Using fallback mode")
+    model_ready.set()
+    startup.ready()
+    print(startup.format())
+
+threading.Thread(target=load_model, name='model-loader', daemon=True).start()
+
+# Gesture dataset, opened on first save/retrain (imports gestures.csv once).
+# Saves are batched by a single background writer thread.
+gesture_store = None
+gesture_writer = None
+gesture_store_lock = threading.Lock()
+
+def get_gesture_store():
+    global gesture_store
+    with gesture_store_lock:
+        if gesture_store is None:
+            from gesture_store import open_store
+            gesture_store = open_store()
+        return gesture_store
+
+def get_gesture_writer():
+    global gesture_writer
+    store = get_gesture_store()
+    with gesture_store_lock:
+        if gesture_writer is None:
+            from gesture_writer import GestureWriter
+            gesture_writer = GestureWriter(store)
+        return gesture_writer
+
+def on_retrain_complete(result):
+    """Swap in the bundle the retrain job just wrote"""
+    global served, unknown
+    from cascade import serving_model
+    from forest_file import load_serving_bundle
+
+    bundle = load_serving_bundle('model.pkl')
+    unknown = bundle.get('unknown')
+    served = (serving_model(bundle), bundle['classes'])
+    print(f"✅ Retrained model loaded (accuracy {result['accuracy']:.3f})")
+
+# MediaPipe worker threads for /api/predict_frame, started on first use
+hand_pool = None
+
+def get_hand_pool():
+    global hand_pool
+    with gesture_store_lock:
+        if hand_pool is None:
+            from hand_pool import HandPool
+            hand_pool = HandPool()
+        return hand_pool
+
+# Retrain runs in a background process, one job at a time
+retrain_manager = None
+
+def get_retrain_manager():
+    global retrain_manager
+    with gesture_store_lock:
+        if retrain_manager is None:
+            from retrain_jobs import RetrainManager
+            retrain_manager = RetrainManager(
+                on_complete=on_retrain_complete,
+                before_start=lambda: get_gesture_writer().flush(timeout=10.0)
+            )
+        return retrain_manager
+
+@app.before_request
+def wait_for_model():
+    # Not the fallback predictions: the real model is on its way
+    if request.path.startswith('/api/predict') and not model_ready.is_set():
+        return jsonify({
+            'success': False,
+            'error': 'Model is still loading - retry shortly'
+        }), 503
+
+@app.route('/api/ready')
+def ready():
+    """Readiness probe: 503 while the model loads, then 200 (also in fallback mode)"""
+    return jsonify({
+        'success': model_ready.is_set(),
+        'ready': model_ready.is_set(),
+        'model_loaded': served[0] is not None,
+        'startup': startup.report()
+    }), 200 if model_ready.is_set() else 503
 
 @app.route('/')
 def index():
@@ -30,7 +139,7 @@ def index():
 
 @app.route('/detect')
 def detect():
-    return render_template('detect.html', labels=labels)
+    return render_template('detect.html', labels=served[1])
 
 @app.route('/collect')
 def collect():
@@ -53,20 +162,31 @@ def predict():
     try:
         data = request.get_json()
         landmarks = data.get('landmarks', [])
+        model, labels = served
 
         if len(landmarks) == 42:
+            from multi_hand import check_landmarks
+
+            try:
+                check_landmarks(landmarks)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                })
+
             if model is not None:
-                # Use real model
-                prediction = model.predict([landmarks])[0]
-                prediction_proba = model.predict_proba([landmarks])
-                confidence = max(prediction_proba[0])
+                from rejection import response_fields, top_k
 
-                print(f"Real prediction: {prediction} (Confidence: {confidence:.2f})")
+                # Use real model: one predict_proba call gives the label (its
+                # argmax), the confidence and the runners-up
+                result = top_k(model.predict_proba([landmarks])[0], model.classes_, unknown=unknown)
+
+                print(f"Real prediction: {result[0]} (Confidence: {result[1]:.2f})")
 
                 return jsonify({
                     'success': True,
-                    'prediction': prediction,
-                    'confidence': float(confidence)
+                    **response_fields(result)
                 })
             else:
                 # Fallback prediction
@@ -93,6 +213,132 @@ def predict():
             'error': str(e)
         })
 
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    try:
+        import numpy as np
+
+        data = request.get_json()
+        frames = data.get('frames', [])
+        model, labels = served
+
+        # Validate all frames at once instead of row by row
+        try:
+            X = np.asarray(frames, dtype=np.float32)
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'Frames must be a list of 42-value landmark lists'
+            })
+
+        if X.ndim != 2 or X.shape[1] != 42 or len(X) == 0:
+            return jsonify({
+                'success': False,
+                'error': f'Expected N x 42 frames, got {list(X.shape)}'
+            })
+        if len(X) > MAX_BATCH_FRAMES:
+            return jsonify({
+                'success': False,
+                'error': f'Too many frames: {len(X)}, maximum is {MAX_BATCH_FRAMES}'
+            })
+        if not np.isfinite(X).all():
+            return jsonify({
+                'success': False,
+                'error': 'Frames contain NaN or infinite values'
+            })
+
+        if model is not None:
+            from rejection import response_fields, top_k
+
+            # Single forest evaluation for the whole batch
+            proba = model.predict_proba(X)
+            predictions = [response_fields(top_k(row, model.classes_, unknown=unknown))
+                           for row in proba]
+        else:
+            # Fallback prediction
+            import random
+            predictions = [{'prediction': random.choice(labels), 'confidence': 0.8}
+                           for _ in range(len(X))]
+
+        return jsonify({
+            'success': True,
+            'count': len(X),
+            'predictions': predictions
+        })
+
+    except Exception as e:
+        print(f"Batch prediction error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/api/predict_frame', methods=['POST'])
+def predict_frame():
+    try:
+        import numpy as np
+        from hand_pool import ExtractTimeout, PoolBusy, frames_from_request
+
+        # JPEG/PNG frames; landmarks are extracted here instead of in the browser
+        frames, session = frames_from_request(request)
+        if not frames or len(frames) > MAX_UPLOAD_FRAMES:
+            return jsonify({
+                'success': False,
+                'error': f'Expected 1 to {MAX_UPLOAD_FRAMES} frames, got {len(frames)}'
+            })
+
+        try:
+            rows = get_hand_pool().extract(frames, session,
+                                           request.args.get('mirror', '1') not in ('0', 'false'))
+        except PoolBusy:
+            return jsonify({
+                'success': False,
+                'error': 'Frame workers are busy, try again shortly'
+            }), 503
+        except ExtractTimeout as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 504
+
+        model, labels = served
+        hands = [row for row in rows if row is not None]
+        if hands and model is not None:
+            from rejection import response_fields, top_k
+
+            proba = model.predict_proba(np.asarray(hands, dtype=np.float32))
+            predictions = iter([response_fields(top_k(p, model.classes_, unknown=unknown))
+                                for p in proba])
+        else:
+            # Fallback prediction
+            import random
+            predictions = iter([{'prediction': random.choice(labels), 'confidence': 0.8}
+                                for _ in hands])
+
+        results = []
+        for row in rows:
+            if row is None:
+                results.append({'hand_detected': False, 'prediction': None})
+            else:
+                results.append({
+                    'hand_detected': True,
+                    **next(predictions),
+                    'landmarks': row
+                })
+
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': results
+        })
+
+    except Exception as e:
+        print(f"Frame prediction error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/api/save_gesture', methods=['POST'])
 def save_gesture():
     try:
@@ -101,11 +347,24 @@ def save_gesture():
         label = data.get('label', '')
         
         if len(landmarks) == 42 and label:
-            # Save to CSV
-            import csv
-            with open('gestures.csv', 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(landmarks + [label])
+            # Hand off to the background writer
+            try:
+                seq = get_gesture_writer().submit(landmarks, label)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid data: {e}'
+                }), 400
+            except queue.Full:
+                return jsonify({
+                    'success': False,
+                    'error': 'Too many gestures queued, try again shortly'
+                }), 503
+            if data.get('wait') and not get_gesture_writer().wait_for(seq, timeout=5.0):
+                return jsonify({
+                    'success': False,
+                    'error': 'Gesture queued but not written yet - the writer is behind'
+                }), 504
             
             return jsonify({
                 'success': True,
@@ -117,6 +376,11 @@ def save_gesture():
                 'error': 'Invalid data'
             })
     
+    except WriteFailed as e:
+        return jsonify({
+            'success': False,
+            'error': f'Gesture could not be saved: {e}'
+        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
@@ -128,39 +392,38 @@ def save_gesture():
 @app.route('/api/retrain', methods=['POST'])
 def retrain():
     try:
-        # Simple retraining
-        global model, labels
-
-        import pandas as pd
-        from sklearn.model_selection import train_test_split
-        from sklearn.ensemble import RandomForestClassifier
-        import joblib
+        # Background retraining; repeated requests join the queued job
+        data = request.get_json(silent=True) or {}
+        manager = get_retrain_manager()
+        # mode: 'auto' (incremental when possible), 'incremental' or 'full'
+        job = manager.submit(data.get('mode', 'auto'))
 
-        # Load data
-        data = pd.read_csv('gestures.csv', header=None)
-        X = data.iloc[:, :-1]
-        y = data.iloc[:, -1]
-
-        # Train
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        clf = RandomForestClassifier()
-        clf.fit(X_train, y_train)
-
-        # Save
-        joblib.dump(clf, 'model.pkl')
-
-        # Update global variables
-        model = clf
-        labels = sorted(y.unique())
-
-        accuracy = clf.score(X_test, y_test)
+        if data.get('wait'):
+            job = manager.wait(job['id'], timeout=data.get('timeout', 600))
+            if job['status'] == 'done':
+                return jsonify({
+                    'success': True,
+                    'message': 'Model retrained successfully',
+                    'job_id': job['id'],
+                    'accuracy': job['result']['accuracy'],
+                    'total_samples': job['result']['total_samples'],
+                    'mode': job['result']['mode'],
+                    'reason': job['result']['reason']
+                })
+            return jsonify({
+                'success': False,
+                'job_id': job['id'],
+                'status': job['status'],
+                'error': job['error'] or 'Retrain still running'
+            })
 
         return jsonify({
             'success': True,
-            'message': 'Model retrained successfully',
-            'accuracy': float(accuracy),
-            'total_samples': len(data)
-        })
+            'message': 'Retrain started',
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': f"/api/retrain/{job['id']}"
+        }), 202
 
     except Exception as e:
         return jsonify({
@@ -168,6 +431,19 @@ def retrain():
             'error': str(e)
         })
 
+@app.route('/api/retrain/<job_id>')
+def retrain_status(job_id):
+    job = get_retrain_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown retrain job: {job_id}'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
 if __name__ == '__main__':
     print("🚀 Starting SILEXA...")
     print("📁 Files check:")